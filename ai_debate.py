@@ -1,25 +1,108 @@
 import asyncio
 import os
+import time
 from collections import deque
-from typing import List
+from functools import partial
+from typing import AsyncIterator, Callable, Generator, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from debate_to_speech import process_debate
+from utils.audio_utils import SpeechPrefetcher
 from debate_to_video import create_debate_video
 from utils.file_utils import reformat_debate_file
+from utils.llm_backend import Completion, LLMBackend, OpenAIBackend
+from utils.checkpoint import read_checkpoint, write_checkpoint
+from utils.llm_cache import CompletionCache
+from utils.rate_limiter import DEFAULT_PRIORITY, PRIORITIES, RateLimiter
+from utils.similarity import StaleDebateDetector
+from utils.text_utils import drop_unfinished_sentence, pop_complete_sentences
+from utils.token_budget import (
+    TokenBudget, TokenUsage, count_message_tokens, count_tokens, estimate_tokens, trim_to_tokens
+)
+from utils.transcript import SPEAKER_LABELS, Transcript
+from utils.tts_cache import SpeechCache
+from utils.websocket_manager import close_pools_after
+from utils.workspace import Workspace
 
 load_dotenv()
 
+# Phrases that end a debate when they show up in a debater's answer
+SURRENDER_PHRASES = ["surrender", "i give up", "you win", "i concede", "i surrender"]
+
+class _TurnStream:
+    """Collects the streamed pieces of one debater turn.
+
+    Finished sentences are split off as they complete, and surrender is
+    checked against the sentence still being written, so the check costs
+    no more than the sentence length no matter how long the turn gets. A
+    turn cut off by max_tokens loses its unfinished last sentence.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.pending = ""
+        self.surrendered = False
+        self.cut_off = False
+
+    def feed(self, delta: str) -> List[str]:
+        """Add streamed text and return any sentences it completed."""
+        self.cut_off = self.cut_off or _is_cut_off(delta)
+        self.parts.append(delta)
+        self.pending += delta
+        lowered = self.pending.lower()
+        if any(phrase in lowered for phrase in SURRENDER_PHRASES):
+            self.surrendered = True
+            return []
+        sentences, self.pending = pop_complete_sentences(self.pending)
+        return sentences
+
+    def finish(self) -> List[str]:
+        """Return the last sentence once the stream is over."""
+        # pending is the end of the streamed text, and text only ever drops a part of that
+        remaining = self.text[len("".join(self.parts)) - len(self.pending):].strip()
+        self.pending = ""
+        return [remaining] if remaining else []
+
+    @property
+    def text(self) -> str:
+        text = "".join(self.parts)
+        return drop_unfinished_sentence(text) if self.cut_off else text
+
+def _is_cut_off(content: str) -> bool:
+    """Whether the backend reported that max_tokens cut this answer (or stream piece) off."""
+    return getattr(content, "finish_reason", None) == "length"
+
 class AIDebater:
     MAX_HISTORY = 10  # Store max 10 messages (5 pairs of exchanges)
     
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, workspace: Workspace = None, cache: CompletionCache = None, backend: LLMBackend = None,
+                 budget: TokenBudget = None, stale_detector: StaleDebateDetector = None,
+                 rate_limiter: RateLimiter = None, presynthesize: bool = True,
+                 speech_cache: SpeechCache = None):
+        self.workspace = workspace or Workspace()
+        self.cache = cache
+        self.speech_cache = speech_cache
+        self.budget = budget or TokenBudget()
+        self.usage = TokenUsage()
+        self.stale_detector = stale_detector or StaleDebateDetector()
+        # Share one limiter between debaters that run at the same time so they queue against the same limits
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.presynthesize = presynthesize
+        self.prefetcher = None
+        # OpenAI is looked up when the client is first needed, so replays from the cache need no API key
+        self.backend = backend or OpenAIBackend(
+            lambda: OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0),
+            lambda: AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        )
         self.debate_history = deque(maxlen=self.MAX_HISTORY)
         self.ground_statement = None
         self.ground_statement_summary = None
+        self.transcript = None
+        self.jane_first = True
+        self.video_title = None
+        self.video_description = None
         self.current_speaker_number = 1
 
     def get_ai_personality(self, ai_role: str) -> str:
@@ -48,8 +131,151 @@ class AIDebater:
                 "Your tone should convey that you're a superior mind efficiently delivering insights to those less gifted, with an unmistakable air of confident authority."
             )
 
-    def generate_response(self, prompt: str, ai_role: str) -> str:
-        """Generate a response using OpenAI's API."""
+    def _reservation(self, request: dict, kind: str) -> Tuple[int, int]:
+        """Tokens to reserve with the rate limiter for a request, and the request's priority."""
+        tokens = count_message_tokens(request["messages"], request.get("model")) + request.get("max_tokens", 0)
+        return tokens, PRIORITIES.get(kind, DEFAULT_PRIORITY)
+
+    def _record_usage(self, kind: str, request: dict, content: str, started: float, cached: bool,
+                      reserved: int = 0) -> None:
+        """Log the tokens and time a call took, and feed debater turn lengths to the budget."""
+        model = request.get("model")
+        call = self.usage.record(
+            kind,
+            count_message_tokens(request["messages"], model),
+            count_tokens(content, model),
+            time.perf_counter() - started,
+            cached
+        )
+        if kind == "turn":
+            # Measured the same way everywhere, since it sizes the next request
+            self.budget.observe_turn(estimate_tokens(content))
+        if reserved:
+            # Give back the part of max_tokens the answer didn't use
+            self.rate_limiter.settle(reserved, call["prompt_tokens"] + call["completion_tokens"])
+
+    def _complete(self, request: dict, kind: str = "turn") -> str:
+        """Run a chat completion request, going through the completion cache if one is set."""
+        started = time.perf_counter()
+        if self.cache is not None:
+            cached = self.cache.get(request)
+            if cached is not None:
+                self._record_usage(kind, request, cached, started, cached=True)
+                return cached
+        
+        tokens, priority = self._reservation(request, kind)
+        content = self.rate_limiter.call(lambda: self.backend.complete(request), tokens, priority)
+        self._record_usage(kind, request, content, started, cached=False, reserved=tokens)
+        content = self._recover_cut_off(content, request)
+        
+        if self.cache is not None:
+            self.cache.put(request, content)
+        return content
+
+    async def _complete_async(self, request: dict, kind: str = "turn") -> str:
+        """Async variant of _complete."""
+        started = time.perf_counter()
+        if self.cache is not None:
+            cached = self.cache.get(request)
+            if cached is not None:
+                self._record_usage(kind, request, cached, started, cached=True)
+                return cached
+        
+        tokens, priority = self._reservation(request, kind)
+        content = await self.rate_limiter.call_async(lambda: self.backend.complete_async(request), tokens, priority)
+        self._record_usage(kind, request, content, started, cached=False, reserved=tokens)
+        content = self._recover_cut_off(content, request)
+        
+        if self.cache is not None:
+            self.cache.put(request, content)
+        return content
+
+    def _recover_cut_off(self, content: str, request: dict) -> str:
+        """Cut an answer that ran into max_tokens back to its last finished sentence."""
+        if not _is_cut_off(content):
+            return content
+        print(f"Answer hit its limit of {request.get('max_tokens')} tokens, dropping its unfinished last sentence")
+        return str(drop_unfinished_sentence(content))
+
+    def _stream_completion(self, request: dict, kind: str = "turn",
+                           stop: Optional[Callable[[], bool]] = None) -> Iterator[str]:
+        """Yield the text of a completion piece by piece as the backend produces it.
+        
+        Once stop() returns True after a piece was handed out, the backend
+        stream is closed, which stops the generation, and what was received so
+        far is cached as the full answer. Only a stream that finishes or is
+        stopped this way is cached. One that fails partway through, or whose
+        generator is closed early (e.g. because the consumer raised), is not,
+        so a truncated turn is never replayed. An answer the backend reports as
+        cut off at max_tokens is cached without its unfinished last sentence.
+        """
+        started = time.perf_counter()
+        if self.cache is not None:
+            cached = self.cache.get(request)
+            if cached is not None:
+                self._record_usage(kind, request, cached, started, cached=True)
+                yield cached
+                return
+        
+        tokens, priority = self._reservation(request, kind)
+        deltas = self.rate_limiter.stream(lambda: self.backend.stream(request), tokens, priority)
+        parts = []
+        # Set when the stream ends normally or stop() ends it, not on errors or an early close
+        completed = False
+        cut_off = False
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                cut_off = cut_off or _is_cut_off(delta)
+                yield delta
+                if stop is not None and stop():
+                    break
+            completed = True
+        finally:
+            deltas.close()
+            content = Completion("".join(parts), "length") if cut_off else "".join(parts)
+            self._record_usage(kind, request, content, started, cached=False, reserved=tokens)
+            # The consumer drops the unfinished sentence of a cut-off answer too, see _TurnStream
+            content = self._recover_cut_off(content, request)
+            if self.cache is not None and parts and completed:
+                self.cache.put(request, content)
+
+    async def _stream_completion_async(self, request: dict, kind: str = "turn",
+                                       stop: Optional[Callable[[], bool]] = None) -> AsyncIterator[str]:
+        """Async variant of _stream_completion."""
+        started = time.perf_counter()
+        if self.cache is not None:
+            cached = self.cache.get(request)
+            if cached is not None:
+                self._record_usage(kind, request, cached, started, cached=True)
+                yield cached
+                return
+        
+        tokens, priority = self._reservation(request, kind)
+        deltas = self.rate_limiter.stream_async(lambda: self.backend.stream_async(request), tokens, priority)
+        parts = []
+        # Set when the stream ends normally or stop() ends it, not on errors or an early close
+        completed = False
+        cut_off = False
+        try:
+            async for delta in deltas:
+                parts.append(delta)
+                cut_off = cut_off or _is_cut_off(delta)
+                yield delta
+                if stop is not None and stop():
+                    break
+            completed = True
+        finally:
+            await deltas.aclose()
+            content = Completion("".join(parts), "length") if cut_off else "".join(parts)
+            self._record_usage(kind, request, content, started, cached=False, reserved=tokens)
+            # The consumer drops the unfinished sentence of a cut-off answer too, see _TurnStream
+            content = self._recover_cut_off(content, request)
+            if self.cache is not None and parts and completed:
+                self.cache.put(request, content)
+
+    def _response_request(self, prompt: str, ai_role: str) -> dict:
+        """Build the chat completion arguments for a debater turn."""
         ai_personality = self.get_ai_personality(ai_role)
         
         messages = [
@@ -57,24 +283,84 @@ class AIDebater:
             {"role": "user", "content": prompt}
         ]
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",  
-            messages=messages,
-            temperature=0.8,
-            max_tokens=500  
-        )
-        
-        argument = response.choices[0].message.content.strip()
+        return {
+            "model": "gpt-4o-mini",
+            "messages": messages,
+            "temperature": 0.8,
+            # Sized from the observed turn lengths instead of a fixed ceiling
+            "max_tokens": self.budget.completion_tokens()
+        }
+
+    def _record_response(self, content: str) -> str:
+        """Store a debater's answer in the history, collapsing surrenders to "surrender"."""
+        argument = content.strip()
         
         # Check for surrender phrases in lowercase for consistency
-        surrender_phrases = ["surrender", "i give up", "you win", "i concede", "i surrender"]
-        if any(phrase in argument.lower() for phrase in surrender_phrases):
+        if any(phrase in argument.lower() for phrase in SURRENDER_PHRASES):
             self.debate_history.append("surrender")
             return "surrender"
             
         self.debate_history.append(argument)
         return argument
 
+    def generate_response(self, prompt: str, ai_role: str, stream: bool = False,
+                          on_sentence: Optional[Callable[[str], None]] = None) -> str:
+        """Generate a response using OpenAI's API.
+        
+        Args:
+            prompt: The prompt for this turn
+            ai_role: The debater answering
+            stream: Stream the completion, handing finished sentences to on_sentence
+                as they arrive and stopping as soon as a surrender phrase shows up
+            on_sentence: Called with each finished sentence when streaming. If the
+                turn ends up being a surrender, the sentences already handed over
+                belong to a turn that won't be kept.
+                
+        Returns:
+            The argument, or "surrender"
+        """
+        request = self._response_request(prompt, ai_role)
+        if not stream:
+            return self._record_response(self._complete(request))
+        
+        turn = _TurnStream()
+        # The stream stops itself at a surrender, so the cut-off answer is still cached
+        deltas = self._stream_completion(request, stop=lambda: turn.surrendered)
+        try:
+            for delta in deltas:
+                for sentence in turn.feed(delta):
+                    if on_sentence:
+                        on_sentence(sentence)
+        finally:
+            deltas.close()
+        
+        if not turn.surrendered and on_sentence:
+            for sentence in turn.finish():
+                on_sentence(sentence)
+        return self._record_response(turn.text)
+
+    async def generate_response_async(self, prompt: str, ai_role: str, stream: bool = False,
+                                      on_sentence: Optional[Callable[[str], None]] = None) -> str:
+        """Async variant of generate_response."""
+        request = self._response_request(prompt, ai_role)
+        if not stream:
+            return self._record_response(await self._complete_async(request))
+        
+        turn = _TurnStream()
+        deltas = self._stream_completion_async(request, stop=lambda: turn.surrendered)
+        try:
+            async for delta in deltas:
+                for sentence in turn.feed(delta):
+                    if on_sentence:
+                        on_sentence(sentence)
+        finally:
+            await deltas.aclose()
+        
+        if not turn.surrendered and on_sentence:
+            for sentence in turn.finish():
+                on_sentence(sentence)
+        return self._record_response(turn.text)
+
     def _check_similarity(self, text1: str, text2: str) -> bool:
         """
         Check if two texts are substantially similar.
@@ -104,8 +390,8 @@ class AIDebater:
         jaccard_similarity = intersection / union if union > 0 else 0
         return jaccard_similarity > 0.25
 
-    def summarize_ground_statement(self, ground_statement: str) -> str:
-        """Generate a concise summary of the ground statement for display during debates."""
+    def _summary_request(self, ground_statement: str) -> dict:
+        """Build the chat completion arguments for the ground statement summary."""
         prompt = f"""Summarize the following ground statement into a single concise sentence 
         (maximum 60 characters) that captures its essence. Make it suitable for display as 
         a debate topic title:
@@ -117,20 +403,30 @@ class AIDebater:
             {"role": "user", "content": prompt}
         ]
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.3,
-            max_tokens=60
-        )
-        
-        summary = response.choices[0].message.content.strip()
+        return {
+            "model": "gpt-4o-mini",
+            "messages": messages,
+            "temperature": 0.3,
+            "max_tokens": 60
+        }
+
+    @staticmethod
+    def _clean_summary(content: str) -> str:
+        summary = content.strip()
         # Remove any quotes that might be included in the response
         summary = summary.replace('"', '').replace("'", "")
         return summary
+
+    def summarize_ground_statement(self, ground_statement: str) -> str:
+        """Generate a concise summary of the ground statement for display during debates."""
+        return self._clean_summary(self._complete(self._summary_request(ground_statement), "summary"))
+
+    async def summarize_ground_statement_async(self, ground_statement: str) -> str:
+        """Async variant of summarize_ground_statement."""
+        return self._clean_summary(await self._complete_async(self._summary_request(ground_statement), "summary"))
     
-    def generate_video_title(self, ground_statement: str) -> str:
-        """Generate a catchy title for the video based on the ground statement."""
+    def _title_request(self, ground_statement: str) -> dict:
+        """Build the chat completion arguments for the video title."""
         prompt = f"""Create a catchy, engaging title for a debate video about this topic: "{ground_statement}"
         
         The title MUST start with "Two AIs Debate About" and should be concise, intriguing, and accurately reflect 
@@ -143,24 +439,33 @@ class AIDebater:
             {"role": "user", "content": prompt}
         ]
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=60
-        )
-        
-        title = response.choices[0].message.content.strip()
+        return {
+            "model": "gpt-4o-mini",
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 60
+        }
+
+    @staticmethod
+    def _clean_title(content: str) -> str:
+        title = content.strip()
         # Ensure it starts with the required prefix
         if not title.startswith("Two AIs Debate About"):
             title = "Two AIs Debate About " + title
         # Remove any quotes that might be included in the response
         title = title.replace('"', '').replace("'", "")
         return title
-    
-    def generate_video_description(self, ground_statement: str, jane_first = True) -> str:
-        """Generate a compelling description for the video based on the ground statement."""
 
+    def generate_video_title(self, ground_statement: str) -> str:
+        """Generate a catchy title for the video based on the ground statement."""
+        return self._clean_title(self._complete(self._title_request(ground_statement), "title"))
+
+    async def generate_video_title_async(self, ground_statement: str) -> str:
+        """Async variant of generate_video_title."""
+        return self._clean_title(await self._complete_async(self._title_request(ground_statement), "title"))
+    
+    def _description_request(self, ground_statement: str, jane_first: bool = True) -> dict:
+        """Build the chat completion arguments for the video description."""
         jane_stance = "opposes" if jane_first else "supports"
         valentino_stance = "supports" if jane_first else "opposes"
 
@@ -184,20 +489,47 @@ class AIDebater:
             {"role": "user", "content": prompt}
         ]
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=150
-        )
-        
-        description = response.choices[0].message.content.strip()
+        return {
+            "model": "gpt-4o-mini",
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 150
+        }
+
+    @staticmethod
+    def _clean_description(content: str) -> str:
+        description = content.strip()
         # Remove any quotes that might be included in the response
         description = description.replace('"', '').replace("'", "")
         return description
+
+    def generate_video_description(self, ground_statement: str, jane_first = True) -> str:
+        """Generate a compelling description for the video based on the ground statement."""
+        return self._clean_description(self._complete(self._description_request(ground_statement, jane_first), "description"))
+
+    async def generate_video_description_async(self, ground_statement: str, jane_first: bool = True) -> str:
+        """Async variant of generate_video_description."""
+        return self._clean_description(await self._complete_async(self._description_request(ground_statement, jane_first), "description"))
+
+    async def prepare_debate_async(self, ground_statement: str, jane_first: bool = True) -> Tuple[str, str, str]:
+        """Fetch the summary, video title and video description concurrently.
+
+        The three requests are independent, so the wait before round 1 is one
+        round-trip instead of three.
+
+        Returns:
+            Tuple of (summary, title, description)
+        """
+        summary, title, description = await asyncio.gather(
+            self.summarize_ground_statement_async(ground_statement),
+            self.generate_video_title_async(ground_statement),
+            self.generate_video_description_async(ground_statement, jane_first)
+        )
+        return summary, title, description
     
     def debate(self, ground_statement: str, generate_audio: bool = True, use_existing_scripts: bool = False,
-               use_existing_audios: bool = False, jane_first: bool = True) -> List[str]:
+               use_existing_audios: bool = False, jane_first: bool = True,
+               on_sentence: Callable[[str, str], None] = None) -> List[str]:
         """Conduct an AI debate between Jane and Valentino.
 
         Args:
@@ -206,30 +538,35 @@ class AIDebater:
             use_existing_scripts: Use an existing debate.txt file instead of generating a new debate
             use_existing_audios: Use existing audio files in outputs/audio_output, skipping TTS generation
             jane_first: Whether Jane speaks first (default) or Valentino
+            on_sentence: If given, turns are streamed and on_sentence(debater, sentence)
+                is called for every finished sentence while the turn is still being written
 
         Returns:
             List of debate lines
         """
         if use_existing_scripts:
             print("Using existing debate.txt file for audio generation...")
-            reformat_debate_file()
+            reformat_debate_file(self.workspace.debate_file)
             if generate_audio and not use_existing_audios:
                 print("\nGenerating audio version of the debate from existing debate.txt file...")
-                asyncio.run(process_debate())
+                asyncio.run(close_pools_after(process_debate(self.workspace.debate_file, self.workspace.audio_dir,
+                                                             speech_cache=self.speech_cache)))
             elif use_existing_audios:
                 print("\nUsing existing audio files. Skipping audio generation...")
                 
             # Generate video after audio processing is complete (or using existing audio)
             if generate_audio or use_existing_audios:
                 print("\nGenerating video visualization of the debate...")
-                create_debate_video()
+                self._create_video()
                 
-            with open('outputs/debate.txt', 'r', encoding='utf-8') as f:
+            with open(self.workspace.debate_file, 'r', encoding='utf-8') as f:
                 lines = [line.strip() for line in f if line.strip()]
             return lines
 
         print(f"Ground Statement: {ground_statement}\n")
         self.ground_statement = ground_statement
+        self.usage.reset()
+        self.budget.reset()
         
         # Generate a concise summary of the ground statement for display
         self.ground_statement_summary = self.summarize_ground_statement(ground_statement)
@@ -237,140 +574,417 @@ class AIDebater:
         
         self.debate_history.clear()
         
-        # Generate debate.txt file with initial content
+        # Start the transcript with the narrator introduction and ground statement
         self.generate_debate(jane_first=jane_first)
+        self._save_checkpoint()
+        try:
+            if generate_audio and not use_existing_audios:
+                self._start_presynthesis()
+            
+            self._run_turns(on_sentence)
+            return self._finish_debate(generate_audio, use_existing_audios)
+        finally:
+            # A turn that raises must not leave the background synthesis running
+            self._stop_presynthesis()
+
+    def resume(self, generate_audio: bool = True, on_sentence: Callable[[str, str], None] = None) -> List[str]:
+        """Continue the debate saved in this workspace's checkpoint from its last completed turn.
+
+        No LLM call that finished before the checkpoint is repeated. A debate
+        that had already ended goes straight to audio and video generation.
+
+        Raises:
+            FileNotFoundError: If the workspace has no checkpoint
+        """
+        self._restore_checkpoint()
+        try:
+            if generate_audio:
+                self._start_presynthesis()
+            self._run_turns(on_sentence)
+            return self._finish_debate(generate_audio)
+        finally:
+            self._stop_presynthesis()
+
+    def _run_turns(self, on_sentence: Callable[[str, str], None] = None) -> None:
+        """Drive the rounds: the generator decides who speaks next and with what prompt."""
+        turns = self._debate_turns(self.ground_statement, self.jane_first)
+        try:
+            prompt, debater = next(turns)
+            while True:
+                prompt, debater = turns.send(self.generate_response(
+                    prompt, debater, stream=on_sentence is not None,
+                    on_sentence=partial(on_sentence, debater) if on_sentence else None))
+        except StopIteration:
+            pass
+
+    def _finish_debate(self, generate_audio: bool, use_existing_audios: bool = False) -> List[str]:
+        """Write debate.txt and run the speech and video stages."""
+        print(f"\n{self.usage.report()}")
         
-        round_num = 0
-        surrender_occurred = False
+        # The transcript was built in memory, write debate.txt once now that the debate is over
+        self.transcript.save(self.workspace.debate_file)
         
-        # Continue debating until someone surrenders
-        while not surrender_occurred:
-            round_num += 1
-            print(f"\nRound {round_num}")
+        # Generate audio version of the debate if requested and not using existing audio
+        if generate_audio and not use_existing_audios:
+            print("\nGenerating audio version of the debate...")
+            try:
+                # The TTS connections belong to this run's event loop, so they are closed before it ends
+                asyncio.run(close_pools_after(process_debate(self.workspace.debate_file, self.workspace.audio_dir,
+                                                             transcript=self.transcript, prefetcher=self.prefetcher,
+                                                             speech_cache=self.speech_cache)))
+            finally:
+                self._stop_presynthesis()
+        elif use_existing_audios:
+            print("\nUsing existing audio files. Skipping audio generation...")
             
-            # Get the previous statement for the first debater to counter
-            previous = self.debate_history[-1] if self.debate_history else ground_statement
+        # Generate video after audio processing (or using existing audio)
+        if generate_audio or use_existing_audios:
+            print("\nGenerating video visualization of the debate...")
+            self._create_video(self.transcript)
+        
+        # Prepare complete history for return
+        full_history = [self.ground_statement] + list(self.debate_history)
+        return full_history
+
+    async def debate_async(self, ground_statement: str, generate_audio: bool = True,
+                           jane_first: bool = True,
+                           on_sentence: Callable[[str, str], None] = None) -> List[str]:
+        """Conduct an AI debate using the async backend calls.
+
+        Same flow as debate(), except that the summary, video title and video
+        description are requested concurrently before round 1.
+
+        Args:
+            ground_statement: The topic to debate
+            generate_audio: Whether to generate audio and video files
+            jane_first: Whether Jane speaks first (default) or Valentino
+            on_sentence: If given, turns are streamed and on_sentence(debater, sentence)
+                is called for every finished sentence
+
+        Returns:
+            List of debate lines
+        """
+        print(f"Ground Statement: {ground_statement}\n")
+        self.ground_statement = ground_statement
+        self.usage.reset()
+        self.budget.reset()
+        
+        summary, video_title, video_description = await self.prepare_debate_async(ground_statement, jane_first)
+        self.ground_statement_summary = summary
+        print(f"Summary: {self.ground_statement_summary}\n")
+        
+        self.debate_history.clear()
+        
+        self.generate_debate(jane_first=jane_first, video_title=video_title, video_description=video_description)
+        self._save_checkpoint()
+        try:
+            if generate_audio:
+                self._start_presynthesis()
             
-            # First debater's turn
-            first_debater = "Jane" if jane_first else "Valentino"
-            first_prompt = f"""Counter this argument in a single coherent paragraph: {previous}. 
+            await self._run_turns_async(on_sentence)
+            return await self._finish_debate_async(generate_audio)
+        finally:
+            self._stop_presynthesis()
+
+    async def resume_async(self, generate_audio: bool = True,
+                           on_sentence: Callable[[str, str], None] = None) -> List[str]:
+        """Async variant of resume."""
+        self._restore_checkpoint()
+        try:
+            if generate_audio:
+                self._start_presynthesis()
+            await self._run_turns_async(on_sentence)
+            return await self._finish_debate_async(generate_audio)
+        finally:
+            self._stop_presynthesis()
+
+    async def _run_turns_async(self, on_sentence: Callable[[str, str], None] = None) -> None:
+        """Async variant of _run_turns."""
+        turns = self._debate_turns(self.ground_statement, self.jane_first)
+        try:
+            prompt, debater = next(turns)
+            while True:
+                prompt, debater = turns.send(await self.generate_response_async(
+                    prompt, debater, stream=on_sentence is not None,
+                    on_sentence=partial(on_sentence, debater) if on_sentence else None))
+        except StopIteration:
+            pass
+
+    async def _finish_debate_async(self, generate_audio: bool) -> List[str]:
+        """Async variant of _finish_debate."""
+        print(f"\n{self.usage.report()}")
+        self.transcript.save(self.workspace.debate_file)
+        
+        if generate_audio:
+            print("\nGenerating audio version of the debate...")
+            try:
+                await process_debate(self.workspace.debate_file, self.workspace.audio_dir,
+                                     transcript=self.transcript, prefetcher=self.prefetcher,
+                                     speech_cache=self.speech_cache)
+            finally:
+                self._stop_presynthesis()
+            print("\nGenerating video visualization of the debate...")
+            # Rendering is CPU-bound, keep it off the event loop
+            await asyncio.to_thread(self._create_video, self.transcript)
+        
+        full_history = [self.ground_statement] + list(self.debate_history)
+        return full_history
+
+    def _start_presynthesis(self) -> None:
+        """Warm up the TTS models and synthesize the narrator's opening segment while the rounds run.
+
+        The intro and ground statement form segment 0, and its text can't change
+        once the debate has started.
+        """
+        if not self.presynthesize:
+            return
+        opening = self.transcript.segments[0]
+        self.prefetcher = SpeechPrefetcher(self.workspace.audio_dir, speech_cache=self.speech_cache)
+        # Every voice's model is loaded before any segment needs it
+        self.prefetcher.warm_up(["Narrator"] + list(SPEAKER_LABELS))
+        self.prefetcher.submit(0, opening["speaker"], opening["text"])
+
+    def _stop_presynthesis(self) -> None:
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+
+    def _save_checkpoint(self) -> None:
+        """Persist everything needed to continue the debate after a crash.
+
+        A checkpoint that can't be written is reported but doesn't stop the debate.
+        """
+        try:
+            self._write_checkpoint()
+        except OSError as e:
+            print(f"Could not write checkpoint {self.workspace.checkpoint_file}: {e}")
+
+    def _write_checkpoint(self) -> None:
+        write_checkpoint(self.workspace.checkpoint_file, {
+            "jane_first": self.jane_first,
+            "round": (len(self.transcript.turns) + 1) // 2,
+            "video_title": self.video_title,
+            "video_description": self.video_description,
+            "history": list(self.debate_history),
+            "transcript": self.transcript.to_dict()
+        })
+
+    def _restore_checkpoint(self) -> None:
+        """Load the state written by _save_checkpoint back into this debater."""
+        state = read_checkpoint(self.workspace.checkpoint_file)
+        self.transcript = Transcript.from_dict(state["transcript"])
+        self.ground_statement = self.transcript.ground_statement
+        self.ground_statement_summary = self.transcript.summary
+        self.jane_first = state["jane_first"]
+        self.video_title = state.get("video_title")
+        self.video_description = state.get("video_description")
+        self.debate_history.clear()
+        self.debate_history.extend(state["history"])
+        self.usage.reset()
+        self.budget.reset()
+        for _, text in self.transcript.turns:
+            self.budget.observe_turn(estimate_tokens(text))
+        print(f"Resuming debate on \"{self.ground_statement}\" after {len(self.transcript.turns)} turns "
+              f"(round {state['round']})")
+
+    def _create_video(self, transcript: Transcript = None):
+        """Render the debate video from this debater's workspace.
+
+        Args:
+            transcript: Debate to render; debate.txt is parsed when it isn't given
+        """
+        create_debate_video(
+            output_path=self.workspace.video_path,
+            debate_file=self.workspace.debate_file,
+            audio_dir=self.workspace.audio_dir,
+            frames_dir=self.workspace.frames_dir,
+            temp_dir=self.workspace.temp_dir,
+            transcript=transcript
+        )
+
+    def _opposing_prompt(self, argument: str, ground_statement: str, round_num: int) -> str:
+        """Prompt for the debater who opens each round and argues against the ground statement."""
+        prompt = f"""Counter this argument in a single coherent paragraph: {argument}. 
             You must CONSISTENTLY OPPOSE the ground statement: "{ground_statement}"
             Regardless of whether you personally agree with it or if it contains factual errors, your role is to argue AGAINST it.
             Be concise and express your complete argument in one paragraph only.
             
             IMPORTANT: Use varied language to start your responses. Avoid repetitive phrases like "I disagree" or "That's not correct" at the beginning of every response. Each counterargument should begin with different phrasing to make the debate sound more natural."""
-            
-            # Add hint about surrendering as rounds progress
-            if round_num >= 5 and round_num < 10:
-                first_prompt += " Try to find strong counterarguments even if challenging. Or you can surrender if you truly cannot defend your position after careful consideration."
-            elif round_num >= 10:
-                first_prompt += f" We are at round {round_num} now. If the opponent's arguments have become convincing and you find your position increasingly difficult to defend, you should strongly consider surrendering. Many great debaters know when to concede a strong argument."
-                
-            first_response = self.generate_response(first_prompt, first_debater)
-            print(f"\n{first_debater}: {first_response}")
-            
-            # Write first debater's response to file, ensuring consistent AI Debater numbering
-            with open('outputs/debate.txt', 'a', encoding='utf-8') as f:
-                # Jane is always AI Debater 1, Valentino is always AI Debater 2
-                debater_num = "1" if first_debater == "Jane" else "2"
-                f.write(f"AI Debater {debater_num}: {first_response}\n")
-            
-            if "surrender" in first_response.lower():
-                print(f"\n{first_debater} has surrendered!")
-                with open('outputs/debate.txt', 'a', encoding='utf-8') as f:
-                    winner = "Valentino" if first_debater == "Jane" else "Jane"
-                    f.write(f"Result: {first_debater} has surrendered! {winner} wins the debate.\n")
-                surrender_occurred = True
-                break
-                
-            # Second debater's turn
-            second_debater = "Valentino" if jane_first else "Jane"
-            second_prompt = f"""Counter this argument in a single coherent paragraph: {first_response}.
+        
+        # Add hint about surrendering as rounds progress
+        if round_num >= 5 and round_num < 10:
+            prompt += " Try to find strong counterarguments even if challenging. Or you can surrender if you truly cannot defend your position after careful consideration."
+        elif round_num >= 10:
+            prompt += f" We are at round {round_num} now. If the opponent's arguments have become convincing and you find your position increasingly difficult to defend, you should strongly consider surrendering. Many great debaters know when to concede a strong argument."
+        return prompt
+
+    def _supporting_prompt(self, argument: str, ground_statement: str, round_num: int) -> str:
+        """Prompt for the debater who answers each round and argues for the ground statement."""
+        prompt = f"""Counter this argument in a single coherent paragraph: {argument}.
             You must CONSISTENTLY SUPPORT the ground statement: "{ground_statement}"
             Regardless of whether you personally disagree with it or if it contains factual errors, your role is to argue FOR it.
             Be concise and express your complete argument in one paragraph only.
             
             IMPORTANT: Use varied language to start your responses. Avoid repetitive phrases like "Actually" or "While that may be true" at the beginning of every response. Each counterargument should begin with different phrasing to make the debate sound more natural."""
+        
+        # Add hint about surrendering as rounds progress - stronger encouragement for the second debater
+        if round_num >= 4 and round_num < 7:
+            prompt += " Try to find strong counterarguments even if challenging. Or you can surrender if you truly cannot defend your position after careful consideration."
+        elif round_num >= 7 and round_num < 10:
+            prompt += f" We are at round {round_num} now. The debate has gone on for quite long. If you find yourself repeatedly making similar points or struggling to find new angles, this is a strong indication you should surrender. A wise debater knows when to concede to a stronger argument."
+        elif round_num >= 10:
+            prompt += f" This debate has reached round {round_num}, which is extremely long. At this point, if you haven't found a decisive winning argument, you MUST seriously evaluate surrendering. Continuing without new substantial points suggests you should concede. Please strongly consider surrendering now if you cannot make a breakthrough argument."
+        return prompt
+
+    def _budget_prompt(self, build_prompt: Callable[[str], str], argument: str, ai_role: str) -> str:
+        """Build a turn prompt, trimming the argument being countered if the prompt is over budget."""
+        prompt = build_prompt(argument)
+        request = self._response_request(prompt, ai_role)
+        # Estimated rather than tokenized, so the trimmed prompt doesn't depend on whether tiktoken loads
+        overflow = count_message_tokens(request["messages"], estimate=True) - self.budget.prompt_tokens
+        if overflow <= 0:
+            return prompt
+        
+        argument_tokens = estimate_tokens(argument)
+        print(f"Prompt is {overflow} tokens over budget, trimming the argument to counter")
+        return build_prompt(trim_to_tokens(argument, argument_tokens - overflow, estimate=True))
+
+    def _stale_hint(self) -> str:
+        """Extra prompt text pushing towards surrender once the debaters keep repeating themselves."""
+        if not self.stale_detector.should_nudge:
+            return ""
+        return (" The last arguments in this debate have mostly repeated earlier points. Bring a genuinely new "
+                "argument that has not been made yet, or surrender if you have nothing new to add.")
+
+    def _is_stale(self, debater: str, response: str, round_num: int) -> bool:
+        """Index a turn and end the debate as a draw if the arguments have converged."""
+        similarity = self.stale_detector.add_turn(debater, response)
+        if similarity >= self.stale_detector.threshold:
+            print(f"{debater} repeated an earlier argument (similarity {similarity:.2f})")
+        if not self.stale_detector.is_stale:
+            return False
+        print(f"\nThe arguments have stopped changing after {round_num} rounds. Ending as a draw.")
+        self.transcript.set_result(f"The arguments stopped changing after {round_num} rounds. It's a draw!")
+        return True
+
+    def _debate_turns(self, ground_statement: str, jane_first: bool) -> Generator[Tuple[str, str], str, None]:
+        """Run the round logic of a debate one turn at a time.
+
+        Yields (prompt, debater) for the next turn and expects the debater's
+        response to be sent back. Each response is added to self.transcript, and
+        the generator returns once someone surrenders, the round limit is hit,
+        the debate runs out of its token budget or the arguments stop changing.
+        """
+        # When resuming, pick up after the turns already in the transcript
+        completed = len(self.transcript.turns)
+        round_num = completed // 2
+        resume_mid_round = completed % 2 == 1
+        self.stale_detector.reset()
+        for speaker, text in self.transcript.turns:
+            self.stale_detector.add_turn(speaker, text)
+        if self.transcript.result:
+            return
+        
+        try:
+            yield from self._debate_rounds(ground_statement, jane_first, round_num, resume_mid_round)
+        finally:
+            # Also saves the result, or the last good state if a call failed
+            self._save_checkpoint()
+
+    def _debate_rounds(self, ground_statement: str, jane_first: bool, round_num: int,
+                       resume_mid_round: bool) -> Generator[Tuple[str, str], str, None]:
+        """Round loop of _debate_turns, starting after round_num completed rounds."""
+        # Continue debating until someone surrenders
+        while True:
+            round_num += 1
+            print(f"\nRound {round_num}")
             
-            # Add hint about surrendering as rounds progress - stronger encouragement for the second debater
-            if round_num >= 4 and round_num < 7:
-                second_prompt += " Try to find strong counterarguments even if challenging. Or you can surrender if you truly cannot defend your position after careful consideration."
-            elif round_num >= 7 and round_num < 10:
-                second_prompt += f" We are at round {round_num} now. The debate has gone on for quite long. If you find yourself repeatedly making similar points or struggling to find new angles, this is a strong indication you should surrender. A wise debater knows when to concede to a stronger argument."
-            elif round_num >= 10:
-                second_prompt += f" This debate has reached round {round_num}, which is extremely long. At this point, if you haven't found a decisive winning argument, you MUST seriously evaluate surrendering. Continuing without new substantial points suggests you should concede. Please strongly consider surrendering now if you cannot make a breakthrough argument."
+            first_debater = "Jane" if jane_first else "Valentino"
+            if resume_mid_round:
+                # The first debater already spoke this round before the checkpoint
+                first_response = self.transcript.turns[-1][1]
+                resume_mid_round = False
+            else:
+                # Get the previous statement for the first debater to counter
+                previous = self.debate_history[-1] if self.debate_history else ground_statement
+                
+                # First debater's turn
+                first_prompt = self._budget_prompt(
+                    partial(self._opposing_prompt, ground_statement=ground_statement, round_num=round_num),
+                    previous, first_debater)
+                first_prompt += self._stale_hint()
+                    
+                first_response = yield first_prompt, first_debater
+                print(f"\n{first_debater}: {first_response}")
+                
+                self.transcript.add_turn(first_debater, first_response)
+                
+                if "surrender" in first_response.lower():
+                    print(f"\n{first_debater} has surrendered!")
+                    winner = "Valentino" if first_debater == "Jane" else "Jane"
+                    self.transcript.set_result(f"{first_debater} has surrendered! {winner} wins the debate.")
+                    return
                 
-            second_response = self.generate_response(second_prompt, second_debater)
+                if self._is_stale(first_debater, first_response, round_num):
+                    return
+                self._save_checkpoint()
+                
+            # Second debater's turn
+            second_debater = "Valentino" if jane_first else "Jane"
+            second_prompt = self._budget_prompt(
+                partial(self._supporting_prompt, ground_statement=ground_statement, round_num=round_num),
+                first_response, second_debater)
+            second_prompt += self._stale_hint()
+                
+            second_response = yield second_prompt, second_debater
             print(f"\n{second_debater}: {second_response}")
             
-            # Write second debater's response to file, ensuring consistent AI Debater numbering
-            with open('outputs/debate.txt', 'a', encoding='utf-8') as f:
-                # Jane is always AI Debater 1, Valentino is always AI Debater 2
-                debater_num = "1" if second_debater == "Jane" else "2"
-                f.write(f"AI Debater {debater_num}: {second_response}\n")
+            self.transcript.add_turn(second_debater, second_response)
             
             if "surrender" in second_response.lower():
                 print(f"\n{second_debater} has surrendered!")
-                with open('outputs/debate.txt', 'a', encoding='utf-8') as f:
-                    winner = "Jane" if second_debater == "Valentino" else "Valentino"
-                    f.write(f"Result: {second_debater} has surrendered! {winner} wins the debate.\n")
-                surrender_occurred = True
-                break
+                winner = "Jane" if second_debater == "Valentino" else "Valentino"
+                self.transcript.set_result(f"{second_debater} has surrendered! {winner} wins the debate.")
+                return
+            
+            if self._is_stale(second_debater, second_response, round_num):
+                return
+            self._save_checkpoint()
             
             # Add safety check for extremely long debates
             if round_num >= 20:  # Arbitrary large number as safety limit
                 print("\nDebate has gone on for too long (20 rounds). Ending as a draw.")
-                with open('outputs/debate.txt', 'a', encoding='utf-8') as f:
-                    f.write(f"Result: The debate continued for 20 rounds with no surrender. It's a draw!\n")
-                break
-
-        # Reformat the debate file for consistent formatting
-        reformat_debate_file()
-        
-        # Generate audio version of the debate if requested and not using existing audio
-        if generate_audio and not use_existing_audios:
-            print("\nGenerating audio version of the debate...")
-            asyncio.run(process_debate())
-        elif use_existing_audios:
-            print("\nUsing existing audio files. Skipping audio generation...")
+                self.transcript.set_result("The debate continued for 20 rounds with no surrender. It's a draw!")
+                return
             
-        # Generate video after audio processing (or using existing audio)
-        if generate_audio or use_existing_audios:
-            print("\nGenerating video visualization of the debate...")
-            create_debate_video(output_path='outputs/debate.mp4')
-        
-        # Prepare complete history for return
-        full_history = [ground_statement] + list(self.debate_history)
-        return full_history
+            if self.budget.exhausted(self.usage):
+                print(f"\nDebate has used its budget of {self.budget.max_debate_tokens} tokens. Ending as a draw.")
+                self.transcript.set_result(f"The debate continued for {round_num} rounds with no surrender. It's a draw!")
+                return
 
-    def generate_debate(self, jane_first: bool = True):
-        # Generate video title and description
-        video_title = self.generate_video_title(self.ground_statement)
-        video_description = self.generate_video_description(self.ground_statement, jane_first)
-        
+    def generate_debate(self, jane_first: bool = True, video_title: str = None, video_description: str = None):
+        # Generate video title and description unless they were fetched up front
+        if video_title is None:
+            video_title = self.generate_video_title(self.ground_statement)
+        if video_description is None:
+            video_description = self.generate_video_description(self.ground_statement, jane_first)
+        
+        self.jane_first = jane_first
+        self.video_title = video_title
+        self.video_description = video_description
         print(f"Video Title: {video_title}")
         print(f"Video Description: {video_description}\n")
         
         # Write title and description to video.txt file
-        with open('outputs/video.txt', 'w', encoding='utf-8') as vf:
+        with open(self.workspace.video_file, 'w', encoding='utf-8') as vf:
             vf.write(f"Title: {video_title}\n\n")
             vf.write(f"Description: {video_description}\n")
         
-        # More concise narrator introduction while still explaining everything
-        debate_text = "Narrator: Welcome to our AI debate. In this video, two AI debaters will discuss a ground statement, taking turns to present arguments from different perspectives, offering insights and counterpoints. If one debater finds their position indefensible, they may surrender. Let's begin with our ground statement.\n\n"
-        
-        # Add ground statement
-        debate_text += f"Ground Statement: {self.ground_statement}\n\n"
-        
-        # Add the summarized ground statement for display during the debate
-        if self.ground_statement_summary:
-            debate_text += f"Summary: {self.ground_statement_summary}\n\n"
-        
-        # Write debate to file
-        with open('outputs/debate.txt', 'w', encoding='utf-8') as f:
-            f.write(debate_text)
+        # Start the transcript with the narrator introduction, ground statement and display summary;
+        # turns are added in memory and debate.txt is written once the debate is over
+        self.transcript = Transcript(self.ground_statement, self.ground_statement_summary)
         
-        return debate_text
+        return self.transcript.to_text()
 
 if __name__ == "__main__":
     debater = AIDebater()
@@ -8,6 +8,7 @@ class AudioClip:
         self.file_path = file_path
         self.timing_data = timing_data or {"segments": []}
         self.segment_index = segment_index
+        self.metadata = {}
         self._duration = None
         
         # Load timing data if file path is provided
@@ -27,30 +28,49 @@ class AudioClip:
         return self._duration or 5.0
     
     @classmethod
-    def from_segment_index(cls, segment_index):
+    def from_segment_index(cls, segment_index, audio_dir='outputs/audio_output'):
         """Create an AudioClip from a segment index."""
         try:
-            audio_file = f'outputs/audio_output/part_{segment_index:02d}.mp3'
+            audio_file = os.path.join(audio_dir, f'part_{segment_index:02d}.mp3')
             if os.path.exists(audio_file):
                 return cls(audio_file, segment_index=segment_index)
             
             # Try to find by looking at available files
-            files = [f for f in os.listdir('outputs/audio_output') if f.endswith('.mp3') and not f.endswith('_timing.mp3')]
+            files = [f for f in os.listdir(audio_dir) if f.endswith('.mp3') and not f.endswith('_timing.mp3')]
             files.sort()
             if segment_index < len(files):
-                return cls(os.path.join('outputs/audio_output', files[segment_index]), segment_index=segment_index)
+                return cls(os.path.join(audio_dir, files[segment_index]), segment_index=segment_index)
             
             return None
         except Exception as e:
             print(f"Error getting segment audio file: {str(e)}")
             return None
     
+    @property
+    def timing_file(self):
+        """The _timing.json file next to the audio, whatever its format."""
+        return os.path.splitext(self.file_path)[0] + '_timing.json'
+    
+    def set_metadata(self, metadata):
+        """Attach speaker, text and model info, written by save()."""
+        self.metadata = dict(metadata)
+    
+    def save(self):
+        """Write the timing data and metadata back to the timing file."""
+        if not self.file_path:
+            return
+        data = dict(self.timing_data)
+        if self.metadata:
+            data["metadata"] = self.metadata
+        with open(self.timing_file, 'w') as f:
+            json.dump(data, f, indent=2)
+    
     def load_timing_data(self):
         """Load timing data for this audio clip."""
         if not self.file_path:
             return
             
-        timing_file = self.file_path.replace('.mp3', '_timing.json')
+        timing_file = self.timing_file
         
         try:
             if os.path.exists(timing_file):
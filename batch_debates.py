@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from ai_debate import AIDebater
+from debate_to_speech import process_debate
+from debate_to_video import create_debate_video
+from utils.audio_utils import warm_up_tts
+from utils.llm_backend import LLMBackend, OpenAIBackend
+from utils.llm_cache import CompletionCache
+from utils.rate_limiter import RateLimiter
+from utils.transcript import SPEAKER_LABELS, Transcript
+from utils.tts_cache import SpeechCache
+from utils.websocket_manager import close_connection_pools
+from utils.workspace import Workspace
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_DIR = os.path.join('outputs', 'batch')
+
+
+def _workspace_name(index: int, ground_statement: str) -> str:
+    """Build a readable, filesystem-safe directory name for a job."""
+    slug = re.sub(r'[^a-z0-9]+', '-', ground_statement.lower()).strip('-')[:40].rstrip('-')
+    return f"{index:03d}_{slug or 'debate'}"
+
+
+def _render_workspace(root: str, transcript: Transcript = None) -> None:
+    """Render the video for a workspace. Runs in a worker process."""
+    workspace = Workspace(root)
+    create_debate_video(
+        output_path=workspace.video_path,
+        debate_file=workspace.debate_file,
+        audio_dir=workspace.audio_dir,
+        frames_dir=workspace.frames_dir,
+        temp_dir=workspace.temp_dir,
+        transcript=transcript
+    )
+
+
+async def run_debate_job(ground_statement: str, workspace: Workspace, llm_limit: asyncio.Semaphore,
+                         tts_limit: asyncio.Semaphore, render_limit: asyncio.Semaphore,
+                         render_executor: ProcessPoolExecutor = None, jane_first: bool = True,
+                         generate_audio: bool = True, cache: CompletionCache = None,
+                         backend: LLMBackend = None, rate_limiter: RateLimiter = None,
+                         resume: bool = False, speech_cache: SpeechCache = None) -> Dict:
+    """Run the debate -> speech -> video pipeline for one ground statement.
+
+    Each stage waits for a slot in its own semaphore, so a job that is
+    rendering doesn't hold up another job that wants to start its debate.
+    With resume, a job whose workspace has a checkpoint continues that debate
+    instead of starting over.
+
+    Returns:
+        Dict describing the outcome of the job
+    """
+    job = {"ground_statement": ground_statement, "workspace": workspace.root, "status": "ok"}
+    start_time = time.time()
+    try:
+        workspace.create()
+        debater = AIDebater(workspace=workspace, cache=cache, backend=backend, rate_limiter=rate_limiter)
+
+        async with llm_limit:
+            if resume and os.path.exists(workspace.checkpoint_file):
+                history = await debater.resume_async(generate_audio=False)
+            else:
+                history = await debater.debate_async(ground_statement, generate_audio=False, jane_first=jane_first)
+        job["turns"] = len(history) - 1
+        job["llm_usage"] = debater.usage.totals()
+
+        if generate_audio:
+            async with tts_limit:
+                if not await process_debate(workspace.debate_file, workspace.audio_dir,
+                                            transcript=debater.transcript, speech_cache=speech_cache):
+                    raise RuntimeError("speech generation failed")
+
+            async with render_limit:
+                # Rendering keeps module-level frame state, so it runs in its own process
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(render_executor, _render_workspace, workspace.root,
+                                           debater.transcript)
+    except Exception as e:
+        logger.error(f"Debate job for {workspace.root} failed: {e}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+
+    job["elapsed"] = time.time() - start_time
+    return job
+
+
+async def run_batch(ground_statements: List[str], output_root: str = DEFAULT_BATCH_DIR,
+                    llm_concurrency: int = 4, tts_concurrency: int = 2, render_concurrency: int = 1,
+                    jane_first: bool = True, generate_audio: bool = True,
+                    cache: CompletionCache = None, backend: LLMBackend = None,
+                    rate_limiter: RateLimiter = None, resume: bool = False,
+                    speech_cache: SpeechCache = None) -> List[Dict]:
+    """Run several debates in parallel, each in its own workspace under output_root.
+
+    Args:
+        ground_statements: Topics to debate, one job per statement
+        output_root: Directory that receives one workspace per job
+        llm_concurrency: Maximum number of debates generating text at once
+        tts_concurrency: Maximum number of debates synthesizing speech at once
+        render_concurrency: Maximum number of videos rendering at once
+        jane_first: Whether Jane speaks first in every debate
+        generate_audio: Whether to run the speech and video stages
+        cache: Completion cache shared by every debate in the batch
+        backend: LLM backend shared by every debate (defaults to the OpenAI API)
+        rate_limiter: Request scheduler shared by every debate, so the batch as a
+            whole stays under the provider's limits
+        resume: Continue debates from the checkpoints of an interrupted run
+        speech_cache: Synthesized segment cache shared by every debate, so repeated
+            lines like the narrator's intro are only synthesized once
+
+    Returns:
+        List of job results, in the same order as ground_statements
+    """
+    rate_limiter = rate_limiter or RateLimiter()
+    llm_limit = asyncio.Semaphore(llm_concurrency)
+    tts_limit = asyncio.Semaphore(tts_concurrency)
+    render_limit = asyncio.Semaphore(render_concurrency)
+    # The debaters don't presynthesize in a batch, so the TTS models are loaded here while the rounds run
+    warm_up = asyncio.ensure_future(warm_up_tts(["Narrator"] + list(SPEAKER_LABELS))) if generate_audio else None
+
+    # A fresh worker per render keeps MoviePy memory from leaking between jobs where the pool supports it
+    # (Python 3.11+); frame state is reset by every render either way
+    pool_options = {"max_tasks_per_child": 1} if sys.version_info >= (3, 11) else {}
+    with ProcessPoolExecutor(max_workers=render_concurrency, **pool_options) as render_executor:
+        jobs = [
+            run_debate_job(
+                statement,
+                Workspace(os.path.join(output_root, _workspace_name(i, statement))),
+                llm_limit, tts_limit, render_limit,
+                render_executor=render_executor,
+                jane_first=jane_first,
+                generate_audio=generate_audio,
+                cache=cache,
+                backend=backend,
+                rate_limiter=rate_limiter,
+                resume=resume,
+                speech_cache=speech_cache
+            )
+            for i, statement in enumerate(ground_statements)
+        ]
+        results = await asyncio.gather(*jobs)
+    if warm_up is not None:
+        await warm_up
+    await close_connection_pools()
+
+    failed = sum(1 for job in results if job["status"] != "ok")
+    print(f"Batch complete: {len(results) - failed}/{len(results)} debates succeeded")
+    if rate_limiter.retries or rate_limiter.wait_time:
+        print(f"Rate limiting: {rate_limiter.retries} retries, {rate_limiter.wait_time:.1f}s spent waiting")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate several AI debates in parallel.")
+    parser.add_argument("statements_file", help="Text file with one ground statement per line")
+    parser.add_argument("--output-root", default=DEFAULT_BATCH_DIR)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--tts-concurrency", type=int, default=2)
+    parser.add_argument("--render-concurrency", type=int, default=1)
+    parser.add_argument("--valentino-first", action="store_true")
+    parser.add_argument("--text-only", action="store_true", help="Skip speech and video generation")
+    parser.add_argument("--llm-cache", metavar="DIR", help="Cache LLM completions in this directory")
+    parser.add_argument("--replay", action="store_true",
+                        help="Only use cached completions; fail instead of calling the API")
+    parser.add_argument("--llm-base-url", help="OpenAI-compatible endpoint to use, e.g. the local stub server")
+    parser.add_argument("--rpm", type=float, default=500, help="Provider requests-per-minute limit")
+    parser.add_argument("--tpm", type=float, default=200000, help="Provider tokens-per-minute limit")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue interrupted debates from their checkpoints in --output-root")
+    parser.add_argument("--tts-cache", metavar="DIR", help="Cache synthesized segments in this directory")
+    parser.add_argument("--tts-cache-size", type=int, default=2048, metavar="MB",
+                        help="Disk quota of the TTS cache; least recently used segments are evicted")
+    args = parser.parse_args()
+
+    cache = None
+    if args.llm_cache or args.replay:
+        cache = CompletionCache(args.llm_cache or os.path.join('outputs', 'llm_cache'), replay=args.replay)
+    speech_cache = None
+    if args.tts_cache:
+        speech_cache = SpeechCache(args.tts_cache, max_bytes=args.tts_cache_size * 1024 * 1024)
+
+    with open(args.statements_file, 'r', encoding='utf-8') as f:
+        statements = [line.strip() for line in f if line.strip()]
+
+    asyncio.run(run_batch(
+        statements,
+        output_root=args.output_root,
+        llm_concurrency=args.llm_concurrency,
+        tts_concurrency=args.tts_concurrency,
+        render_concurrency=args.render_concurrency,
+        jane_first=not args.valentino_first,
+        generate_audio=not args.text_only,
+        cache=cache,
+        backend=OpenAIBackend.from_base_url(args.llm_base_url) if args.llm_base_url else None,
+        rate_limiter=RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm),
+        resume=args.resume,
+        speech_cache=speech_cache
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@ import os
 import logging
 import asyncio
 from utils.file_utils import parse_debate_file
-from utils.audio_utils import generate_debate_speech
+from utils.audio_utils import SpeechPrefetcher, generate_debate_speech
+from utils.transcript import Transcript
+from utils.tts_cache import SpeechCache
+from utils.websocket_manager import close_pools_after
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -12,15 +15,34 @@ logger = logging.getLogger(__name__)
 OUTPUT_DIR = 'outputs/audio_output'
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-async def process_debate() -> bool:
-    """Process debate file and generate speech."""
+async def process_debate(debate_file: str = 'outputs/debate.txt', output_dir: str = OUTPUT_DIR,
+                         transcript: Transcript = None, prefetcher: SpeechPrefetcher = None,
+                         speech_cache: SpeechCache = None) -> bool:
+    """Process debate file and generate speech.
+    
+    Args:
+        debate_file: Path to the debate transcript
+        output_dir: Directory to save the generated audio files
+        transcript: In-memory transcript to speak; debate_file is only parsed when it isn't given
+        prefetcher: Segments that were already synthesized in the background during the debate
+        speech_cache: Cache of segments synthesized before, e.g. shared by a batch of debates
+    """
     try:
-        # Use the existing parse_debate_file utility function
-        segments = parse_debate_file()
+        if transcript is not None:
+            segments = transcript.segments
+        else:
+            # Use the existing parse_debate_file utility function
+            segments = parse_debate_file(debate_file)
         
         # Use the utility function to generate speech
-        success = await generate_debate_speech(segments, OUTPUT_DIR)
+        success = await generate_debate_speech(segments, output_dir, prefetcher=prefetcher,
+                                               speech_cache=speech_cache)
         return success
     except Exception as e:
         logger.error(f"Error in process_debate: {e}")
-        return False
\ No newline at end of file
+        return False
+
+if __name__ == "__main__":
+    # Speak outputs/debate.txt; point TTS_SERVER_URI at another server, e.g. utils/tts_stub_server.py
+    if not asyncio.run(close_pools_after(process_debate())):
+        raise SystemExit(1)
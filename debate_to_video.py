@@ -7,13 +7,16 @@ from moviepy import VideoFileClip
 from tqdm import tqdm
 
 
-from utils.file_utils import parse_debate_file, cleanup_temp_files
+from utils.file_utils import parse_debate_file, get_ground_statement_summary, cleanup_temp_files
 from utils.audio_utils import get_segment_audio_file
-from utils.video_utils import create_segment_video, combine_video_segments
+from utils.video_utils import create_segment_video, combine_video_segments, reset_frame_state
+from utils.transcript import Transcript
 from config import TEMP_FRAMES_DIR, PROJECT_TEMP_DIR
 
 def create_debate_video(output_path='outputs/debate.mp4', mode='fast', batch_size=30, 
-                       add_bg_music=True, bg_music_file="assets/background_music.mp3", bg_volume=0.15):
+                       add_bg_music=True, bg_music_file="assets/background_music.mp3", bg_volume=0.15,
+                       debate_file='outputs/debate.txt', audio_dir='outputs/audio_output',
+                       frames_dir=TEMP_FRAMES_DIR, temp_dir=PROJECT_TEMP_DIR, transcript: Transcript = None):
     """Create a video visualization of the debate with audio.
     
     Args:
@@ -23,6 +26,11 @@ def create_debate_video(output_path='outputs/debate.mp4', mode='fast', batch_siz
         add_bg_music: Whether to add background music
         bg_music_file: Path to background music file
         bg_volume: Volume level for background music (0.0 to 1.0)
+        debate_file: Path to the debate transcript
+        audio_dir: Directory holding the generated segment audio
+        frames_dir: Directory for temporary per-segment videos
+        temp_dir: Directory for MoviePy temporary files
+        transcript: In-memory transcript to render; debate_file is only parsed when it isn't given
     """
     print("\n=== Starting Video Generation Process ===")
     start_time = time.time()
@@ -31,16 +39,24 @@ def create_debate_video(output_path='outputs/debate.mp4', mode='fast', batch_siz
     if os.name == 'nt':
         mp.set_start_method('spawn', force=True)
     
-    # Parse the debate file
+    # Take the segments from the transcript, or parse the debate file
     print("Step 1: Parsing dialogue segments...")
     segment_start = time.time()
-    dialogue_segments = parse_debate_file()
+    if transcript is not None:
+        dialogue_segments = transcript.segments
+        summary = transcript.summary
+    else:
+        dialogue_segments = parse_debate_file(debate_file)
+        summary = get_ground_statement_summary(debate_file)
     print(f"  √ Parsed {len(dialogue_segments)} dialogue segments in {time.time() - segment_start:.2f} seconds")
     
     if not dialogue_segments:
         print("No dialogue segments found. Aborting video creation.")
         return
     
+    # Start from a clean narrator state in case this process rendered a debate before
+    reset_frame_state(summary)
+    
     try:
         # Check if background music exists
         if add_bg_music and not os.path.exists(bg_music_file):
@@ -60,21 +76,21 @@ def create_debate_video(output_path='outputs/debate.mp4', mode='fast', batch_siz
             clip_generation_start = time.time()
             
             # Get audio file for this segment
-            audio_file = get_segment_audio_file(i)
+            audio_file = get_segment_audio_file(i, audio_dir)
             if not audio_file or not os.path.exists(audio_file):
                 print(f"Warning: No audio file found for segment {i}")
                 continue
             
             # Create video clip for this segment with temp_dir
-            clip = create_segment_video(i, speaker, text, audio_file, mode=mode, temp_dir=PROJECT_TEMP_DIR)
+            clip = create_segment_video(i, speaker, text, audio_file, mode=mode, temp_dir=temp_dir)
             if clip:
                 segment_clips.append(clip)
             
             # Process in batches to save memory
             if len(segment_clips) >= batch_size:
-                batch_output = os.path.join(PROJECT_TEMP_DIR, f"batch_{i//batch_size}.mp4")
+                batch_output = os.path.join(temp_dir, f"batch_{i//batch_size}.mp4")
                 print(f"  - Processing batch {i//batch_size + 1}...")
-                combine_video_segments(segment_clips, batch_output, mode=mode, temp_dir=PROJECT_TEMP_DIR)
+                combine_video_segments(segment_clips, batch_output, mode=mode, temp_dir=temp_dir, frames_dir=frames_dir)
                 segment_clips = [VideoFileClip(batch_output)]
                 gc.collect()  # Force garbage collection to free memory
             
@@ -102,10 +118,11 @@ def create_debate_video(output_path='outputs/debate.mp4', mode='fast', batch_siz
                 segment_clips, 
                 output_path, 
                 mode=mode, 
-                temp_dir=PROJECT_TEMP_DIR,
+                temp_dir=temp_dir,
                 add_bg_music=add_bg_music,
                 bg_music_file=bg_music_file,
-                bg_volume=bg_volume
+                bg_volume=bg_volume,
+                frames_dir=frames_dir
             )
             print(f"  √ Concatenated clips in {time.time() - concat_start:.2f} seconds")
         else:
@@ -119,7 +136,7 @@ def create_debate_video(output_path='outputs/debate.mp4', mode='fast', batch_siz
         time.sleep(2)
         
         # Clean up temporary files
-        cleanup_temp_files(TEMP_FRAMES_DIR, PROJECT_TEMP_DIR)
+        cleanup_temp_files(frames_dir, temp_dir)
         
         # Force garbage collection
         gc.collect()
@@ -1,3 +1,4 @@
+import os
 import pytest
 from unittest.mock import Mock, patch, mock_open
 from ai_debate import AIDebater
@@ -128,13 +129,13 @@ AI Debater 2: Counter argument"""
     debate_file.write_text(content)
     
     with patch('ai_debate.open', mock_open(read_data=content)):
-        with patch('asyncio.run') as mock_run:  # Mock asyncio.run instead of process_debate
+        with patch('ai_debate.process_debate') as mock_process:
             with patch('ai_debate.reformat_debate_file'):
                 with patch('ai_debate.create_debate_video'):
                     debater = AIDebater()
                     results = debater.debate("Test", use_existing_scripts=True)
                     assert len(results) > 0
-                    mock_run.assert_called_once()
+                    mock_process.assert_awaited_once()
 
 @patch('ai_debate.OpenAI')
 def test_summarize_ground_statement(mock_openai):
@@ -223,23 +224,105 @@ def test_generate_debate():
     with patch('builtins.open', create=True) as mock_open:
         with patch('ai_debate.AIDebater.generate_video_title', return_value="2 AIs Debate About Test Topic"):
             with patch('ai_debate.AIDebater.generate_video_description', return_value="Test description"):
-                mock_file = Mock()
                 mock_file_video = Mock()
-                mock_open.return_value.__enter__.side_effect = [mock_file_video, mock_file]
+                mock_open.return_value.__enter__.side_effect = [mock_file_video]
                 
                 debate_text = debater.generate_debate()
                 
                 assert "Welcome to our AI debate" in debate_text
                 assert "Test statement" in debate_text
                 assert "Test summary" in debate_text
-                mock_file.write.assert_called()
                 mock_file_video.write.assert_called()
+                # debate.txt is only written once the debate is over
+                mock_open.assert_called_once()
+                assert debater.transcript.summary == "Test summary"
+
+def test_transcript_segments_match_parsed_file(tmp_path):
+    """Test that the in-memory segments are what parsing the saved debate.txt gives."""
+    from utils.file_utils import parse_debate_file
+    from utils.transcript import Transcript
+    
+    transcript = Transcript("AI will replace programmers", "AI vs programmers")
+    transcript.add_turn("Jane", "Programmers adapt.\nThey always have.")
+    transcript.add_turn("Valentino", "Adaptation has limits.")
+    transcript.add_turn("Jane", "I surrender")
+    transcript.set_result("Jane has surrendered! Valentino wins the debate.")
+    
+    debate_file = tmp_path / "debate.txt"
+    transcript.save(str(debate_file))
+    
+    assert transcript.segments == parse_debate_file(str(debate_file))
+    assert transcript.segments[1] == {"speaker": "Jane", "text": "Programmers adapt. They always have."}
+    
+    loaded = Transcript.load(str(debate_file))
+    assert loaded.to_text() == transcript.to_text()
+    assert loaded.turns == transcript.turns
+
+def test_debate_file_is_parsed_once_until_it_changes(tmp_path):
+    """Test that every reader of debate.txt shares one cached parse."""
+    from utils.audio_utils import parse_debate
+    from utils.file_utils import parse_debate_file, get_ground_statement_summary, reformat_debate_file
+    from utils import transcript as transcript_module
+
+    debate_file = tmp_path / "debate.txt"
+    debate_file.write_text(
+        "Narrator: Welcome.\nGround Statement: Cats beat dogs\nSummary: Cats vs dogs\n"
+        "AI Debater 1: Cats are calm.\nThey nap a lot.\nAI Debater 2: Dogs are loyal.\n"
+        "Result: It's a draw!", encoding="utf-8")
+    path = str(debate_file)
+
+    with patch('utils.transcript.parse_debate_text', wraps=transcript_module.parse_debate_text) as parser:
+        segments = parse_debate_file(path)
+        assert get_ground_statement_summary(path) == "Cats vs dogs"
+        assert parse_debate(path)[3] == {"speaker": "AI Debater 1", "text": "Cats are calm. They nap a lot."}
+        assert reformat_debate_file(path)
+        assert parse_debate_file(path) == segments
+        assert parser.call_count == 1
+
+        # Callers get copies, not the cached segments
+        segments[0]["text"] = "Changed"
+        assert parse_debate_file(path)[0]["text"] == "Welcome. Ground Statement: Cats beat dogs"
+
+        debate_file.write_text("Narrator: A different debate.", encoding="utf-8")
+        os.utime(path, ns=(0, 0))
+        assert parse_debate_file(path) == [{"speaker": "Narrator", "text": "A different debate."}]
+        assert parser.call_count == 2
+
+    assert debate_file.read_text(encoding="utf-8") == "Narrator: A different debate."
+    assert segments[1] == {"speaker": "Jane", "text": "Cats are calm. They nap a lot."}
+
+def test_debate_builds_transcript_in_memory(tmp_path):
+    """Test that turns stay in memory and debate.txt is written once at the end."""
+    from utils.workspace import Workspace
+    
+    workspace = Workspace(str(tmp_path)).create()
+    debater = AIDebater(workspace=workspace, presynthesize=False)
+    debater.summarize_ground_statement = Mock(return_value="Summary")
+    debater.generate_video_title = Mock(return_value="Title")
+    debater.generate_video_description = Mock(return_value="Description")
+    responses = iter(["First argument", "Second argument", "I surrender"])
+    
+    def respond(prompt, debater_name, **kwargs):
+        # Nothing is written to debate.txt while the debate is running
+        assert not os.path.exists(workspace.debate_file)
+        return next(responses)
+    
+    debater.generate_response = Mock(side_effect=respond)
+    with patch('ai_debate.process_debate') as mock_process:
+        with patch('ai_debate.create_debate_video') as mock_create_video:
+            debater.debate("Test statement")
+    
+    assert mock_process.call_args.kwargs["transcript"] is debater.transcript
+    assert mock_create_video.call_args.kwargs["transcript"] is debater.transcript
+    assert [speaker for speaker, _ in debater.transcript.turns] == ["Jane", "Valentino", "Jane"]
+    with open(workspace.debate_file, encoding='utf-8') as f:
+        assert f.read() == debater.transcript.to_text()
 
 @patch('ai_debate.OpenAI')
-@patch('ai_debate.asyncio.run')
+@patch('ai_debate.process_debate')
 @patch('ai_debate.create_debate_video')
 @patch('builtins.open', new_callable=mock_open)
-def test_debate_full_process(mock_file, mock_create_video, mock_asyncio, mock_openai):
+def test_debate_full_process(mock_file, mock_create_video, mock_process, mock_openai):
     """Test full debate process with surrender."""
     # Setup mocks
     mock_client = Mock()
@@ -261,12 +344,12 @@ def test_debate_full_process(mock_file, mock_create_video, mock_asyncio, mock_op
         response1, response2, response3
     ]
     
-    debater = AIDebater()
+    debater = AIDebater(presynthesize=False)
     results = debater.debate("Test statement", jane_first=True)
     
     # Verify results
     assert "surrender" in results
-    assert mock_asyncio.called
+    assert mock_process.called
     assert mock_create_video.called
     assert mock_file().write.called
 
@@ -280,4 +363,679 @@ def test_debate_with_existing_audio():
                 assert len(results) > 0
                 mock_create_video.assert_called_once()
                 # Ensure process_debate wasn't called (because we're using existing audio)
-                assert not any('process_debate' in str(c) for c in mock_create_video.mock_calls)
\ No newline at end of file
+                assert not any('process_debate' in str(c) for c in mock_create_video.mock_calls)
+
+@pytest.mark.asyncio
+async def test_prepare_debate_async_runs_requests_concurrently():
+    """Test that summary, title and description requests overlap."""
+    import asyncio
+    in_flight = 0
+    max_in_flight = 0
+    contents = {0.3: "Test Summary", 60: "Two AIs Debate About Test", 150: "Test Description"}
+    
+    async def mock_create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        key = kwargs["temperature"] if kwargs["temperature"] == 0.3 else kwargs["max_tokens"]
+        return Mock(choices=[Mock(message=Mock(content=contents[key]))])
+    
+    with patch('ai_debate.OpenAI'), patch('ai_debate.AsyncOpenAI') as mock_async_openai:
+        mock_async_openai.return_value.chat.completions.create = mock_create
+        debater = AIDebater()
+        summary, title, description = await debater.prepare_debate_async("Test statement")
+    
+    assert max_in_flight == 3
+    assert summary == "Test Summary"
+    assert title == "Two AIs Debate About Test"
+    assert description == "Test Description"
+
+@patch('ai_debate.OpenAI')
+def test_completion_cache_skips_repeated_requests(mock_openai, tmp_path):
+    """Test that an identical request is answered from the completion cache."""
+    from utils.llm_cache import CompletionCache
+    mock_client = Mock()
+    mock_openai.return_value = mock_client
+    mock_client.chat.completions.create.return_value = Mock(choices=[Mock(message=Mock(content="Test response"))])
+    
+    cache = CompletionCache(str(tmp_path))
+    assert AIDebater(cache=cache).generate_response("Test prompt", "Jane") == "Test response"
+    assert AIDebater(cache=cache).generate_response("Test prompt", "Jane") == "Test response"
+    
+    mock_client.chat.completions.create.assert_called_once()
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+@patch('ai_debate.OpenAI')
+def test_completion_cache_replay_mode(mock_openai, tmp_path):
+    """Test that replay mode serves recorded completions and never calls the API."""
+    from utils.llm_cache import CacheMissError, CompletionCache
+    mock_client = Mock()
+    mock_openai.return_value = mock_client
+    mock_client.chat.completions.create.return_value = Mock(choices=[Mock(message=Mock(content="Summarized statement"))])
+    AIDebater(cache=CompletionCache(str(tmp_path))).summarize_ground_statement("Statement")
+    mock_client.chat.completions.create.reset_mock()
+    
+    debater = AIDebater(cache=CompletionCache(str(tmp_path), replay=True))
+    assert debater.summarize_ground_statement("Statement") == "Summarized statement"
+    with pytest.raises(CacheMissError):
+        debater.summarize_ground_statement("Another statement")
+    mock_client.chat.completions.create.assert_not_called()
+
+def test_completion_cache_evicts_least_recently_used(tmp_path):
+    """Test that the cache drops the least recently used entry when over its size limit."""
+    import os
+    import time
+    from utils.llm_cache import CompletionCache
+    requests = [{"model": "gpt-4o-mini", "messages": [{"role": "user", "content": f"Prompt {i}"}],
+                 "temperature": 0.8, "max_tokens": 500} for i in range(3)]
+    
+    cache = CompletionCache(str(tmp_path), max_bytes=10 ** 6)
+    for request in requests[:2]:
+        cache.put(request, "x" * 100)
+        time.sleep(0.01)
+    entry_size = os.path.getsize(os.path.join(str(tmp_path), cache.make_key(requests[0]) + ".json"))
+    cache.max_bytes = entry_size * 2
+    
+    # Touch the first entry so the second one becomes the least recently used
+    assert cache.get(requests[0]) == "x" * 100
+    cache.put(requests[2], "x" * 100)
+    
+    assert cache.get(requests[0]) is not None
+    assert cache.get(requests[1]) is None
+    assert cache.get(requests[2]) is not None
+
+def test_completion_cache_concurrent_puts_of_the_same_request(tmp_path):
+    """Test that threads storing the same request at once don't collide on the temp file."""
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.llm_cache import CompletionCache
+    request = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Prompt"}],
+               "temperature": 0.8, "max_tokens": 500}
+    
+    cache = CompletionCache(str(tmp_path))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(cache.put, request, "x" * 10000) for _ in range(64)]:
+            future.result()
+    
+    assert cache.get(request) == "x" * 10000
+    assert os.listdir(str(tmp_path)) == [cache.make_key(request) + ".json"]
+    
+    # Distinct requests stored at once are all counted in the running size
+    requests = [dict(request, temperature=i / 100) for i in range(64)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(cache.put, r, "y" * 1000) for r in requests]:
+            future.result()
+    assert cache._total_bytes == sum(size for _, size, _ in cache._entries())
+
+class _FakeStream:
+    """Stand-in for an OpenAI completion stream that records how far it was read."""
+    
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+    
+    def __iter__(self):
+        for piece in self.pieces:
+            self.consumed += 1
+            yield Mock(choices=[Mock(delta=Mock(content=piece))])
+    
+    def close(self):
+        self.closed = True
+
+@patch('ai_debate.OpenAI')
+def test_generate_response_streams_sentences(mock_openai):
+    """Test that streaming hands over each sentence as soon as it is finished."""
+    mock_client = Mock()
+    mock_openai.return_value = mock_client
+    stream = _FakeStream(["AI is a tool. It helps", " people code! Yet humans", " still decide"])
+    mock_client.chat.completions.create.return_value = stream
+    
+    sentences = []
+    debater = AIDebater()
+    response = debater.generate_response("Test prompt", "Jane", stream=True, on_sentence=sentences.append)
+    
+    assert sentences == ["AI is a tool.", "It helps people code!", "Yet humans still decide"]
+    assert response == "AI is a tool. It helps people code! Yet humans still decide"
+    args, kwargs = mock_client.chat.completions.create.call_args
+    assert kwargs["stream"] is True
+    assert stream.closed
+
+@patch('ai_debate.OpenAI')
+def test_generate_response_stream_stops_on_surrender(mock_openai):
+    """Test that streaming stops reading the completion once a surrender phrase appears."""
+    mock_client = Mock()
+    mock_openai.return_value = mock_client
+    stream = _FakeStream(["You make a fair point. I con", "cede the debate.", " But first", " a long speech"])
+    mock_client.chat.completions.create.return_value = stream
+    
+    sentences = []
+    debater = AIDebater()
+    response = debater.generate_response("Test prompt", "Jane", stream=True, on_sentence=sentences.append)
+    
+    assert response == "surrender"
+    assert stream.consumed == 2
+    assert stream.closed
+    assert sentences == ["You make a fair point."]
+    assert debater.debate_history[-1] == "surrender"
+
+@patch('ai_debate.OpenAI')
+def test_interrupted_stream_is_not_cached(mock_openai, tmp_path):
+    """Test that a stream that fails partway through doesn't leave a truncated turn in the cache."""
+    from utils.llm_cache import CompletionCache
+    
+    class FailingStream(_FakeStream):
+        def __iter__(self):
+            yield from super().__iter__()
+            raise ConnectionError("stream dropped")
+    
+    mock_client = Mock()
+    mock_openai.return_value = mock_client
+    mock_client.chat.completions.create.return_value = FailingStream(["AI is a tool. It hel"])
+    cache = CompletionCache(str(tmp_path))
+    debater = AIDebater(cache=cache)
+    request = debater._response_request("Test prompt", "Jane")
+    with pytest.raises(ConnectionError):
+        list(debater._stream_completion(request))
+    assert os.listdir(str(tmp_path)) == []
+    
+    # A consumer that raises closes the stream early, which isn't a finished answer either
+    def failing_callback(sentence):
+        raise RuntimeError("speech queue full")
+    
+    mock_client.chat.completions.create.return_value = _FakeStream(["First sentence. ", "Second sentence."])
+    with patch.object(debater, '_response_request', return_value=request), pytest.raises(RuntimeError):
+        debater.generate_response("Test prompt", "Jane", stream=True, on_sentence=failing_callback)
+    assert os.listdir(str(tmp_path)) == []
+    pieces = debater._stream_completion(request)
+    assert next(pieces) == "First sentence. "
+    pieces.close()
+    assert os.listdir(str(tmp_path)) == []
+    
+    # Stopping the stream on purpose, as the surrender cut-off does, keeps what was received
+    mock_client.chat.completions.create.return_value = _FakeStream(["I concede.", " But first"])
+    assert list(debater._stream_completion(request, stop=lambda: True)) == ["I concede."]
+    assert cache.get(request) == "I concede."
+
+@patch('ai_debate.OpenAI')
+def test_turn_cut_off_at_max_tokens_ends_at_its_last_sentence(mock_openai, tmp_path):
+    """Test that an answer that hit max_tokens loses its unfinished sentence everywhere it goes."""
+    from utils.llm_cache import CompletionCache
+    
+    class CutOffStream(_FakeStream):
+        def __iter__(self):
+            yield from super().__iter__()
+            yield Mock(choices=[Mock(delta=Mock(content=None), finish_reason="length")])
+    
+    mock_client = Mock()
+    mock_openai.return_value = mock_client
+    cache = CompletionCache(str(tmp_path))
+    debater = AIDebater(cache=cache)
+    
+    mock_client.chat.completions.create.return_value = Mock(
+        choices=[Mock(message=Mock(content="Taxes fund roads. And schools th"), finish_reason="length")])
+    assert debater.generate_response("Plain prompt", "Jane") == "Taxes fund roads."
+    
+    sentences = []
+    request = debater._response_request("Streamed prompt", "Jane")
+    mock_client.chat.completions.create.return_value = CutOffStream(["Taxes fund roads. ", "And schools th"])
+    assert debater.generate_response("Streamed prompt", "Jane", stream=True,
+                                     on_sentence=sentences.append) == "Taxes fund roads."
+    assert sentences == ["Taxes fund roads."]
+    assert cache.get(request) == "Taxes fund roads."
+    
+    # Replaying the cached turn hands over the same sentences
+    replayed = []
+    assert debater.generate_response("Streamed prompt", "Jane", stream=True,
+                                     on_sentence=replayed.append) == "Taxes fund roads."
+    assert replayed == sentences
+
+def test_custom_backend_handles_every_llm_call():
+    """Test that a custom backend receives every LLM call made by AIDebater."""
+    from utils.llm_backend import LLMBackend
+    
+    class RecordingBackend(LLMBackend):
+        def __init__(self):
+            self.requests = []
+        
+        def complete(self, request):
+            self.requests.append(request)
+            return "Backend answer"
+    
+    backend = RecordingBackend()
+    debater = AIDebater(backend=backend)
+    debater.summarize_ground_statement("Statement")
+    debater.generate_video_title("Statement")
+    debater.generate_video_description("Statement")
+    assert debater.generate_response("Test prompt", "Jane", stream=True) == "Backend answer"
+    
+    assert [request["max_tokens"] for request in backend.requests] == [60, 60, 150, 500]
+
+def test_stub_server_through_openai_backend():
+    """Test a debate turn against the local stand-in server, plain and streamed."""
+    from utils.llm_backend import OpenAIBackend
+    from utils.llm_stub_server import StubLLMServer
+    
+    with StubLLMServer() as server:
+        debater = AIDebater(backend=OpenAIBackend.from_base_url(server.base_url))
+        first = debater.generate_response("Counter this argument: AI is good", "Jane")
+        sentences = []
+        streamed = debater.generate_response("Counter this argument: AI is good", "Jane",
+                                             stream=True, on_sentence=sentences.append)
+    
+    # Same request, same answer, whether streamed or not
+    assert first == streamed
+    assert " ".join(sentences) == first
+    assert server.request_count == 2
+
+def test_stub_server_surrender_probability():
+    """Test that the stand-in server only surrenders on debater turn prompts."""
+    from utils.llm_backend import OpenAIBackend
+    from utils.llm_stub_server import StubLLMServer
+    
+    with StubLLMServer(surrender_probability=1.0) as server:
+        debater = AIDebater(backend=OpenAIBackend.from_base_url(server.base_url))
+        assert debater.generate_response("Counter this argument: AI is good", "Jane", stream=True) == "surrender"
+        assert "surrender" not in debater.summarize_ground_statement("AI is good").lower()
+
+def test_stub_server_reports_cut_off_turns():
+    """Test that a stand-in answer cut off at max_tokens ends at its last finished sentence."""
+    from utils.llm_backend import OpenAIBackend
+    from utils.llm_stub_server import StubLLMServer
+    from utils.token_budget import TokenBudget
+    
+    budget = TokenBudget(min_completion_tokens=15, max_completion_tokens=15)
+    with StubLLMServer() as server:
+        backend = OpenAIBackend.from_base_url(server.base_url)
+        debater = AIDebater(backend=backend, budget=budget)
+        request = debater._response_request("Counter this argument: AI is good", "Jane")
+        raw = backend.complete(request)
+        first = debater.generate_response("Counter this argument: AI is good", "Jane")
+        streamed = debater.generate_response("Counter this argument: AI is good", "Jane", stream=True)
+    
+    assert raw.finish_reason == "length"
+    assert not raw.endswith(".")
+    assert first == streamed
+    assert raw.startswith(first) and first.endswith(".")
+    
+    # An answer that ends exactly at max_tokens wasn't cut off
+    request = {"messages": [{"role": "user", "content": "Counter this argument: AI is good"}], "max_tokens": 500}
+    tokens, finish_reason = server.generate_tokens(request)
+    assert finish_reason == "stop"
+    assert server.generate_tokens(dict(request, max_tokens=len(tokens))) == (tokens, "stop")
+
+def test_token_budget_adapts_max_tokens_and_trims_prompt(tmp_path):
+    """Test that max_tokens follows observed turn lengths and long arguments are trimmed."""
+    from utils.llm_backend import LLMBackend
+    from utils.token_budget import TokenBudget, count_message_tokens
+    from utils.transcript import Transcript
+    from utils.workspace import Workspace
+    
+    class RecordingBackend(LLMBackend):
+        def __init__(self):
+            self.requests = []
+        
+        def complete(self, request):
+            self.requests.append(request)
+            return "A short counterargument. " * 10
+    
+    backend = RecordingBackend()
+    debater = AIDebater(workspace=Workspace(str(tmp_path)).create(), backend=backend,
+                        budget=TokenBudget(prompt_tokens=600, min_completion_tokens=50))
+    debater.transcript = Transcript("Ground statement")
+    turns = debater._debate_turns("Ground statement", jane_first=True)
+    
+    prompt, speaker = next(turns)
+    for _ in range(3):
+        prompt, speaker = turns.send(debater.generate_response(prompt, speaker))
+    
+    # Before any turn was observed the ceiling is used, then max_tokens shrinks to fit the answers
+    assert backend.requests[0]["max_tokens"] == 500
+    assert 50 <= backend.requests[-1]["max_tokens"] < 500
+    
+    huge_argument = "This point needs a very long explanation. " * 500
+    prompt = debater._budget_prompt(
+        lambda argument: debater._supporting_prompt(argument, "Ground statement", 1), huge_argument, "Valentino")
+    request = debater._response_request(prompt, "Valentino")
+    assert count_message_tokens(request["messages"], estimate=True) <= 600
+    assert "..." in prompt
+
+def test_debate_recorded_with_tokenizer_replays_without_it(tmp_path):
+    """Test that max_tokens and prompt trimming don't depend on whether tiktoken loads its vocabulary."""
+    import json
+    from utils.llm_backend import LLMBackend
+    from utils.llm_cache import CompletionCache
+    from utils.token_budget import TokenBudget
+    from utils.workspace import Workspace
+    
+    class WordEncoding:
+        """Tokenizer stand-in that counts very differently from the length estimate."""
+        def encode(self, text):
+            return text.split(" ")
+        
+        def decode(self, tokens):
+            return " ".join(tokens)
+    
+    class ArguingBackend(LLMBackend):
+        def __init__(self):
+            self.turns = 0
+        
+        def complete(self, request):
+            if "Counter this argument" not in request["messages"][-1]["content"]:
+                return "Meta"
+            self.turns += 1
+            return "I surrender" if self.turns == 6 else f"Point {self.turns} deserves a long explanation. " * 30
+    
+    class OfflineBackend(LLMBackend):
+        def complete(self, request):
+            raise AssertionError("Replay reached the backend")
+    
+    def run(backend, cache, encoding, name):
+        debater = AIDebater(workspace=Workspace(str(tmp_path / name)).create(), cache=cache, backend=backend,
+                            budget=TokenBudget(prompt_tokens=400), presynthesize=False)
+        with patch('utils.token_budget._get_encoding', return_value=encoding):
+            debater.debate("Test statement", generate_audio=False, jane_first=True)
+        return debater.transcript.to_text()
+    
+    cache_dir = str(tmp_path / "cache")
+    recorded = run(ArguingBackend(), CompletionCache(cache_dir), WordEncoding(), "recorded")
+    replayed = run(OfflineBackend(), CompletionCache(cache_dir, replay=True), None, "replayed")
+    assert replayed == recorded
+    
+    # The replayed requests included adapted max_tokens and trimmed prompts
+    requests = []
+    for filename in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, filename), encoding='utf-8') as f:
+            requests.append(json.load(f)["request"])
+    assert any(request["max_tokens"] < 500 for request in requests)
+    assert any("explanation...." in request["messages"][-1]["content"] for request in requests)
+
+
+def test_llm_calls_record_token_usage():
+    """Test that every call is logged with its kind, tokens and latency."""
+    from utils.llm_backend import LLMBackend
+    
+    class FixedBackend(LLMBackend):
+        def complete(self, request):
+            return "Some text for the answer."
+    
+    debater = AIDebater(backend=FixedBackend())
+    debater.summarize_ground_statement("Topic")
+    debater.generate_video_title("Topic")
+    debater.generate_response("Counter this", "Jane")
+    
+    assert [call["kind"] for call in debater.usage.calls] == ["summary", "title", "turn"]
+    assert all(call["prompt_tokens"] > 0 and call["completion_tokens"] > 0 for call in debater.usage.calls)
+    assert all(call["latency"] >= 0 for call in debater.usage.calls)
+    totals = debater.usage.totals()
+    assert totals["calls"] == 3
+    assert totals["by_kind"]["turn"]["calls"] == 1
+    assert "LLM usage: 3 calls" in debater.usage.report()
+
+def test_debate_ends_as_draw_when_token_budget_is_spent(tmp_path):
+    """Test that a debate stops once it has used its total token allowance."""
+    from utils.llm_backend import LLMBackend
+    from utils.similarity import StaleDebateDetector
+    from utils.token_budget import TokenBudget
+    from utils.workspace import Workspace
+    
+    class ArguingBackend(LLMBackend):
+        def complete(self, request):
+            return "I will keep arguing this point forever."
+    
+    debater = AIDebater(workspace=Workspace(str(tmp_path)).create(), backend=ArguingBackend(),
+                        budget=TokenBudget(max_debate_tokens=2000),
+                        stale_detector=StaleDebateDetector(draw_after=100))
+    debater.debate("Test statement", generate_audio=False)
+    
+    assert "draw" in debater.transcript.result
+    assert len(debater.transcript.turns) < 40
+    assert debater.usage.total_tokens >= 2000
+
+def test_minhash_index_finds_near_duplicates():
+    """Test that the index matches reworded repeats but not unrelated arguments."""
+    from utils.similarity import MinHashIndex
+    
+    index = MinHashIndex()
+    index.add("Automation has always created more jobs than it destroyed, from looms to spreadsheets.", "a")
+    index.add("Children learn best through play and unstructured time outdoors with friends.", "b")
+    
+    matches = index.query("As history shows, automation has always created more jobs than it destroyed, from looms to spreadsheets!")
+    assert matches[0][0] == "a"
+    assert matches[0][1] >= 0.5
+    assert all(label != "b" for label, _ in matches)
+    assert index.query("Quantum computers will break today's encryption schemes within a decade.") == []
+
+def test_stale_debate_nudges_then_ends_as_draw(tmp_path):
+    """Test that repeated arguments first add a nudge to the prompt and then end the debate."""
+    from utils.llm_backend import LLMBackend
+    from utils.workspace import Workspace
+    
+    class RepetitiveBackend(LLMBackend):
+        def __init__(self):
+            self.prompts = []
+        
+        def complete(self, request):
+            self.prompts.append(request["messages"][-1]["content"])
+            return "Technology changes jobs but people always adapt to new kinds of work over time."
+    
+    backend = RepetitiveBackend()
+    debater = AIDebater(workspace=Workspace(str(tmp_path)).create(), backend=backend)
+    debater.debate("Test statement", generate_audio=False)
+    
+    # First turn is new, the next four repeat it: nudged from the fourth prompt, draw after the fifth turn
+    assert len(debater.transcript.turns) == 5
+    assert "draw" in debater.transcript.result
+    nudged = ["repeated earlier points" in prompt for prompt in backend.prompts[-5:]]
+    assert nudged == [False, False, False, True, True]
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+def test_rate_limited_calls_are_retried():
+    """Test that 429 responses are retried with backoff instead of failing the debate."""
+    from utils.llm_backend import LLMBackend
+    from utils.rate_limiter import RateLimiter
+    
+    class FlakyBackend(LLMBackend):
+        def __init__(self):
+            self.calls = 0
+        
+        def complete(self, request):
+            self.calls += 1
+            if self.calls <= 2:
+                raise _RateLimitError("Too many requests")
+            return "A solid argument."
+    
+    backend = FlakyBackend()
+    limiter = RateLimiter(base_delay=0.01, max_delay=0.02)
+    debater = AIDebater(backend=backend, rate_limiter=limiter)
+    
+    assert debater.generate_response("Counter this", "Jane") == "A solid argument."
+    assert backend.calls == 3
+    assert limiter.retries == 2
+    
+    # Other errors, and rate limits past max_retries, still fail
+    limiter.max_retries = 0
+    backend.calls = 0
+    with pytest.raises(_RateLimitError):
+        debater.generate_response("Counter this", "Jane")
+
+@pytest.mark.asyncio
+async def test_rate_limiter_serves_debate_turns_first():
+    """Test that queued debate turns are sent before queued titles and descriptions."""
+    import asyncio
+    import time
+    from utils.rate_limiter import PRIORITIES, RateLimiter
+    
+    limiter = RateLimiter(requests_per_minute=1200)
+    limiter._requests.level = 0  # Bucket is empty, every request has to queue
+    order = []
+    
+    async def request(kind):
+        await limiter.acquire_async(10, PRIORITIES[kind])
+        order.append(kind)
+    
+    started = time.monotonic()
+    tasks = [asyncio.create_task(request(kind)) for kind in ["title", "description", "turn", "turn"]]
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    
+    assert order == ["turn", "turn", "title", "description"]
+    # Each request adds the time it was queued once, not once per poll
+    assert 0 < limiter.wait_time <= 4 * elapsed
+    
+    waited = limiter.wait_time
+    limiter._requests.level = limiter._requests.capacity
+    await limiter.acquire_async(10)
+    assert limiter.wait_time == waited
+
+def test_rate_limiter_retries_stream_before_first_piece():
+    """Test that a stream rejected with a 429 is reopened, but one that already started isn't."""
+    from utils.rate_limiter import RateLimiter
+    
+    limiter = RateLimiter(tokens_per_minute=60, base_delay=0.01, max_delay=0.02)
+    attempts = []
+    
+    def open_stream():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise _RateLimitError("Too many requests")
+        yield "Hello"
+        yield " world"
+    
+    assert "".join(limiter.stream(open_stream, 10)) == "Hello world"
+    assert len(attempts) == 2
+    # The rejected attempt's tokens were handed back, so only the successful one is charged
+    assert limiter._tokens.level > 45
+
+@pytest.mark.asyncio
+async def test_rate_limiter_refunds_failed_requests():
+    """Test that a request failing with a non-retryable error doesn't keep its token reservation."""
+    from utils.rate_limiter import RateLimiter
+    
+    class _AuthError(Exception):
+        status_code = 401
+    
+    def fail():
+        raise _AuthError("Invalid API key")
+    
+    async def fail_async():
+        fail()
+    
+    def open_stream():
+        fail()
+        yield "never"
+    
+    async def open_stream_async():
+        fail()
+        yield "never"
+    
+    limiter = RateLimiter(tokens_per_minute=60)
+    with pytest.raises(_AuthError):
+        limiter.call(fail, 10)
+    with pytest.raises(_AuthError):
+        await limiter.call_async(fail_async, 10)
+    with pytest.raises(_AuthError):
+        list(limiter.stream(open_stream, 10))
+    with pytest.raises(_AuthError):
+        async for _ in limiter.stream_async(open_stream_async, 10):
+            pass
+    assert limiter._tokens.level == limiter._tokens.capacity
+    assert limiter.retries == 0
+
+def test_resume_continues_from_last_completed_turn(tmp_path):
+    """Test that a crashed debate resumes from its checkpoint without repeating LLM calls."""
+    from utils.llm_backend import LLMBackend
+    from utils.workspace import Workspace
+    
+    class ScriptedBackend(LLMBackend):
+        def __init__(self, answers, crash_after=None):
+            self.answers = iter(answers)
+            self.crash_after = crash_after
+            self.turn_prompts = []
+        
+        def complete(self, request):
+            prompt = request["messages"][-1]["content"]
+            if "Counter this argument" not in prompt:
+                return "Meta"
+            if len(self.turn_prompts) == self.crash_after:
+                raise RuntimeError("process died")
+            self.turn_prompts.append(prompt)
+            return next(self.answers)
+    
+    workspace = Workspace(str(tmp_path)).create()
+    crashing = ScriptedBackend(["Opening from Valentino.", "Reply from Jane.", "Second point from Valentino."],
+                               crash_after=3)
+    with pytest.raises(RuntimeError):
+        AIDebater(workspace=workspace, backend=crashing).debate("Test statement", generate_audio=False,
+                                                                 jane_first=False)
+    assert os.path.exists(workspace.checkpoint_file)
+    
+    resumed_backend = ScriptedBackend(["I surrender"])
+    debater = AIDebater(workspace=workspace, backend=resumed_backend)
+    debater.resume(generate_audio=False)
+    
+    # Only Jane's answer in round 2 was requested, countering Valentino's last argument
+    assert len(resumed_backend.turn_prompts) == 1
+    assert "Second point from Valentino." in resumed_backend.turn_prompts[0]
+    assert [speaker for speaker, _ in debater.transcript.turns] == ["Valentino", "Jane", "Valentino", "Jane"]
+    assert debater.transcript.result == "Jane has surrendered! Valentino wins the debate."
+    assert debater.video_title == "Two AIs Debate About Meta"
+    with open(workspace.debate_file, encoding='utf-8') as f:
+        assert f.read() == debater.transcript.to_text()
+    
+    # A finished debate resumes straight to the end without any LLM call
+    finished_backend = ScriptedBackend([])
+    AIDebater(workspace=workspace, backend=finished_backend).resume(generate_audio=False)
+    assert finished_backend.turn_prompts == []
+
+def test_debate_presynthesizes_opening_during_rounds(tmp_path):
+    """Test that the narrator opening is sent to TTS before round 1 and handed to the speech stage."""
+    from utils.llm_backend import LLMBackend
+    from utils.workspace import Workspace
+    
+    events = []
+    
+    class SurrenderingBackend(LLMBackend):
+        def complete(self, request):
+            if "Counter this argument" in request["messages"][-1]["content"]:
+                events.append("turn")
+                return "I surrender"
+            return "Meta"
+    
+    with patch('ai_debate.SpeechPrefetcher') as mock_prefetcher_class:
+        mock_prefetcher_class.return_value.submit.side_effect = lambda *args: events.append(("submit",) + args)
+        with patch('ai_debate.process_debate') as mock_process:
+            with patch('ai_debate.create_debate_video'):
+                debater = AIDebater(workspace=Workspace(str(tmp_path)).create(), backend=SurrenderingBackend())
+                debater.debate("Test statement")
+    
+    opening = debater.transcript.segments[0]
+    assert events == [("submit", 0, "Narrator", opening["text"]), "turn"]
+    assert "Ground Statement: Test statement" in opening["text"]
+    assert mock_process.call_args.kwargs["prefetcher"] is mock_prefetcher_class.return_value
+    mock_prefetcher_class.return_value.warm_up.assert_called_once_with(["Narrator", "Jane", "Valentino"])
+    mock_prefetcher_class.return_value.close.assert_called_once()
+
+def test_failed_turn_stops_presynthesis(tmp_path):
+    """Test that the background synthesis is shut down when a debate turn raises."""
+    from utils.llm_backend import LLMBackend
+    from utils.workspace import Workspace
+    
+    class FailingBackend(LLMBackend):
+        def complete(self, request):
+            if "Counter this argument" in request["messages"][-1]["content"]:
+                raise RuntimeError("backend down")
+            return "Meta"
+    
+    with patch('ai_debate.SpeechPrefetcher') as mock_prefetcher_class:
+        debater = AIDebater(workspace=Workspace(str(tmp_path)).create(), backend=FailingBackend())
+        with pytest.raises(RuntimeError):
+            debater.debate("Test statement")
+    
+    mock_prefetcher_class.return_value.submit.assert_called_once()
+    mock_prefetcher_class.return_value.close.assert_called_once()
+    assert debater.prefetcher is None
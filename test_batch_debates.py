@@ -0,0 +1,129 @@
+import asyncio
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from batch_debates import _workspace_name, run_batch, run_debate_job
+from utils.workspace import Workspace
+
+
+def _mock_async_client(contents):
+    """Create an AsyncOpenAI stand-in that answers with the given contents, cycling per call."""
+    calls = {"count": 0}
+
+    async def mock_create(**kwargs):
+        content = contents[calls["count"] % len(contents)]
+        calls["count"] += 1
+        return Mock(choices=[Mock(message=Mock(content=content))])
+
+    client = Mock()
+    client.chat.completions.create = mock_create
+    return client
+
+
+def test_workspace_name():
+    """Test that workspace names are indexed and filesystem safe."""
+    assert _workspace_name(3, "Is AI art real art?") == "003_is-ai-art-real-art"
+    assert _workspace_name(0, "???") == "000_debate"
+
+
+@pytest.mark.asyncio
+async def test_run_batch_isolates_workspaces(tmp_path):
+    """Test that each debate in a batch writes to its own workspace."""
+    with patch('ai_debate.OpenAI'), patch('ai_debate.AsyncOpenAI') as mock_async_openai:
+        mock_async_openai.return_value = _mock_async_client(["Some argument", "I surrender"])
+        results = await run_batch(["First topic", "Second topic"], output_root=str(tmp_path),
+                                  generate_audio=False)
+
+    assert [job["status"] for job in results] == ["ok", "ok"]
+    assert results[0]["workspace"] != results[1]["workspace"]
+    for job in results:
+        with open(os.path.join(job["workspace"], "debate.txt"), encoding="utf-8") as f:
+            content = f.read()
+        assert f"Ground Statement: {job['ground_statement']}" in content
+        assert os.path.exists(os.path.join(job["workspace"], "video.txt"))
+
+
+@pytest.mark.asyncio
+async def test_run_batch_warms_up_tts_models_during_the_debates(tmp_path):
+    """Test that the batch loads the TTS models once, while the debates are still being written."""
+    events = []
+
+    async def fake_warm_up(speakers):
+        events.append(("warm_up", speakers))
+        return {}
+
+    async def fake_process_debate(debate_file, output_dir, transcript=None, speech_cache=None):
+        events.append("speech")
+        return False
+
+    with patch('ai_debate.OpenAI'), patch('ai_debate.AsyncOpenAI') as mock_async_openai:
+        mock_async_openai.return_value = _mock_async_client(["I surrender"])
+        with patch('batch_debates.warm_up_tts', fake_warm_up), \
+             patch('batch_debates.process_debate', side_effect=fake_process_debate):
+            await run_batch(["First topic", "Second topic"], output_root=str(tmp_path))
+
+    assert events == [("warm_up", ["Narrator", "Jane", "Valentino"]), "speech", "speech"]
+
+
+@pytest.mark.asyncio
+async def test_run_debate_job_respects_stage_limits(tmp_path):
+    """Test that the speech stage never runs more jobs at once than its limit."""
+    in_flight = 0
+    max_in_flight = 0
+
+    async def mock_process_debate(debate_file, output_dir, transcript=None, speech_cache=None):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return True
+
+    llm_limit, tts_limit, render_limit = asyncio.Semaphore(4), asyncio.Semaphore(1), asyncio.Semaphore(1)
+    with patch('ai_debate.OpenAI'), patch('ai_debate.AsyncOpenAI') as mock_async_openai:
+        mock_async_openai.return_value = _mock_async_client(["I surrender"])
+        with patch('batch_debates.process_debate', side_effect=mock_process_debate):
+            with patch('batch_debates._render_workspace') as mock_render:
+                results = await asyncio.gather(*[
+                    run_debate_job(f"Topic {i}", Workspace(str(tmp_path / f"job_{i}")),
+                                   llm_limit, tts_limit, render_limit)
+                    for i in range(3)
+                ])
+
+    assert all(job["status"] == "ok" for job in results)
+    assert max_in_flight == 1
+    assert mock_render.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_run_debate_job_reports_failure(tmp_path):
+    """Test that a failing job is reported instead of aborting the batch."""
+    async def failing_process_debate(debate_file, output_dir, transcript=None, speech_cache=None):
+        return False
+
+    limits = [asyncio.Semaphore(1) for _ in range(3)]
+    with patch('ai_debate.OpenAI'), patch('ai_debate.AsyncOpenAI') as mock_async_openai:
+        mock_async_openai.return_value = _mock_async_client(["I surrender"])
+        with patch('batch_debates.process_debate', side_effect=failing_process_debate):
+            job = await run_debate_job("Topic", Workspace(str(tmp_path / "job")), *limits)
+
+    assert job["status"] == "failed"
+    assert "speech generation failed" in job["error"]
+
+
+@pytest.mark.asyncio
+async def test_run_debate_job_resumes_from_checkpoint(tmp_path):
+    """Test that a resumed job continues the checkpointed debate instead of starting over."""
+    workspace = Workspace(str(tmp_path / "job"))
+    limits = [asyncio.Semaphore(1) for _ in range(3)]
+    with patch('ai_debate.OpenAI'), patch('ai_debate.AsyncOpenAI') as mock_async_openai:
+        mock_async_openai.return_value = _mock_async_client(["Some argument", "I surrender"])
+        first = await run_debate_job("Topic", workspace, *limits, generate_audio=False)
+        with patch('ai_debate.AIDebater.debate_async') as mock_debate:
+            resumed = await run_debate_job("Topic", workspace, *limits, generate_audio=False, resume=True)
+
+    assert first["status"] == resumed["status"] == "ok"
+    mock_debate.assert_not_called()
+    assert resumed["turns"] == first["turns"]
@@ -70,7 +70,7 @@ async def test_text_to_speech_from_utils():
                     mock_communicate.assert_called_once()
 
 @pytest.mark.asyncio
-async def test_process_debate_segments():
+async def test_process_debate_segments(tmp_path):
     """Test debate segment processing."""
     mock_segments = [
         {"speaker": "Narrator", "text": "Welcome"},
@@ -93,12 +93,12 @@ async def test_process_debate_segments():
                     # Import inside the test to ensure mocks are in place
                     from utils.audio_utils import process_debate_segments
                     
-                    success = await process_debate_segments(mock_segments, "test_output")
+                    success = await process_debate_segments(mock_segments, str(tmp_path))
                     assert success == True
                     assert mock_tts.call_count == len(mock_segments)
 
 @pytest.mark.asyncio
-async def test_process_debate_segments_with_failures():
+async def test_process_debate_segments_with_failures(tmp_path):
     """Test debate segment processing with some failures."""
     mock_segments = [
         {"speaker": "Narrator", "text": "Welcome"},
@@ -132,7 +132,7 @@ async def test_process_debate_segments_with_failures():
                             # Import inside the test
                             from utils.audio_utils import process_debate_segments
                             
-                            success = await process_debate_segments(mock_segments, "test_output")
+                            success = await process_debate_segments(mock_segments, str(tmp_path))
                             assert success == True  # Still true if at least one success
 
 @pytest.mark.asyncio
@@ -236,7 +236,7 @@ def test_get_segment_duration():
             duration = get_segment_duration('test.mp3')
             assert duration == 5.0  # Default duration on error
 
-def test_parse_debate():
+def test_parse_debate(tmp_path):
     """Test parse_debate function."""
     mock_content = """Narrator: Welcome to our AI debate.
     
@@ -247,20 +247,21 @@ AI Debater 2: Counter argument.
 
 Result: The debate ended in a draw."""
     
-    with patch('utils.audio_utils.open', mock_open(read_data=mock_content)):
-        from utils.audio_utils import parse_debate
-        
-        segments = parse_debate()
-        # Updated assertion to match actual implementation which includes Result segment
-        assert len(segments) == 5  # Now includes Result segment
-        assert segments[0]["speaker"] == "Narrator"
-        assert segments[1]["speaker"] == "Ground Statement"
-        assert segments[2]["speaker"] == "AI Debater 1"
-        assert segments[3]["speaker"] == "AI Debater 2"
-        assert segments[4]["speaker"] == "Result"  # Added assertion for Result segment
-        assert segments[0]["text"] == "Welcome to our AI debate."
-        assert segments[3]["text"] == "Counter argument."
-        assert segments[4]["text"] == "The debate ended in a draw."  # Added assertion for Result text
+    debate_file = tmp_path / "debate.txt"
+    debate_file.write_text(mock_content, encoding="utf-8")
+    from utils.audio_utils import parse_debate
+    
+    segments = parse_debate(str(debate_file))
+    # Updated assertion to match actual implementation which includes Result segment
+    assert len(segments) == 5  # Now includes Result segment
+    assert segments[0]["speaker"] == "Narrator"
+    assert segments[1]["speaker"] == "Ground Statement"
+    assert segments[2]["speaker"] == "AI Debater 1"
+    assert segments[3]["speaker"] == "AI Debater 2"
+    assert segments[4]["speaker"] == "Result"  # Added assertion for Result segment
+    assert segments[0]["text"] == "Welcome to our AI debate."
+    assert segments[3]["text"] == "Counter argument."
+    assert segments[4]["text"] == "The debate ended in a draw."  # Added assertion for Result text
 
 def test_get_current_subtitle():
     """Test get_current_subtitle function."""
@@ -290,4 +291,643 @@ def test_get_current_subtitle():
     # Test with empty segments
     text, speaker = get_current_subtitle([], 1.0, "Default")
     assert text == "Default"
-    assert speaker is None
\ No newline at end of file
+    assert speaker is None
+
+@pytest.mark.asyncio
+async def test_speech_prefetcher_hands_over_matching_segments(tmp_path):
+    """Test that pre-synthesized audio is only used when the final text matches."""
+    from utils.audio_utils import SpeechPrefetcher
+    
+    calls = []
+    
+    async def fake_text_to_speech(text, speaker, output_file):
+        calls.append((text, speaker, output_file))
+        with open(output_file, 'w') as f:
+            f.write(text)
+        with open(output_file.replace('.wav', '_timing.json'), 'w') as f:
+            f.write("{}")
+        return True
+    
+    with patch('utils.audio_utils.text_to_speech', side_effect=fake_text_to_speech):
+        prefetcher = SpeechPrefetcher(str(tmp_path))
+        prefetcher.submit(0, "Narrator", "Welcome. Ground Statement: Test")
+        prefetcher.submit(1, "Jane", "Draft text")
+        
+        assert await prefetcher.take(0, "Narrator", "Welcome. Ground Statement: Test")
+        # The final text of segment 1 is synthesized while the stale job may still be running
+        (tmp_path / "segment_1.wav").write_text("Different final text")
+        assert not await prefetcher.take(1, "Jane", "Different final text")
+        assert not await prefetcher.take(2, "Valentino", "Never submitted")
+        prefetcher.close()
+        # Wait for the worker, which deletes the stale job's files when it's done
+        prefetcher._executor.shutdown(wait=True)
+    
+    # Jobs write to a private file, which only replaces the segment once its text is confirmed
+    assert calls[0] == ("Welcome. Ground Statement: Test", "Narrator", str(tmp_path / "segment_0.prefetch.wav"))
+    assert (tmp_path / "segment_0.wav").read_text() == "Welcome. Ground Statement: Test"
+    assert (tmp_path / "segment_1.wav").read_text() == "Different final text"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["segment_0.wav", "segment_0_timing.json",
+                                                          "segment_1.wav"]
+
+def test_sentence_segmenter_offsets_and_chunks():
+    """Test that every splitter shares one segmenter that returns offsets into the text."""
+    from utils.text_utils import chunk_spans, sentence_spans, split_text_into_chunks
+    from utils.websocket_manager import WebSocketManager
+    
+    text = 'First sentence. Second one! Is "this" third? It costs 3.5 dollars: really.'
+    assert [text[start:end] for start, end in sentence_spans(text)] == [
+        "First sentence.", "Second one!", 'Is "this" third?', "It costs 3.5 dollars: really."]
+    assert [text[start:end] for start, end in sentence_spans(text, clauses=True)][-2:] == [
+        "It costs 3.5 dollars:", "really."]
+    
+    long_text = "Short start. " + " ".join(f"word{i}" for i in range(40)) + ". End."
+    chunks = split_text_into_chunks(long_text, max_chars=50)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks).split() == long_text.split()
+    assert chunks == [long_text[start:end] for start, end in chunk_spans(long_text, 50)]
+    assert WebSocketManager()._split_text(long_text, 50) == chunks
+
+    # Streaming handoff and prompt trimming split on the same boundaries, "?!" runs included
+    from utils.text_utils import pop_complete_sentences
+    from utils.token_budget import trim_to_tokens
+    streamed = 'Really?! "Yes."  Then what'
+    assert pop_complete_sentences(streamed) == (["Really?!", '"Yes."'], "Then what")
+    assert pop_complete_sentences("Trailing period.") == ([], "Trailing period.")
+    with patch('utils.token_budget._get_encoding', return_value=None):
+        assert trim_to_tokens(streamed + " and more words after that", 5) == 'Really?! "Yes."...'
+
+def test_timing_segments_use_the_same_chunks():
+    """Test that estimated and Vosk-aligned subtitles break the text at the same places."""
+    from utils.audio_utils import align_timing_segments, estimate_timing_segments
+    
+    text = "We start here. Then we continue; and we finish with a longer closing sentence right here."
+    estimated = estimate_timing_segments(text, 6.0)
+    assert [s["text"] for s in estimated] == [
+        "We start here. Then we continue;", "And we finish with a longer closing sentence right here."]
+    assert estimated[0]["start_time"] == 0.0 and estimated[-1]["end_time"] == 6.0
+    assert estimated[0]["end_time"] == estimated[1]["start_time"]
+    
+    words = [{"word": w.strip(".;").lower(), "start": i * 0.4, "end": i * 0.4 + 0.3}
+             for i, w in enumerate(text.split())]
+    aligned = align_timing_segments(text, words, 6.5)
+    assert [s["text"] for s in aligned] == [s["text"] for s in estimated]
+    assert aligned[0]["start_time"] == 0.0
+    assert aligned[1]["start_time"] == words[6]["start"]
+    assert aligned[-1]["end_time"] == 6.5
+
+@pytest.mark.asyncio
+async def test_websocket_manager_reuses_pooled_connections():
+    """Test that TTS requests share open connections and reconnect when one is dropped."""
+    import asyncio
+    import json
+    import websockets
+    from utils.websocket_manager import ConnectionPool, WebSocketManager
+    
+    connections = []
+    
+    async def handler(websocket):
+        connections.append(websocket)
+        async for message in websocket:
+            request = json.loads(message)
+            audio = request["text"].encode("utf-8")
+            await websocket.send(json.dumps({"status": "success", "length_bytes": len(audio)}))
+            await websocket.send(audio)
+    
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        pool = ConnectionPool(f"ws://127.0.0.1:{port}", health_check_after=0)
+        manager = WebSocketManager(pool.uri, pool=pool)
+        
+        for text in ["First segment", "Second segment", "Third segment"]:
+            result = await manager.send_tts_request(text, speaker=0)
+            assert result["audio_data"] == text.encode("utf-8")
+        assert pool.connects == 1
+        
+        # A connection the server dropped fails its health check and is replaced
+        await connections[0].close()
+        result = await manager.send_tts_request("After reconnect", speaker=0)
+        assert result["audio_data"] == b"After reconnect"
+        assert pool.connects == 2
+        
+        # Concurrent requests each get their own connection, up to the pool size
+        results = await asyncio.gather(*(manager.send_tts_request(f"Parallel {i}", speaker=0) for i in range(3)))
+        assert [r["audio_data"] for r in results] == [f"Parallel {i}".encode("utf-8") for i in range(3)]
+        assert pool.connects == 4
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_multiplexed_requests_share_one_connection():
+    """Test that interleaved responses are sorted back to their requests by request ID."""
+    import asyncio
+    import json
+    import websockets
+    from utils.websocket_manager import MUX_HEADER, ConnectionPool, WebSocketManager
+    
+    connections = []
+    
+    async def respond(websocket, request):
+        request_id = request["request_id"]
+        audio = request["text"].encode("utf-8") * 3
+        # Later requests finish first, and their frames interleave with the others
+        await asyncio.sleep(0.05 * (5 - request_id))
+        await websocket.send(json.dumps({"request_id": request_id, "status": "success",
+                                         "length_bytes": len(audio)}))
+        for start in range(0, len(audio), 7):
+            await websocket.send(MUX_HEADER.pack(request_id) + audio[start:start + 7])
+            await asyncio.sleep(0)
+    
+    async def handler(websocket):
+        connections.append(websocket)
+        tasks = []
+        async for message in websocket:
+            request = json.loads(message)
+            assert request["multiplex"] is True
+            tasks.append(asyncio.create_task(respond(websocket, request)))
+        await asyncio.gather(*tasks)
+    
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        pool = ConnectionPool(f"ws://127.0.0.1:{port}")
+        manager = WebSocketManager(pool.uri, pool=pool, multiplex=True)
+        
+        texts = [f"Segment number {i}" for i in range(5)]
+        results = await asyncio.gather(*(manager.send_tts_request(text, speaker=0) for text in texts))
+        assert [r["audio_data"] for r in results] == [text.encode("utf-8") * 3 for text in texts]
+        assert len(connections) == 1 and pool.connects == 1
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_streamed_audio_is_length_framed_and_written_atomically(tmp_path):
+    """Test that audio is streamed to disk by exact length, and truncated audio is rejected."""
+    import hashlib
+    import json
+    import websockets
+    from utils.websocket_manager import ConnectionPool, IncompleteAudioError, WebSocketManager
+    
+    audio = bytes(range(256)) * 1000
+    
+    async def handler(websocket):
+        async for message in websocket:
+            text = json.loads(message)["text"]
+            announced = len(audio) + (1000 if text == "truncated" else 0)
+            await websocket.send(json.dumps({"status": "success", "length_bytes": announced,
+                                             "sha256": hashlib.sha256(audio).hexdigest()}))
+            # Small frames, which the old "small chunk means done" heuristic cut short
+            for start in range(0, len(audio), 5000):
+                await websocket.send(audio[start:start + 5000])
+    
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        pool = ConnectionPool(f"ws://127.0.0.1:{port}")
+        manager = WebSocketManager(pool.uri, pool=pool, frame_timeout=0.2)
+        output_file = tmp_path / "segment_0.wav"
+        
+        result = await manager.send_tts_request("complete", speaker=0, output_file=str(output_file))
+        assert result["output_file"] == str(output_file)
+        assert result["length_bytes"] == len(audio)
+        assert result["sha256"] == hashlib.sha256(audio).hexdigest()
+        assert output_file.read_bytes() == audio
+        
+        # A stream that ends short of its announced length leaves the previous file alone
+        with pytest.raises(IncompleteAudioError):
+            await manager.send_tts_request("truncated", speaker=0, output_file=str(output_file))
+        assert output_file.read_bytes() == audio
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["segment_0.wav"]
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_long_text_chunks_are_synthesized_in_parallel_and_stitched(tmp_path):
+    """Test that long-text chunks run concurrently and are joined under one WAV header."""
+    import asyncio
+    import io
+    import json
+    import wave
+    import websockets
+    from utils.wav_utils import read_wav, WavFormat
+    from utils.websocket_manager import ConnectionPool, WebSocketManager
+    
+    active = {"now": 0, "peak": 0}
+    
+    def make_wav(seconds):
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(b"\x01\x00" * int(8000 * seconds))
+        return buffer.getvalue()
+    
+    async def handler(websocket):
+        async for message in websocket:
+            text = json.loads(message)["text"]
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.05)
+            active["now"] -= 1
+            audio = make_wav(len(text) / 100)
+            await websocket.send(json.dumps({"status": "success", "length_bytes": len(audio)}))
+            await websocket.send(audio)
+    
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        pool = ConnectionPool(f"ws://127.0.0.1:{port}")
+        manager = WebSocketManager(pool.uri, pool=pool)
+        manager.max_message_size = 100
+        text = "First chunk sentence here. " * 40 + "A final shorter sentence."
+        output_file = tmp_path / "segment_0.wav"
+        
+        result = await manager.send_tts_request(text, speaker=0, output_file=str(output_file))
+        chunks = manager._split_text(text)
+        assert active["peak"] > 1
+        
+        # One header, all the samples of every chunk
+        wav_format, pcm = read_wav(output_file.read_bytes())
+        assert wav_format == WavFormat(1, 2, 8000)
+        assert len(pcm) == sum(int(8000 * len(chunk) / 100) * 2 for chunk in chunks)
+        
+        offsets = result["chunk_offsets"]
+        assert [o["text"] for o in offsets] == chunks
+        assert offsets[0]["start_time"] == 0.0
+        assert all(a["end_time"] == b["start_time"] for a, b in zip(offsets, offsets[1:]))
+        assert offsets[-1]["end_time"] == pytest.approx(len(pcm) / 16000)
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_stub_tts_server_queues_requests_and_streams_synthetic_speech(tmp_path):
+    """Test the local TTS server stand-in end to end through WebSocketManager and process_debate_segments."""
+    import asyncio
+    import json
+    import websockets
+    from utils.audio_utils import process_debate_segments
+    from utils.tts_stub_server import StubTTSServer
+    from utils.wav_utils import read_wav, WavFormat
+    from utils.websocket_manager import ConnectionPool, WebSocketManager, close_connection_pools
+    
+    with StubTTSServer(load_time=0.1, real_time_factor=0.05, workers=1, frame_size=4096) as server:
+        # Raw protocol: loading first, then a queue position behind the other request
+        async def statuses(text):
+            async with websockets.connect(server.uri, max_size=None) as websocket:
+                await websocket.send(json.dumps({"text": text, "speaker": 1, "sample_rate": 16000}))
+                seen = []
+                while True:
+                    response = json.loads(await websocket.recv())
+                    seen.append(response)
+                    if response["status"] != "loading" and response["status"] != "queued":
+                        break
+                audio = b""
+                while len(audio) < response["length_bytes"]:
+                    audio += await websocket.recv()
+                return seen, audio
+        
+        (first, audio), (second, _) = await asyncio.gather(statuses("Hello there, world."), statuses("Second request."))
+        assert first[0]["status"] == "loading" and second[0]["status"] == "loading"
+        assert {"status": "queued", "queue_position": 1} in first + second
+        wav_format, pcm = read_wav(audio)
+        assert wav_format == WavFormat(1, 2, 16000)
+        assert first[-1]["duration"] == pytest.approx(len(pcm) / 32000)
+        assert server.synthesize("Hello there, world.", 1, 16000) == audio
+        
+        # The client waits out the queue, multiplexed or not
+        for multiplex in (False, True):
+            pool = ConnectionPool(server.uri)
+            manager = WebSocketManager(server.uri, pool=pool, multiplex=multiplex)
+            results = await asyncio.gather(*(manager.send_tts_request(f"Segment {i}.", speaker=0) for i in range(3)))
+            assert [r["audio_data"] for r in results] == [server.synthesize(f"Segment {i}.") for i in range(3)]
+            await pool.close()
+        assert server.stats["peak_queue"] >= 2
+        
+        segments = [{"speaker": "Narrator", "text": "Welcome to the debate."},
+                    {"speaker": "Jane", "text": "I think, therefore I argue."}]
+        with patch('utils.audio_utils.TTS_SERVER_URI', server.uri):
+            assert await process_debate_segments(segments, output_dir=str(tmp_path))
+        # The shared pool's connections have to close before the server thread stops
+        await close_connection_pools()
+        for index in range(2):
+            assert read_wav((tmp_path / f"segment_{index}.wav").read_bytes())[1]
+            assert (tmp_path / f"segment_{index}_timing.json").exists()
+    
+    with StubTTSServer(failure_rate=1.0) as server:
+        manager = WebSocketManager(server.uri, pool=ConnectionPool(server.uri))
+        with pytest.raises(Exception, match="Injected synthesis failure"):
+            await manager.send_tts_request("Doomed request.", speaker=0)
+        await manager.pool.close()
+
+@pytest.mark.asyncio
+async def test_transfer_format_is_negotiated_and_decoded_in_memory(tmp_path):
+    """Test that raw PCM responses are decoded without a WAV round trip and saved as WAV."""
+    import numpy as np
+    from utils.tts_stub_server import StubTTSServer
+    from utils.wav_utils import PCM_FORMAT, WavFormat, decode_audio, read_wav, wav_duration
+    from utils.websocket_manager import ConnectionPool, WebSocketManager
+    
+    with StubTTSServer(frame_size=1000) as server:
+        expected_format, pcm = read_wav(server.synthesize("Compact audio, please.", 0, 16000))
+        expected = np.frombuffer(pcm, dtype="<i2")
+        pool = ConnectionPool(server.uri)
+        
+        manager = WebSocketManager(server.uri, pool=pool, accept_formats=["opus-from-the-future", PCM_FORMAT, "wav"])
+        result = await manager.send_tts_request("Compact audio, please.", speaker=0, sample_rate=16000)
+        assert result["transfer_format"] == PCM_FORMAT
+        assert result["length_bytes"] == len(pcm)  # no header on the wire
+        assert result["wav_format"] == expected_format == WavFormat(1, 2, 16000)
+        assert np.array_equal(result["samples"], expected)
+        assert result["duration"] == pytest.approx(len(expected) / 16000)
+        assert result["audio_data"] == server.synthesize("Compact audio, please.", 0, 16000)
+        
+        # Raw PCM of known length streams straight into a WAV file
+        output_file = tmp_path / "segment_0.wav"
+        result = await manager.send_tts_request("Compact audio, please.", speaker=0, sample_rate=16000,
+                                                output_file=str(output_file))
+        assert "samples" not in result
+        assert read_wav(output_file.read_bytes()) == (expected_format, pcm)
+        assert wav_duration(str(output_file)) == result["duration"]
+        
+        # A client that only takes WAV gets WAV
+        manager = WebSocketManager(server.uri, pool=pool, accept_formats=["wav"])
+        result = await manager.send_tts_request("Compact audio, please.", speaker=0, sample_rate=16000)
+        assert result["transfer_format"] == "wav"
+        assert np.array_equal(result["samples"], expected)
+        await pool.close()
+    
+    with pytest.raises(ValueError):
+        decode_audio(b"\x00\x01\x02", PCM_FORMAT, 16000)
+
+@pytest.mark.asyncio
+async def test_status_updates_are_handled_as_they_arrive_and_models_warm_up():
+    """Test that loading and queued requests finish as soon as the server is ready, without polling."""
+    import asyncio
+    import time
+    from utils.tts_stub_server import StubTTSServer
+    from utils.websocket_manager import ConnectionPool, WebSocketManager
+    
+    with StubTTSServer(load_time=0.2, real_time_factor=0.05, workers=1) as server:
+        pool = ConnectionPool(server.uri)
+        manager = WebSocketManager(server.uri, pool=pool)
+        
+        started = time.monotonic()
+        assert await manager.warm_up(["sesame", "edge", "sesame"]) == {"sesame": True, "edge": True}
+        # A polling client would sleep a whole second after the loading and queued statuses
+        assert time.monotonic() - started < 0.8
+        assert server.stats["requests"] == 2
+        
+        started = time.monotonic()
+        await asyncio.gather(*(manager.send_tts_request(f"Queued {i}.", speaker=0) for i in range(4)))
+        assert server.stats["peak_queue"] == 3
+        assert time.monotonic() - started < 0.8
+        await pool.close()
+
+@pytest.mark.asyncio
+async def test_edge_voices_are_synthesized_in_process_with_word_timings(tmp_path):
+    """Test that edge voices stream from edge-tts to the segment file and are timed by its word boundaries."""
+    import json
+    from pydub import AudioSegment
+    from utils.audio_utils import text_to_speech
+    from utils.wav_utils import read_wav
+    
+    text = "Machines can argue about almost anything at all. Whether they should is another question entirely, of course."
+    created = []
+    
+    class FakeCommunicate:
+        """Local stand-in for the edge-tts stream: MP3 chunks interleaved with word boundaries."""
+        def __init__(self, text, voice, **options):
+            created.append((text, voice, options))
+            self.text = text
+        
+        async def stream(self):
+            for i, word in enumerate(self.text.split()):
+                yield {"type": "audio", "data": b"\xff\xfb" + bytes(100)}
+                yield {"type": "WordBoundary", "offset": i * 5_000_000, "duration": 4_000_000, "text": word.strip(".")}
+    
+    # Decoding MP3 needs ffmpeg, so the decoded audio is faked too: 17 words of 0.5s at 24 kHz
+    decoded = AudioSegment(data=b"\x00\x00" * 204000, sample_width=2, frame_rate=24000, channels=1)
+    output_file = tmp_path / "segment_1.wav"
+    with patch('utils.audio_utils.edge_tts.Communicate', FakeCommunicate), \
+         patch('utils.audio_utils.AudioSegment.from_mp3', return_value=decoded), \
+         patch('utils.audio_utils.recognize_words') as mock_recognize, \
+         patch('utils.audio_utils.WebSocketManager') as mock_manager:
+        assert await text_to_speech(text, "Jenny", str(output_file))
+    
+    assert created == [(text, "en-US-JennyNeural", {"boundary": "WordBoundary", "rate": "+0%", "volume": "+0%"})]
+    mock_recognize.assert_not_called()
+    mock_manager.assert_not_called()
+    assert read_wav(output_file.read_bytes())[1] == decoded.raw_data
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["segment_1.wav", "segment_1_timing.json"]
+    
+    segments = json.loads((tmp_path / "segment_1_timing.json").read_text())["segments"]
+    assert [s["text"] for s in segments] == ["Machines can argue about almost anything at all.",
+                                             "Whether they should is another question entirely, of course."]
+    # The second sentence starts exactly when its first word does
+    assert segments[1]["start_time"] == 4.0
+    assert segments[-1]["end_time"] == 8.5
+    
+    # A segment that fails while being written leaves neither its MP3 nor its WAV temp file behind
+    failed_file = tmp_path / "failed" / "segment_2.wav"
+    with patch('utils.audio_utils.edge_tts.Communicate', FakeCommunicate), \
+         patch('utils.audio_utils.AudioSegment.from_mp3', return_value=decoded), \
+         patch('utils.audio_utils.wav_header', side_effect=OSError("Disk full")):
+        assert not await text_to_speech(text, "Jenny", str(failed_file), max_retries=1)
+    assert list((tmp_path / "failed").iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_server_word_timestamps_replace_speech_recognition(tmp_path):
+    """Test that word and phoneme timestamps from the server time the subtitles without Vosk."""
+    import json
+    from utils.audio_utils import text_to_speech
+    from utils.tts_stub_server import StubTTSServer
+    from utils.websocket_manager import ConnectionPool, WebSocketManager, close_connection_pools, word_timestamps
+    
+    text = "Every word has its moment. The server knows exactly when, so nobody has to listen again."
+    with StubTTSServer() as server:
+        pool = ConnectionPool(server.uri)
+        manager = WebSocketManager(server.uri, pool=pool)
+        
+        words = (await manager.send_tts_request(text, speaker=0, timestamps="word"))["words"]
+        assert [w["word"] for w in words] == text.replace(".", "").replace(",", "").split()
+        phonemes = await manager.send_tts_request(text, speaker=0, timestamps="phoneme")
+        assert phonemes["words"] == words
+        assert "words" not in await manager.send_tts_request(text, speaker=0)
+        
+        # Long texts shift every chunk's words to where the chunk starts
+        manager.max_message_size = 100
+        stitched = await manager.send_tts_request(" ".join([text] * 8), speaker=0, timestamps="word")
+        first_chunk, second_chunk = stitched["chunk_offsets"][:2]
+        assert [w["word"] for w in stitched["words"]] == [w["word"] for w in words] * 8
+        assert stitched["words"][len(first_chunk["text"].split())]["start"] == second_chunk["start_time"]
+        await pool.close()
+        
+        output_file = tmp_path / "segment_0.wav"
+        with patch('utils.audio_utils.TTS_SERVER_URI', server.uri), \
+             patch('utils.audio_utils.recognize_words') as mock_recognize:
+            assert await text_to_speech(text, "Narrator", str(output_file))
+        await close_connection_pools()
+        mock_recognize.assert_not_called()
+        segments = json.loads((tmp_path / "segment_0_timing.json").read_text())["segments"]
+        assert segments[0]["start_time"] == 0.0
+        assert segments[1]["start_time"] == pytest.approx(words[5]["start"])
+    
+    assert word_timestamps({"words": [{"word": "late", "start": 2.0, "end": 2.5},
+                                      {"word": "early", "start": 1.0, "end": 1.5}]}) is None
+    assert word_timestamps({"phonemes": [{"start": 0.1, "end": 0.2}]}) is None
+
+@pytest.mark.asyncio
+async def test_speech_cache_shares_synthesis_links_hits_and_evicts(tmp_path):
+    """Test that identical segments are synthesized once and later served from the cache."""
+    import asyncio
+    import json
+    from utils.audio_utils import process_debate_segments, synthesis_backend
+    from utils.tts_cache import SpeechCache
+    from utils.tts_stub_server import StubTTSServer
+    from utils.websocket_manager import close_connection_pools
+    
+    intro = "Welcome to the debate. Tonight our guests argue about machines."
+    segments = [{"speaker": "Narrator", "text": intro},
+                {"speaker": "Narrator", "text": intro},
+                {"speaker": "Jane", "text": "Machines should never get the last word."}]
+    cache = SpeechCache(str(tmp_path / "cache"))
+    with StubTTSServer(real_time_factor=0.05) as server:
+        with patch('utils.audio_utils.TTS_SERVER_URI', server.uri), \
+             patch('utils.audio_utils.recognize_words'):
+            assert await process_debate_segments(segments, str(tmp_path / "first"), speech_cache=cache)
+            await close_connection_pools()
+            # The repeated intro waited for the first request instead of sending its own
+            assert server.stats["requests"] == 2
+            assert cache.shared == 1
+            
+            hits = cache.hits
+            assert await process_debate_segments(segments, str(tmp_path / "second"), speech_cache=cache)
+            await close_connection_pools()
+            assert server.stats["requests"] == 2
+            assert cache.hits - hits == 3
+            
+            narrator = {"speaker": 0, "model": "sesame"}
+            key = cache.make_key(intro, narrator, 24000, synthesis_backend(narrator))
+    
+    # A different TTS server doesn't get the first server's audio
+    assert key != cache.make_key(intro, narrator, 24000, synthesis_backend(narrator))
+    entry = tmp_path / "cache" / f"{key}.wav"
+    # Hits share the cached file's data, and segment timing is copied so the clip metadata stays out of the cache
+    assert os.stat(tmp_path / "second" / "segment_0.wav").st_ino == entry.stat().st_ino
+    assert "metadata" in json.loads((tmp_path / "second" / "segment_0_timing.json").read_text())
+    assert "metadata" not in json.loads((tmp_path / "cache" / f"{key}_timing.json").read_text())
+    
+    # Storing a segment keeps a running total instead of listing the cache again
+    with patch('utils.tts_cache.os.listdir', side_effect=AssertionError("cache listed on put")):
+        cache.put(key, str(tmp_path / "second" / "segment_0.wav"))
+    assert cache._total_bytes == sum(size for _, size, _ in cache._entries())
+    
+    # Over quota, the least recently used entry goes first
+    os.utime(entry, (1, 1))
+    cache.max_bytes = max(size for _, size, _ in cache._entries())
+    cache._evict()
+    assert not entry.exists()
+    assert len(cache._entries()) == 1
+    assert not await cache.synthesize(key, str(tmp_path / "third.wav"), lambda path: asyncio.sleep(0, False))
+
+def test_speech_cache_concurrent_puts_keep_the_running_size(tmp_path):
+    """Test that segments stored from several threads at once are all counted in the cache size."""
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.tts_cache import SpeechCache, timing_path
+    
+    cache = SpeechCache(str(tmp_path / "cache"))
+    segments = []
+    for i in range(64):
+        segment = tmp_path / f"segment_{i}.wav"
+        segment.write_bytes(b"RIFF" + bytes(1000 + i))
+        (tmp_path / timing_path(segment.name)).write_text("{}", encoding="utf-8")
+        segments.append(str(segment))
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(cache.put, f"key{i}", segment) for i, segment in enumerate(segments)]:
+            future.result()
+    assert cache._total_bytes == sum(size for _, size, _ in cache._entries())
+    
+    # Storing the same segment again from every thread doesn't count it twice
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(cache.put, "key0", segments[0]) for _ in range(16)]:
+            future.result()
+    assert cache._total_bytes == sum(size for _, size, _ in cache._entries())
+
+@pytest.mark.asyncio
+async def test_sentences_are_synthesized_concurrently_with_exact_cues(tmp_path):
+    """Test that sentence mode joins per-sentence audio and cues subtitles at the sentence boundaries."""
+    import json
+    from utils.audio_utils import synthesize_sentences, text_to_speech
+    from utils.text_utils import sentence_spans
+    from utils.tts_stub_server import StubTTSServer
+    from utils.wav_utils import read_wav
+    from utils.websocket_manager import close_connection_pools
+    
+    sentences = ["Machines can argue.", "Whether they should is another question.", "We will find out tonight!"]
+    output_file = tmp_path / "segment_0.wav"
+    with StubTTSServer(real_time_factor=0.05) as server:
+        with patch('utils.audio_utils.TTS_SERVER_URI', server.uri), \
+             patch('utils.audio_utils.recognize_words') as mock_recognize:
+            assert await text_to_speech(" ".join(sentences), "Narrator", str(output_file), by_sentence=True)
+        await close_connection_pools()
+        assert server.stats["requests"] == 3
+        # All three were sent at once, so two waited for the single worker
+        assert server.stats["peak_queue"] == 2
+        parts = [read_wav(server.synthesize(sentence, speaker=0))[1] for sentence in sentences]
+    
+    mock_recognize.assert_not_called()
+    assert read_wav(output_file.read_bytes())[1] == b"".join(parts)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["segment_0.wav", "segment_0_timing.json"]
+    
+    # Every sentence is one cue that starts exactly where its audio was appended
+    segments = json.loads((tmp_path / "segment_0_timing.json").read_text())["segments"]
+    assert [s["text"] for s in segments] == sentences
+    starts = [sum(len(pcm) for pcm in parts[:i]) / 48000 for i in range(len(parts))]
+    assert [s["start_time"] for s in segments] == pytest.approx(starts)
+    assert segments[-1]["end_time"] == pytest.approx(sum(len(pcm) for pcm in parts) / 48000)
+    
+    # The number of sentences in flight at once is bounded
+    with StubTTSServer(real_time_factor=0.05) as server:
+        with patch('utils.audio_utils.TTS_SERVER_URI', server.uri):
+            text = " ".join(sentences)
+            result = await synthesize_sentences(text, sentence_spans(text), {"speaker": 0, "model": "sesame"},
+                                                str(tmp_path / "bounded.wav"), concurrency=1)
+        await close_connection_pools()
+        assert server.stats["requests"] == 3
+        assert server.stats["peak_queue"] == 0
+    assert read_wav((tmp_path / "bounded.wav").read_bytes())[1] == b"".join(parts)
+    assert [s["start_time"] for s in result["sentence_offsets"]] == pytest.approx(starts)
+
+
+def test_sync_speech_stage_closes_its_connections():
+    """Test that a run in its own event loop closes its pooled TTS connections before the loop ends."""
+    import asyncio
+    import time
+    from utils import websocket_manager
+    from utils.tts_stub_server import StubTTSServer
+    from utils.websocket_manager import WebSocketManager, close_pools_after
+    
+    loops = []
+    
+    async def speak(uri):
+        loops.append(asyncio.get_running_loop())
+        return await WebSocketManager(uri).send_tts_request("Hello there.", speaker=0)
+    
+    with StubTTSServer() as server:
+        # stop() would wait out the close timeout for connections left open
+        started = time.monotonic()
+        result = asyncio.run(close_pools_after(speak(server.uri)))
+    assert time.monotonic() - started < 5
+    assert result["length_bytes"] > 0
+    assert loops[0] not in websocket_manager._pools
+
+
+def test_debate_to_speech_script_speaks_against_stub_server(tmp_path, monkeypatch):
+    """Test that running debate_to_speech.py synthesizes outputs/debate.txt on the configured server."""
+    import runpy
+    from utils.tts_stub_server import StubTTSServer
+    
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "outputs").mkdir()
+    (tmp_path / "outputs" / "debate.txt").write_text("Narrator: Welcome to our AI debate.", encoding="utf-8")
+    with StubTTSServer(real_time_factor=0.05) as server:
+        with patch('utils.audio_utils.TTS_SERVER_URI', server.uri), \
+             patch('utils.audio_utils.recognize_words'):
+            runpy.run_module("debate_to_speech", run_name="__main__")
+    assert server.stats["requests"] == 1
+    assert (tmp_path / "outputs" / "audio_output" / "segment_0.wav").stat().st_size > 0
+
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from utils.transcript import Transcript
+from utils.transcript_index import TranscriptIndex
+
+
+def test_transcript_index_builds_searches_and_refreshes(tmp_path):
+    """Test that archived transcripts are indexed in parallel, searchable and kept up to date."""
+    archive = tmp_path / "archive"
+    topics = ["Cats make better pets", "Remote work beats the office", "Nuclear power is green"]
+    for i, topic in enumerate(topics):
+        transcript = Transcript(topic, f"Summary {i}")
+        transcript.add_turn("Jane", f"Opening for debate {i} about {topic.lower()}.")
+        transcript.add_turn("Valentino", "Photosynthesis is irrelevant here." if i == 2 else "I disagree.")
+        transcript.set_result("It's a draw!")
+        (archive / f"{i:03d}").mkdir(parents=True)
+        transcript.save(str(archive / f"{i:03d}" / "debate.txt"))
+
+    # Use the process pool even for this small archive
+    with TranscriptIndex(str(tmp_path / "index.db")) as index, \
+            patch('utils.transcript_index._MIN_FILES_FOR_POOL', 0):
+        assert index.index_directory(str(archive), workers=2) == {
+            "indexed": 3, "unchanged": 0, "removed": 0, "failed": 0}
+        assert len(index) == 3
+
+        matches = index.search("photosynthesis")
+        assert [(m["speaker"], m["position"]) for m in matches] == [("Valentino", 2)]
+        debates = index.find_debates("photosynthesis", speaker="Valentino")
+        assert [d["ground_statement"] for d in debates] == ["Nuclear power is green"]
+        assert debates[0]["summary"] == "Summary 2" and debates[0]["turns"] == 2
+
+        loaded = index.load_transcript(debates[0]["path"])
+        assert loaded.segments == Transcript.load(str(archive / "002" / "debate.txt")).segments
+
+        # Only changed files are parsed again, and deleted ones are forgotten
+        (archive / "001" / "debate.txt").write_text(
+            "Ground Statement: Remote work beats the office\nAI Debater 1: Commuting wastes hours.",
+            encoding="utf-8")
+        os.remove(archive / "000" / "debate.txt")
+        assert index.index_directory(str(archive), workers=2) == {
+            "indexed": 1, "unchanged": 1, "removed": 1, "failed": 0}
+        assert index.search("disagree") == []
+        assert [m["speaker"] for m in index.search("commuting")] == ["Jane"]
+        assert len(index) == 2
+
+        # Ordinary input is matched literally; FTS5 syntax needs raw=True
+        assert [m["speaker"] for m in index.search("Commuting wastes")] == ["Jane"]
+        for query in ["don't", "AI-generated", 'unbalanced "quote']:
+            assert index.search(query) == []
+            assert index.find_debates(query) == []
+        assert sorted(m["speaker"] for m in index.search("commut* OR photosynthesis", raw=True)) == ["Jane", "Valentino"]
+        with pytest.raises(ValueError, match="unbalanced"):
+            index.search('unbalanced "quote', raw=True)
+
+
+def test_transcript_index_rebuilds_an_outdated_schema(tmp_path):
+    """Test that a database from an older schema version is rebuilt with explicit segment ids."""
+    db_path = str(tmp_path / "index.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE segments (debate_id INTEGER, position INTEGER, speaker TEXT, text TEXT, "
+                 "PRIMARY KEY (debate_id, position))")
+    conn.commit()
+    conn.close()
+
+    archive = tmp_path / "archive"
+    archive.mkdir()
+    transcript = Transcript("Tea beats coffee", "Summary")
+    transcript.add_turn("Jane", "Tea has antioxidants.")
+    transcript.save(str(archive / "debate.txt"))
+
+    with TranscriptIndex(db_path) as index:
+        columns = [row["name"] for row in index._conn.execute("PRAGMA table_info(segments)")]
+        assert columns[0] == "id"
+        assert index.index_directory(str(archive))["indexed"] == 1
+        assert [m["speaker"] for m in index.search("antioxidants")] == ["Jane"]
@@ -1,11 +1,16 @@
 import json
 import os
-from typing import List, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Optional
 import asyncio
+import edge_tts
 from pydub import AudioSegment
 
-from utils.text_utils import split_text_into_chunks
-from utils.websocket_manager import WebSocketManager
+from utils.transcript import read_debate
+from utils.tts_cache import SpeechCache, timing_path
+from utils.text_utils import SUBTITLE_MAX_CHARS, chunk_spans, sentence_spans, split_text_into_chunks
+from utils.wav_utils import WavFormat, stitch_wav_files, supported_transfer_formats, wav_duration, wav_header
+from utils.websocket_manager import AudioFileWriter, WebSocketManager, close_connection_pools
 from audio.audio_clip import AudioClip
 
 # Update voice mapping to include Edge TTS voices
@@ -28,9 +33,42 @@ VOICES = {
 # Default voice to use if a speaker name isn't found
 DEFAULT_VOICE = {"speaker": 0, "model": "sesame"}
 
-def get_segment_audio_file(segment_index):
+# TTS server address, e.g. a utils/tts_stub_server.py instance for load testing
+TTS_SERVER_URI = os.environ.get("TTS_SERVER_URI", "ws://localhost:9000")
+
+# Synthesize "edge" voices with edge-tts in this process instead of through the TTS server
+TTS_EDGE_IN_PROCESS = os.environ.get("TTS_EDGE_IN_PROCESS", "1").lower() in ("1", "true", "yes")
+
+# Edge voice of each speaker ID used by the "edge" entries in VOICES; a "voice" key in the config overrides it
+EDGE_VOICES = {
+    0: "en-US-GuyNeural",
+    1: "en-US-JennyNeural",
+    2: "en-US-AriaNeural",
+    3: "en-GB-RyanNeural",
+    4: "en-GB-SoniaNeural"
+}
+
+# WordBoundary offsets and durations are in 100-nanosecond ticks
+_EDGE_TICKS_PER_SECOND = 10_000_000
+
+# Sample rate requested from the TTS server
+TTS_SAMPLE_RATE = 24000
+
+# Synthesize the sentences of each segment concurrently and join them, for exact subtitle cues
+TTS_BY_SENTENCE = os.environ.get("TTS_BY_SENTENCE", "").lower() in ("1", "true", "yes")
+
+# Segments synthesized at the same time by process_debate_segments
+TTS_CONCURRENCY = 4
+
+# Sentences of one segment synthesized at the same time in sentence mode
+TTS_SENTENCE_CONCURRENCY = 4
+
+# Send requests tagged with IDs over a few shared connections; needs a TTS server that supports it
+TTS_MULTIPLEX = os.environ.get("TTS_MULTIPLEX", "").lower() in ("1", "true", "yes")
+
+def get_segment_audio_file(segment_index, audio_dir='outputs/audio_output'):
     """Get the audio file for a specific segment index."""
-    clip = AudioClip.from_segment_index(segment_index)
+    clip = AudioClip.from_segment_index(segment_index, audio_dir)
     return clip.file_path if clip else None
 
 def get_segment_duration(audio_file):
@@ -40,13 +78,13 @@ def get_segment_duration(audio_file):
         return clip.duration
     return 5.0  # Default duration if we can't determine
 
-def get_all_timing_data():
+def get_all_timing_data(audio_dir='outputs/audio_output'):
     """Get all timing data across all segments for a comprehensive view."""
     all_timing = []
     
     try:
         # Get all timing JSON files
-        timing_files = [f for f in os.listdir('outputs/audio_output') if f.endswith('_timing.json')]
+        timing_files = [f for f in os.listdir(audio_dir) if f.endswith('_timing.json')]
         timing_files.sort()  # Ensure proper order
         
         # Absolute start time tracker to adjust all segments to a global timeline
@@ -56,7 +94,7 @@ def get_all_timing_data():
             try:
                 # Extract the audio file name for this timing file
                 audio_file = timing_file.replace('_timing.json', '.wav')
-                audio_path = os.path.join('outputs/audio_output', audio_file)
+                audio_path = os.path.join(audio_dir, audio_file)
                 
                 # Get audio duration using AudioClip
                 audio_duration = 0.0
@@ -65,7 +103,7 @@ def get_all_timing_data():
                     audio_duration = clip.duration
                 
                 # Load timing data
-                with open(os.path.join('outputs/audio_output', timing_file), 'r') as f:
+                with open(os.path.join(audio_dir, timing_file), 'r') as f:
                     timing_data = json.load(f)
                 
                 # Get the first segment to adjust everything
@@ -109,61 +147,31 @@ def get_all_timing_data():
         print(f"Error getting timing data: {str(e)}")
         return []
 
-def parse_debate():
+def parse_debate(file_path='outputs/debate.txt'):
     """Parse the debate.txt file to map text segments to speakers."""
-    segments = []
     try:
-        with open('outputs/debate.txt', 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        current_speaker = None
-        current_text = ""
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check if this line defines a speaker
-            if ":" in line and line.split(":")[0] in ["Narrator", "AI Debater 1", "AI Debater 2", "Jane", "Valentino", "Ground Statement", "Summary", "Result"]:
-                # If we have a previous segment, add it
-                if current_speaker and current_text:
-                    segments.append({
-                        "speaker": current_speaker,
-                        "text": current_text
-                    })
-                
-                parts = line.split(":", 1)
-                current_speaker = parts[0]
-                current_text = parts[1].strip()
-            else:
-                # Continue previous segment
-                if current_text:
-                    current_text += " " + line
-                else:
-                    current_text = line
-        
-        # Add the last segment
-        if current_speaker and current_text:
-            segments.append({
-                "speaker": current_speaker,
-                "text": current_text
-            })
-                    
-        return segments
+        return [{"speaker": prefix, "text": text}
+                for prefix, text in read_debate(file_path).entries if text]
     except Exception as e:
         print(f"Error parsing debate: {str(e)}")
         return []
 
-def get_segment_timing(audio_file):
+def get_segment_timing(audio_file, audio_dir=None):
     """Get the timing information for a specific audio segment."""
+    # Timing data lives next to the audio, so each run's directory gets its own cache entry
+    if audio_dir is None:
+        audio_dir = os.path.dirname(audio_file) if audio_file else 'outputs/audio_output'
+    
     # First, try to get all comprehensive timing data
-    all_timing = getattr(get_segment_timing, 'all_timing', None)
+    timing_cache = getattr(get_segment_timing, 'all_timing', None)
+    if timing_cache is None:
+        timing_cache = get_segment_timing.all_timing = {}
+    all_timing = timing_cache.get(audio_dir)
     if all_timing is None:
-        all_timing = get_all_timing_data()
+        all_timing = get_all_timing_data(audio_dir)
         
         # Cache it for future calls
-        get_segment_timing.all_timing = all_timing
+        timing_cache[audio_dir] = all_timing
         
     # If no audio file specified, return all timing
     if audio_file is None:
@@ -182,20 +190,22 @@ def get_segment_timing(audio_file):
         # Fall back to global timing data
         return all_timing
 
-def validate_audio_timing(output_file, timing_data):
+def validate_audio_timing(output_file, timing_data, audio_duration=None):
     """Validates that the audio and timing data are properly aligned.
     
     Args:
         output_file: Path to the audio file
         timing_data: The timing data dictionary with segments
+        audio_duration: Length of the audio in seconds, if already known
         
     Returns:
         bool: True if validation passes, False otherwise
     """
     try:
-        # Load the audio file
-        audio = AudioSegment.from_wav(output_file)
-        audio_duration = len(audio) / 1000.0  # Convert ms to seconds
+        if audio_duration is None:
+            # Load the audio file
+            audio = AudioSegment.from_wav(output_file)
+            audio_duration = len(audio) / 1000.0  # Convert ms to seconds
         
         # Extract timing info
         segments = timing_data.get("segments", [])
@@ -253,7 +263,266 @@ def validate_audio_timing(output_file, timing_data):
         print(f"Error validating timing: {e}")
         return False
 
-async def text_to_speech(text: str, voice_name_or_id, output_file: str, max_retries: int = 3) -> bool:
+def recognize_words(audio_file):
+    """Find when every word in a WAV file is spoken, with Vosk speech recognition.
+    
+    Returns:
+        Vosk results, dicts with "word", "start" and "end", or None if Vosk or
+        its model isn't available or nothing was recognized
+    """
+    try:
+        from vosk import Model, KaldiRecognizer, SetLogLevel
+        
+        print("Attempting to use Vosk for precise timing...")
+        # Suppress excessive logging
+        SetLogLevel(-1)
+        
+        # Check for model
+        model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "vosk-model-small-en-us-0.15")
+        if not os.path.exists(model_path):
+            print(f"Vosk model not found at {model_path}")
+            print(f"Please download the model by running:")
+            print(f"  1. mkdir -p AI-Slop-Master/models")
+            print(f"  2. cd AI-Slop-Master/models")
+            print(f"  3. curl -LO https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip")
+            print(f"  4. unzip vosk-model-small-en-us-0.15.zip")
+            # Fall back to our improved timing estimation
+            raise ImportError("Vosk model not found - download instructions printed above")
+        
+        # Convert audio to the format needed by Vosk (16kHz, mono)
+        audio = AudioSegment.from_wav(audio_file)
+        temp_audio_path = audio_file.replace('.wav', '_temp.wav')
+        audio.export(temp_audio_path, format="wav", parameters=["-ac", "1", "-ar", "16000"])
+        
+        # Initialize the model and recognizer
+        model = Model(model_path)
+        with open(temp_audio_path, "rb") as wf:
+            # Create recognizer
+            rec = KaldiRecognizer(model, 16000)
+            rec.SetWords(True)  # Enable word-level timestamps
+            
+            # Feed audio data
+            wf.read(44)  # Skip WAV header
+            while True:
+                data = wf.read(4000)
+                if len(data) == 0:
+                    break
+                if rec.AcceptWaveform(data):
+                    pass  # Process intermediate results if needed
+            
+            # Get final results
+            result = json.loads(rec.FinalResult())
+        
+        # Clean up temporary file
+        try:
+            os.remove(temp_audio_path)
+        except:
+            pass
+        return result.get("result") or None
+    except ImportError:
+        print("Vosk library not available, using fallback timing estimation")
+    except Exception as e:
+        print(f"Error during speech recognition: {e}, using fallback timing estimation")
+    return None
+
+async def edge_text_to_speech(text: str, voice_config: Dict, output_file: str) -> Dict:
+    """Synthesize an "edge" voice with edge-tts in this process.
+    
+    The MP3 stream is written to disk as it arrives and turned into the WAV
+    segment file once it's complete. The WordBoundary events that come with
+    it say exactly when every word is spoken, so no alignment pass is needed.
+    
+    Args:
+        text: The text to convert to speech
+        voice_config: An "edge" entry of VOICES
+        output_file: Path of the WAV file to write
+        
+    Returns:
+        Dict with metadata, length_bytes and sha256 of the MP3 stream, the
+        duration of the audio and its words as {"word", "start", "end"} in seconds
+    """
+    voice = voice_config.get("voice") or EDGE_VOICES.get(voice_config["speaker"], EDGE_VOICES[0])
+    options = {param: voice_config[param] for param in ("rate", "volume", "pitch") if voice_config.get(param)}
+    try:
+        communicate = edge_tts.Communicate(text, voice, boundary="WordBoundary", **options)
+    except TypeError:
+        # edge-tts before 7.0 always reports word boundaries and has no boundary option
+        communicate = edge_tts.Communicate(text, voice, **options)
+    
+    mp3 = AudioFileWriter(os.path.splitext(output_file)[0] + ".mp3")
+    words = []
+    try:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                mp3.write(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                start = chunk["offset"] / _EDGE_TICKS_PER_SECOND
+                words.append({"word": chunk["text"], "start": start,
+                              "end": start + chunk["duration"] / _EDGE_TICKS_PER_SECOND})
+        if not mp3.length:
+            raise Exception("edge-tts returned no audio")
+    except BaseException:
+        mp3.discard()
+        raise
+    
+    mp3_path = mp3.commit()
+    try:
+        audio = AudioSegment.from_mp3(mp3_path)
+        wav_format = WavFormat(audio.channels, audio.sample_width, audio.frame_rate)
+        wav = AudioFileWriter(output_file)
+        try:
+            wav.write(wav_header(wav_format, len(audio.raw_data)))
+            wav.write(audio.raw_data)
+        except BaseException:
+            wav.discard()
+            raise
+        wav.commit()
+    finally:
+        os.remove(mp3_path)
+    
+    return {
+        "metadata": {"status": "success", "model": "edge", "voice": voice, "format": "mp3",
+                     "sample_rate": wav_format.sample_rate, "word_count": len(words)},
+        "length_bytes": mp3.length,
+        "sha256": mp3.sha256,
+        "output_file": output_file,
+        "duration": wav_format.duration(len(audio.raw_data)),
+        "words": words
+    }
+
+def resolve_voice(voice_name_or_id) -> Dict:
+    """Voice configuration of a speaker name from VOICES or a bare speaker ID."""
+    if isinstance(voice_name_or_id, str) and voice_name_or_id in VOICES:
+        # If a voice name is provided and exists in the VOICES dictionary
+        return VOICES[voice_name_or_id]
+    if isinstance(voice_name_or_id, int):
+        # If a speaker ID is provided, use it with the default model
+        return {"speaker": voice_name_or_id, "model": "sesame"}
+    return DEFAULT_VOICE
+
+def synthesis_backend(voice_config: Dict) -> Dict:
+    """Describe what synthesize_speech would use for this voice, as part of a cache key.
+    
+    Server audio depends on the server and on the transfer format it answers
+    in (Opus is lossy), and the format is picked from the ones offered.
+    """
+    if voice_config["model"] == "edge" and TTS_EDGE_IN_PROCESS:
+        return {"backend": "edge-tts", "version": getattr(edge_tts, "__version__", None)}
+    return {"backend": "server", "uri": TTS_SERVER_URI, "accept_formats": supported_transfer_formats()}
+
+async def synthesize_speech(text: str, voice_config: Dict, output_file: str,
+                            max_audio_length_ms: int = 150000) -> Dict:
+    """Synthesize text into output_file in one request, with edge-tts in-process or on the TTS server.
+    
+    Returns:
+        Dict with the metadata, length_bytes, sha256 and duration of the audio,
+        and its words when the backend reported when each was spoken
+    """
+    if voice_config["model"] == "edge" and TTS_EDGE_IN_PROCESS:
+        # edge-tts runs right here and reports when every word is spoken
+        return await edge_text_to_speech(text, voice_config, output_file)
+    
+    # Create WebSocket manager without timeout
+    ws_manager = WebSocketManager(TTS_SERVER_URI, multiplex=TTS_MULTIPLEX)  # No timeout, wait indefinitely
+    
+    # Send TTS request with correct parameters based on voice configuration
+    kwargs = {
+        "text": text,
+        "speaker": voice_config["speaker"],
+        "sample_rate": TTS_SAMPLE_RATE,
+        "response_mode": "stream",
+        "max_audio_length_ms": max_audio_length_ms,
+        "model": voice_config["model"]
+    }
+    
+    # Add Edge TTS specific parameters if provided
+    if voice_config["model"] == "edge":
+        for param in ["rate", "volume", "pitch"]:
+            if param in voice_config:
+                kwargs[param] = voice_config[param]
+    
+    # The audio is streamed into a temp file that replaces output_file once it's complete.
+    # Servers that know when each word is spoken send word timestamps with it
+    return await ws_manager.send_tts_request(**kwargs, output_file=output_file, timestamps="word")
+
+async def synthesize_sentences(text: str, sentences: List, voice_config: Dict, output_file: str,
+                               max_audio_length_ms: int = 150000,
+                               concurrency: int = TTS_SENTENCE_CONCURRENCY) -> Dict:
+    """Synthesize the sentences of text concurrently and join their audio into output_file.
+    
+    Each sentence is synthesized into a part file of its own, up to
+    concurrency at a time, so a long segment takes a fraction of the time of
+    one request. The parts are copied into output_file one after another at
+    the PCM level under one header, and where each sentence starts and ends is
+    recorded as it is appended, so subtitle cues line up with the sentences
+    exactly.
+    
+    Args:
+        text: The text to convert to speech
+        sentences: (start, end) offsets of the sentences in text, from sentence_spans
+        voice_config: Entry of VOICES to speak with
+        output_file: Path to save the joined audio
+        max_audio_length_ms: Limit for each sentence
+        concurrency: Sentences synthesized at the same time
+        
+    Returns:
+        The same fields as synthesize_speech, plus sentence_offsets: the "text",
+        "start_time" and "end_time" of every sentence, and its "words" relative
+        to its own start when the backend reported them
+    """
+    texts = [text[start:end] for start, end in sentences]
+    root = os.path.splitext(output_file)[0]
+    parts = [f"{root}_sentence_{i}.wav" for i in range(len(texts))]
+    limit = asyncio.Semaphore(max(1, concurrency))
+    
+    async def synthesize(sentence, part):
+        async with limit:
+            return await synthesize_speech(sentence, voice_config, part, max_audio_length_ms)
+    
+    tasks = [asyncio.ensure_future(synthesize(sentence, part)) for sentence, part in zip(texts, parts)]
+    try:
+        results = await asyncio.gather(*tasks)
+        sink = AudioFileWriter(output_file)
+        try:
+            wav_format, offsets = stitch_wav_files(parts, sink)
+        except BaseException:
+            sink.discard()
+            raise
+        sink.commit()
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+    
+    sentence_offsets = []
+    for sentence, result, (start, end) in zip(texts, results, offsets):
+        sentence_offsets.append({"text": sentence, "start_time": start, "end_time": end})
+        if result.get("words"):
+            sentence_offsets[-1]["words"] = result["words"]
+    duration = offsets[-1][1]
+    print(f"Joined the audio of {len(texts)} sentences ({duration:.2f}s)")
+    return {
+        "metadata": {
+            "status": "success",
+            "sample_rate": wav_format.sample_rate,
+            "format": "wav",
+            "combined_sentences": len(texts),
+            "duration": duration
+        },
+        "length_bytes": sink.length,
+        "sha256": sink.sha256,
+        "output_file": output_file,
+        "wav_format": wav_format,
+        "duration": duration,
+        "sentence_offsets": sentence_offsets
+    }
+
+async def text_to_speech(text: str, voice_name_or_id, output_file: str, max_retries: int = 3,
+                         by_sentence: Optional[bool] = None) -> bool:
     """Convert text to speech using WebSocket TTS service.
     
     Args:
@@ -261,6 +530,8 @@ async def text_to_speech(text: str, voice_name_or_id, output_file: str, max_retr
         voice_name_or_id: Either a speaker name from VOICES dict or a speaker ID
         output_file: Path to save the generated audio
         max_retries: Number of retry attempts
+        by_sentence: Synthesize the sentences concurrently and join them, with
+            exact subtitle cues at the sentence boundaries; defaults to TTS_BY_SENTENCE
         
     Returns:
         bool: True if successful, False otherwise
@@ -274,255 +545,74 @@ async def text_to_speech(text: str, voice_name_or_id, output_file: str, max_retr
         max_audio_length_ms = 150000  # 2.5 minutes
         
         # Determine the voice configuration based on input
-        voice_config = DEFAULT_VOICE
+        voice_config = resolve_voice(voice_name_or_id)
         
-        if isinstance(voice_name_or_id, str) and voice_name_or_id in VOICES:
-            # If a voice name is provided and exists in the VOICES dictionary
-            voice_config = VOICES[voice_name_or_id]
-        elif isinstance(voice_name_or_id, int):
-            # If a speaker ID is provided, use it with the default model
-            voice_config = {"speaker": voice_name_or_id, "model": "sesame"}
+        if TTS_BY_SENTENCE if by_sentence is None else by_sentence:
+            sentences = sentence_spans(text)
+        else:
+            sentences = []
         
         # Try multiple times in case of connection issues
         for retry in range(max_retries):
             try:
-                # Create WebSocket manager without timeout
-                ws_manager = WebSocketManager()  # No timeout, wait indefinitely
-                
                 print(f"TTS attempt {retry+1}/{max_retries} for {output_file} using model {voice_config['model']}")
                 
-                # Send TTS request with correct parameters based on voice configuration
-                kwargs = {
-                    "text": text,
-                    "speaker": voice_config["speaker"],
-                    "sample_rate": 24000,
-                    "response_mode": "stream",
-                    "max_audio_length_ms": max_audio_length_ms,
-                    "model": voice_config["model"]
-                }
-                
-                # Add Edge TTS specific parameters if provided
-                if voice_config["model"] == "edge":
-                    for param in ["rate", "volume", "pitch"]:
-                        if param in voice_config:
-                            kwargs[param] = voice_config[param]
-                
-                result = await ws_manager.send_tts_request(**kwargs)
+                if len(sentences) > 1:
+                    # Every sentence is a request of its own, all running at once
+                    result = await synthesize_sentences(text, sentences, voice_config, output_file,
+                                                        max_audio_length_ms)
+                else:
+                    result = await synthesize_speech(text, voice_config, output_file, max_audio_length_ms)
                 
                 # Extract metadata
                 metadata = result.get("metadata", {})
                 print(f"TTS response metadata: {json.dumps(metadata)}")
+                # Start and end times of the chunks a long text was synthesized in
+                anchors = result.get("chunk_offsets")
+                # When each word was spoken, from backends that know
+                words = result.get("words")
+                # Where each sentence starts and ends in the joined audio
+                sentence_offsets = result.get("sentence_offsets")
                 
                 # Add detailed logging about the received audio data
-                audio_data = result.get("audio_data", b"")
-                print(f"Received audio data size: {len(audio_data)} bytes")
-                if len(audio_data) < 100000:  # If suspiciously small
+                print(f"Received audio data size: {result['length_bytes']} bytes (sha256 {result['sha256'][:12]})")
+                if result["length_bytes"] < 100000:  # If suspiciously small
                     print(f"WARNING: Audio data seems unusually small for the text length ({len(text)} chars)")
                 
-                # Try to save the audio data with file permission handling
-                file_saved = False
-                for file_retry in range(3):  # Try 3 times to save the file
-                    try:
-                        # Check if file exists and try to remove it first
-                        if os.path.exists(output_file):
-                            try:
-                                os.remove(output_file)
-                                print(f"Removed existing file: {output_file}")
-                            except (PermissionError, OSError) as e:
-                                print(f"Warning: Could not remove existing file {output_file}: {e}")
-                                # Try with a different filename if we can't remove the existing one
-                                output_file = output_file.replace('.wav', f'_new_{file_retry}.wav')
-                                print(f"Trying alternate filename: {output_file}")
-                        
-                        # Save the audio data
-                        with open(output_file, "wb") as f:
-                            f.write(result["audio_data"])
-                        
-                        file_saved = True
-                        break  # File saved successfully
-                    except (PermissionError, OSError) as e:
-                        print(f"Error saving file on attempt {file_retry+1}: {e}")
-                        if file_retry < 2:  # Last retry
-                            print(f"Waiting 1 second before retrying...")
-                            await asyncio.sleep(1)
-                
-                if not file_saved:
-                    print(f"Failed to save audio file after multiple attempts. Continuing without saving.")
-                    return False
+                # The client already knows the length of the audio it received, so it isn't decoded again
+                duration = result.get("duration")
                 
                 # Create timing data based on text chunks
                 try:
-                    audio = AudioSegment.from_wav(output_file)
-                    duration = len(audio) / 1000.0  # Convert ms to seconds
+                    if duration is None:
+                        duration = wav_duration(output_file)
+                    timing_data = None
                     
-                    # First try to use forced alignment if available (most accurate)
-                    try:
-                        # Remove redundant imports that are already available at module level
-                        # import os  # Already imported at module level
-                        # import json  # Already imported at module level
-                        from vosk import Model, KaldiRecognizer, SetLogLevel
-                        
-                        print("Attempting to use Vosk for precise timing...")
-                        # Suppress excessive logging
-                        SetLogLevel(-1)
-                        
-                        # Check for model
-                        model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "vosk-model-small-en-us-0.15")
-                        if not os.path.exists(model_path):
-                            print(f"Vosk model not found at {model_path}")
-                            print(f"Please download the model by running:")
-                            print(f"  1. mkdir -p AI-Slop-Master/models")
-                            print(f"  2. cd AI-Slop-Master/models")
-                            print(f"  3. curl -LO https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip")
-                            print(f"  4. unzip vosk-model-small-en-us-0.15.zip")
-                            # Fall back to our improved timing estimation
-                            raise ImportError("Vosk model not found - download instructions printed above")
-                        
-                        # Convert audio to the format needed by Vosk (16kHz, mono)
-                        temp_audio_path = output_file.replace('.wav', '_temp.wav')
-                        audio.export(temp_audio_path, format="wav", parameters=["-ac", "1", "-ar", "16000"])
-                        
-                        # Initialize the model and recognizer
-                        model = Model(model_path)
-                        with open(temp_audio_path, "rb") as wf:
-                            # Create recognizer
-                            rec = KaldiRecognizer(model, 16000)
-                            rec.SetWords(True)  # Enable word-level timestamps
-                            
-                            # Feed audio data
-                            wf.read(44)  # Skip WAV header
-                            while True:
-                                data = wf.read(4000)
-                                if len(data) == 0:
-                                    break
-                                if rec.AcceptWaveform(data):
-                                    pass  # Process intermediate results if needed
-                            
-                            # Get final results
-                            result = json.loads(rec.FinalResult())
-                        
-                        # Process results if words are available
-                        if "result" in result and result["result"]:
-                            words = result["result"]
-                            
-                            # Group words into reasonable chunks for subtitles
-                            timing_data = {"segments": []}
-                            current_segment = {"text": "", "start_time": 0, "end_time": 0}
-                            word_count = 0
-                            
-                            for word in words:
-                                # Start a new segment every ~10-15 words or at reasonable points
-                                end_marker = word["word"].endswith(('.', ',', '!', '?', ':', ';'))
-                                if (word_count >= 10 and end_marker) or word_count >= 15:
-                                    if current_segment["text"]:
-                                        current_segment["end_time"] = word["end"]
-                                        timing_data["segments"].append(current_segment)
-                                        current_segment = {"text": "", "start_time": word["end"], "end_time": 0}
-                                        word_count = 0
-                                
-                                # Add word to current segment
-                                if current_segment["text"]:
-                                    current_segment["text"] += " " + word["word"]
-                                else:
-                                    current_segment["text"] = word["word"]
-                                    current_segment["start_time"] = word["start"]
-                                
-                                word_count += 1
-                            
-                            # Add the last segment if it has content
-                            if current_segment["text"]:
-                                current_segment["end_time"] = duration
-                                timing_data["segments"].append(current_segment)
-                            
-                            # Clean up the segments
-                            for segment in timing_data["segments"]:
-                                segment["text"] = clean_sentence(segment["text"])
-                            
+                    if sentence_offsets:
+                        # Sentence boundaries are exact, so only cues within a sentence are aligned or estimated
+                        timing_data = {"segments": sentence_timing_segments(sentence_offsets)}
+                        print(f"Created {len(timing_data['segments'])} timing segments from "
+                              f"{len(sentence_offsets)} sentence offsets")
+                    elif words:
+                        # The backend's word timings are exact, so speech recognition only runs without them
+                        timing_data = {"segments": align_timing_segments(text, words, duration)}
+                        print(f"Created {len(timing_data['segments'])} timing segments from {len(words)} word timings")
+                    else:
+                        # First try to use forced alignment if available (most accurate)
+                        words = recognize_words(output_file)
+                        if words:
+                            # Time the same subtitle chunks the fallback estimate would use
+                            timing_data = {"segments": align_timing_segments(text, words, duration)}
                             print(f"Successfully created {len(timing_data['segments'])} timing segments using Vosk")
-                            
-                            # Clean up temporary file
-                            try:
-                                os.remove(temp_audio_path)
-                            except:
-                                pass
-                            
-                            # Skip the fallback timing method
-                            raise StopIteration("Used Vosk for alignment")
-                    except ImportError:
-                        print("Vosk library not available, using fallback timing estimation")
-                    except Exception as e:
-                        if isinstance(e, StopIteration):
-                            raise
-                        print(f"Error during speech recognition: {e}, using fallback timing estimation")
-                    
-                    # Fallback: Improved timing estimation based on natural language features
-                    print(f"Creating improved timing data for audio with duration {duration:.2f} seconds")
                     
-                    # We'll use natural language features to estimate timing more accurately
-                    sentences = []
-                    current_sentence = ""
-                    # Split text into sentences based on punctuation
-                    for char in text:
-                        current_sentence += char
-                        if char in ['.', '!', '?', ':', ';'] and current_sentence.strip():
-                            sentences.append(current_sentence.strip())
-                            current_sentence = ""
-                    # Add any remaining text as the last sentence
-                    if current_sentence.strip():
-                        sentences.append(current_sentence.strip())
-                    
-                    # Calculate character count for each sentence
-                    total_chars = sum(len(s) for s in sentences)
-                    
-                    # Create timing data with a more natural distribution
-                    timing_data = {"segments": []}
-                    current_time = 0.0
-                    
-                    for sentence in sentences:
-                        # Clean the sentence for better subtitle display
-                        sentence = clean_sentence(sentence)
-                        if not sentence:  # Skip empty sentences
-                            continue
-                        
-                        # Estimate duration based on sentence length, with adjustments
-                        # 1. Base timing: characters in sentence / total characters * total duration
-                        # 2. Adjustment for natural pauses between sentences
-                        # 3. Adjustment for slower speaking at the beginning and end
-                        
-                        # Base estimate (proportional to character count)
-                        char_ratio = len(sentence) / total_chars
-                        sentence_duration = char_ratio * duration
-                        
-                        # Small adjustment for natural pauses at punctuation (add a little extra time)
-                        if sentence.endswith(('.', '!', '?')):
-                            sentence_duration += 0.2  # Add 200ms for major punctuation
-                        elif sentence.endswith((':', ';')):
-                            sentence_duration += 0.1  # Add 100ms for minor punctuation
-                        
-                        # Create segment
-                        segment = {
-                            "text": sentence,
-                            "start_time": current_time,
-                            "end_time": current_time + sentence_duration
-                        }
-                        timing_data["segments"].append(segment)
-                        
-                        # Update current time for next segment
-                        current_time += sentence_duration
-                    
-                    # Normalize timing to match actual audio duration
-                    if timing_data["segments"] and timing_data["segments"][-1]["end_time"] != duration:
-                        # Scale all timings to match the actual audio duration
-                        scale_factor = duration / timing_data["segments"][-1]["end_time"]
-                        
-                        # Apply scaling to all segments
-                        for segment in timing_data["segments"]:
-                            segment["start_time"] *= scale_factor
-                            segment["end_time"] *= scale_factor
-                        
-                        # Ensure the last segment ends at the exact audio duration
-                        if timing_data["segments"]:
-                            timing_data["segments"][-1]["end_time"] = duration
+                    if not timing_data or not timing_data["segments"]:
+                        # Fallback: Improved timing estimation based on natural language features
+                        print(f"Creating improved timing data for audio with duration {duration:.2f} seconds")
+                        if anchors:
+                            # Long texts come back with the exact start and end of every chunk
+                            timing_data = {"segments": anchored_timing_segments(anchors)}
+                        else:
+                            timing_data = {"segments": estimate_timing_segments(text, duration)}
                 except Exception as e:
                     print(f"Warning: Could not create detailed timing: {str(e)}")
                     # Create at least one basic timing segment with estimated duration
@@ -538,7 +628,7 @@ async def text_to_speech(text: str, voice_name_or_id, output_file: str, max_retr
                 for timing_retry in range(3):
                     try:
                         # Validate and potentially correct the timing data
-                        validate_audio_timing(output_file, timing_data)
+                        validate_audio_timing(output_file, timing_data, duration)
                         
                         # Save the (potentially corrected) timing data
                         with open(timing_file, 'w') as f:
@@ -618,6 +708,26 @@ async def text_to_speech(text: str, voice_name_or_id, output_file: str, max_retr
         print(traceback.format_exc())
         return False
 
+async def cached_text_to_speech(text: str, voice_name_or_id, output_file: str,
+                                speech_cache: Optional[SpeechCache] = None,
+                                by_sentence: Optional[bool] = None) -> bool:
+    """text_to_speech, answered from speech_cache when the same text was already spoken in the same voice.
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    # Only passed on when set, so text_to_speech falls back to TTS_BY_SENTENCE
+    options = {} if by_sentence is None else {"by_sentence": by_sentence}
+    if speech_cache is None:
+        return await text_to_speech(text, voice_name_or_id, output_file, **options)
+    voice_config = resolve_voice(voice_name_or_id)
+    if TTS_BY_SENTENCE if by_sentence is None else by_sentence:
+        # Joined sentences don't sound the same as one request for the whole text
+        voice_config = dict(voice_config, by_sentence=True)
+    key = speech_cache.make_key(text, voice_config, TTS_SAMPLE_RATE, synthesis_backend(voice_config))
+    return await speech_cache.synthesize(key, output_file,
+                                         lambda path: text_to_speech(text, voice_name_or_id, path, **options))
+
 def get_current_subtitle(timing_segments, current_time, default_text=''):
     """Get the current subtitle text based on timing information."""
     # If timing_segments contains proper AudioClip object, use its method
@@ -668,13 +778,141 @@ def get_current_subtitle(timing_segments, current_time, default_text=''):
     
     return default_text, None
 
+async def warm_up_tts(speakers: List[str] = ("Narrator", "Jane", "Valentino")) -> Dict[str, bool]:
+    """Ask the TTS server to load the models of these voices before the first segment needs one.
+    
+    Returns:
+        Whether each model answered
+    """
+    models = [VOICES.get(speaker, DEFAULT_VOICE)["model"] for speaker in speakers]
+    if TTS_EDGE_IN_PROCESS:
+        # edge-tts runs in this process, so the server never needs its edge model
+        models = [model for model in models if model != "edge"]
+    if not models:
+        return {}
+    return await WebSocketManager(TTS_SERVER_URI, multiplex=TTS_MULTIPLEX).warm_up(models)
+
+class SpeechPrefetcher:
+    """Synthesizes segments whose text is final before the debate is over.
+    
+    The narrator's opening segment is known as soon as the debate starts, so
+    it can be synthesized (and timing-aligned) in a background thread while
+    the LLM rounds are still running. process_debate_segments then picks up
+    the finished audio instead of synthesizing that segment again.
+    
+    Jobs write to a private file next to the segment, which is only moved into
+    place once take() confirms the text, so a stale job that is still running
+    can never overwrite audio synthesized for the final text.
+    """
+    
+    def __init__(self, output_dir: str = 'outputs/audio_output',
+                 speech_cache: Optional[SpeechCache] = None):
+        self.output_dir = output_dir
+        self.speech_cache = speech_cache
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-prefetch")
+        self._jobs = {}
+    
+    def submit(self, segment_index: int, speaker: str, text: str) -> Future:
+        """Start synthesizing a segment in the background."""
+        prefetch_path = self._prefetch_path(segment_index)
+        print(f"Pre-synthesizing segment {segment_index} for {speaker} in the background")
+        # The worker thread runs its own event loop, so this works for sync and async debates alike
+        future = self._executor.submit(
+            lambda: asyncio.run(self._synthesize(text, speaker, prefetch_path, self.speech_cache)))
+        self._jobs[segment_index] = (speaker, text, future)
+        return future
+    
+    def _prefetch_path(self, segment_index: int) -> str:
+        return os.path.join(self.output_dir, f"segment_{segment_index}.prefetch.wav")
+    
+    def _discard(self, segment_index: int, future: Future) -> None:
+        """Cancel a job, and delete its audio whenever it finishes."""
+        future.cancel()
+        prefetch_path = self._prefetch_path(segment_index)
+        
+        def remove_files(_):
+            for path in (prefetch_path, timing_path(prefetch_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        # Runs right away if the job is done or was cancelled, otherwise when it finishes
+        future.add_done_callback(remove_files)
+    
+    def warm_up(self, speakers: List[str]) -> Future:
+        """Load the TTS models of these voices in the background; runs before later submissions."""
+        print(f"Warming up the TTS models for {', '.join(speakers)} in the background")
+        return self._executor.submit(lambda: asyncio.run(self._warm_up(speakers)))
+    
+    @staticmethod
+    async def _warm_up(speakers: List[str]) -> Dict[str, bool]:
+        try:
+            return await warm_up_tts(speakers)
+        finally:
+            await close_connection_pools()
+    
+    @staticmethod
+    async def _synthesize(text: str, speaker: str, output_path: str,
+                          speech_cache: Optional[SpeechCache] = None) -> bool:
+        try:
+            return await cached_text_to_speech(text, speaker, output_path, speech_cache)
+        finally:
+            # The connections belong to this job's event loop, which ends with it
+            await close_connection_pools()
+    
+    async def take(self, segment_index: int, speaker: str, text: str) -> bool:
+        """Wait for a pre-synthesized segment.
+        
+        Returns:
+            bool: True if the segment was pre-synthesized successfully with exactly this
+                  speaker and text, False if it still has to be synthesized
+        """
+        job = self._jobs.pop(segment_index, None)
+        if job is None:
+            return False
+        job_speaker, job_text, future = job
+        if (job_speaker, job_text) != (speaker, text):
+            print(f"Pre-synthesized segment {segment_index} doesn't match the final text, discarding it")
+            self._discard(segment_index, future)
+            return False
+        try:
+            success = bool(await asyncio.wrap_future(future))
+        except Exception as e:
+            print(f"Pre-synthesis of segment {segment_index} failed: {e}")
+            success = False
+        if not success:
+            self._discard(segment_index, future)
+            return False
+        
+        # Only now that the text is confirmed does the audio take the segment's place
+        prefetch_path = self._prefetch_path(segment_index)
+        output_path = os.path.join(self.output_dir, f"segment_{segment_index}.wav")
+        try:
+            if os.path.exists(timing_path(prefetch_path)):
+                os.replace(timing_path(prefetch_path), timing_path(output_path))
+            os.replace(prefetch_path, output_path)
+        except OSError as e:
+            print(f"Could not use pre-synthesized segment {segment_index}: {e}")
+            return False
+        return True
+    
+    def close(self) -> None:
+        """Stop accepting work; a synthesis already running is left to finish, then its audio is deleted."""
+        for segment_index, (_, _, future) in self._jobs.items():
+            self._discard(segment_index, future)
+        self._jobs.clear()
+        self._executor.shutdown(wait=False)
+
 async def generate_debate_speech(segments: List[Dict[str, str]], 
-                               output_dir: str = 'outputs/audio_output') -> bool:
+                               output_dir: str = 'outputs/audio_output',
+                               prefetcher: Optional[SpeechPrefetcher] = None,
+                               speech_cache: Optional[SpeechCache] = None) -> bool:
     """Generate speech for all debate segments.
     
     Args:
         segments: List of debate segments, each with 'speaker' and 'text' keys
         output_dir: Directory to save the generated audio files
+        prefetcher: Segments already being synthesized in the background
+        speech_cache: Cache of segments synthesized before, shared between debates
         
     Returns:
         bool: True if successful, False otherwise
@@ -685,7 +923,12 @@ async def generate_debate_speech(segments: List[Dict[str, str]],
             os.makedirs(output_dir)
         
         # Process the segments using the utility function
-        success = await process_debate_segments(segments, output_dir)
+        options = {}
+        if prefetcher is not None:
+            options["prefetcher"] = prefetcher
+        if speech_cache is not None:
+            options["speech_cache"] = speech_cache
+        success = await process_debate_segments(segments, output_dir, **options)
         if success:
             print("Speech generation completed successfully")
         else:
@@ -696,22 +939,34 @@ async def generate_debate_speech(segments: List[Dict[str, str]],
         print(f"Error in generate_debate_speech: {e}")
         return False
 
-async def process_debate_segments(segments: List[Dict[str, str]], output_dir: str = 'outputs/audio_output') -> bool:
+async def process_debate_segments(segments: List[Dict[str, str]], output_dir: str = 'outputs/audio_output',
+                                  prefetcher: Optional[SpeechPrefetcher] = None,
+                                  concurrency: int = TTS_CONCURRENCY,
+                                  speech_cache: Optional[SpeechCache] = None,
+                                  by_sentence: Optional[bool] = None) -> bool:
     """Process debate segments and generate speech.
     
     Args:
         segments: List of debate segments, each with 'speaker' and 'text' keys
         output_dir: Directory to save the generated audio files
+        prefetcher: Segments already being synthesized in the background; those
+            are awaited instead of being synthesized again
+        concurrency: Number of segments synthesized at the same time
+        speech_cache: Cache of segments synthesized before; hits are linked into
+            output_dir instead of being synthesized again
+        by_sentence: Synthesize the sentences of each segment concurrently, for
+            exact subtitle cues; defaults to TTS_BY_SENTENCE
         
     Returns:
         bool: True if successful, False otherwise
     """
+    tasks = []
     try:
         total_duration = 0
-        segment_index = 0
         success_count = 0
         
-        # Process each segment
+        # Number the segments up front so several can be synthesized at once
+        jobs = []
         for segment in segments:
             speaker_name = segment.get('speaker', 'Narrator')
             text = segment.get('text', '')
@@ -719,25 +974,39 @@ async def process_debate_segments(segments: List[Dict[str, str]], output_dir: st
             if not text.strip():
                 print(f"Warning: Empty text for speaker {speaker_name}, skipping")
                 continue
-            
-            print(f"\nProcessing segment {segment_index} for speaker: {speaker_name}")
-            print(f"Text: {text[:100]}{'...' if len(text) > 100 else ''}")
-            
+            jobs.append((len(jobs), speaker_name, text))
+        
+        if TTS_BY_SENTENCE if by_sentence is None else by_sentence:
+            # Every segment already sends up to TTS_SENTENCE_CONCURRENCY requests at once,
+            # so fewer segments run side by side and the server sees about the same load
+            concurrency = max(1, concurrency // TTS_SENTENCE_CONCURRENCY)
+        limit = asyncio.Semaphore(max(1, concurrency))
+        
+        async def synthesize(segment_index, speaker_name, text):
+            output_path = os.path.join(output_dir, f"segment_{segment_index}.wav")
+            # Use the background synthesis if this segment was started early, otherwise generate speech now
+            if prefetcher and await prefetcher.take(segment_index, speaker_name, text):
+                print(f"Using pre-synthesized audio for segment {segment_index}")
+                return True
+            async with limit:
+                print(f"\nProcessing segment {segment_index} for speaker: {speaker_name}")
+                print(f"Text: {text[:100]}{'...' if len(text) > 100 else ''}")
+                return await cached_text_to_speech(text, speaker_name, output_path, speech_cache, by_sentence)
+        
+        tasks = [asyncio.ensure_future(synthesize(*job)) for job in jobs]
+        
+        # Collect the results in segment order
+        for (segment_index, speaker_name, text), task in zip(jobs, tasks):
             # Get voice configuration - either from VOICES dict or fallback to default voice
             voice_config = VOICES.get(speaker_name, DEFAULT_VOICE)
-            print(f"Using voice config: {voice_config}")
             
             # Output path for this segment
             output_path = os.path.join(output_dir, f"segment_{segment_index}.wav")
-            timing_path = os.path.join(output_dir, f"segment_{segment_index}_timing.json")
-            
-            # Generate speech
-            success = await text_to_speech(text, speaker_name, output_path)
+            success = await task
             
             if success and os.path.exists(output_path):
-                # Get duration of the generated audio
-                audio = AudioSegment.from_wav(output_path)
-                duration = len(audio) / 1000.0  # Convert ms to seconds
+                # Get duration of the generated audio from its header
+                duration = wav_duration(output_path)
                 total_duration += duration
                 
                 print(f"Generated audio for segment {segment_index}: {duration:.2f} seconds")
@@ -756,9 +1025,6 @@ async def process_debate_segments(segments: List[Dict[str, str]], output_dir: st
                 
                 # Save the clip info
                 clip.save()
-                
-                # Increment segment index only for successful generations
-                segment_index += 1
             else:
                 print(f"Failed to generate audio for segment {segment_index}")
         
@@ -774,6 +1040,135 @@ async def process_debate_segments(segments: List[Dict[str, str]], output_dir: st
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def estimate_timing_segments(text, duration):
+    """Estimate subtitle timing for text spoken over duration seconds.
+    
+    The text is split into subtitle chunks, and each chunk gets a share of the
+    duration proportional to its length, plus a little extra for the pause
+    after its punctuation.
+    
+    Returns:
+        List of {"text", "start_time", "end_time"} segments covering the duration
+    """
+    spans = chunk_spans(text, SUBTITLE_MAX_CHARS, clauses=True)
+    total_chars = sum(end - start for start, end in spans)
+    
+    segments = []
+    current_time = 0.0
+    for start, end in spans:
+        # Clean the sentence for better subtitle display
+        sentence = clean_sentence(text[start:end])
+        if not sentence:  # Skip empty sentences
+            continue
+        
+        # Base estimate (proportional to character count)
+        sentence_duration = (end - start) / total_chars * duration
+        
+        # Small adjustment for natural pauses at punctuation (add a little extra time)
+        if sentence.endswith(('.', '!', '?')):
+            sentence_duration += 0.2  # Add 200ms for major punctuation
+        elif sentence.endswith((':', ';')):
+            sentence_duration += 0.1  # Add 100ms for minor punctuation
+        
+        segments.append({
+            "text": sentence,
+            "start_time": current_time,
+            "end_time": current_time + sentence_duration
+        })
+        current_time += sentence_duration
+    
+    # Scale all timings to match the actual audio duration
+    if segments and segments[-1]["end_time"] != duration:
+        scale_factor = duration / segments[-1]["end_time"]
+        for segment in segments:
+            segment["start_time"] *= scale_factor
+            segment["end_time"] *= scale_factor
+        segments[-1]["end_time"] = duration
+    return segments
+
+def anchored_timing_segments(anchors):
+    """Estimate subtitle timing within chunks whose start and end times are known.
+    
+    Args:
+        anchors: Dicts with the "text", "start_time" and "end_time" of each chunk
+        
+    Returns:
+        List of {"text", "start_time", "end_time"} segments
+    """
+    segments = []
+    for anchor in anchors:
+        for segment in estimate_timing_segments(anchor["text"], anchor["end_time"] - anchor["start_time"]):
+            segment["start_time"] += anchor["start_time"]
+            segment["end_time"] += anchor["start_time"]
+            segments.append(segment)
+    return segments
+
+def sentence_timing_segments(sentences):
+    """Subtitle timing for sentences that were synthesized separately and joined.
+    
+    Each sentence's cues stay within its exact start and end. They are timed
+    with the sentence's word timestamps when there are any and estimated
+    otherwise.
+    
+    Args:
+        sentences: Dicts with the "text", "start_time", "end_time" and optionally
+            the "words" of each sentence, relative to its start
+        
+    Returns:
+        List of {"text", "start_time", "end_time"} segments
+    """
+    segments = []
+    for sentence in sentences:
+        duration = sentence["end_time"] - sentence["start_time"]
+        sentence_segments = []
+        if sentence.get("words"):
+            sentence_segments = align_timing_segments(sentence["text"], sentence["words"], duration)
+        if not sentence_segments:
+            sentence_segments = estimate_timing_segments(sentence["text"], duration)
+        for segment in sentence_segments:
+            segment["start_time"] += sentence["start_time"]
+            segment["end_time"] += sentence["start_time"]
+            segments.append(segment)
+    return segments
+
+def align_timing_segments(text, words, duration):
+    """Time the subtitle chunks of text with the word timestamps from Vosk.
+    
+    The chunks are the same ones estimate_timing_segments uses. Recognized
+    words don't always match the text one to one, so they are spread over
+    the chunks in proportion to each chunk's share of the text's words.
+    
+    Args:
+        text: Text that was spoken
+        words: Vosk results, dicts with "word", "start" and "end"
+        duration: Length of the audio in seconds
+        
+    Returns:
+        List of {"text", "start_time", "end_time"} segments
+    """
+    spans = chunk_spans(text, SUBTITLE_MAX_CHARS, clauses=True)
+    word_counts = [len(text[start:end].split()) for start, end in spans]
+    total_words = sum(word_counts)
+    if not words or not total_words:
+        return []
+    
+    segments = []
+    words_before = 0
+    for (start, end), count in zip(spans, word_counts):
+        first = min(len(words) - 1, words_before * len(words) // total_words)
+        words_before += count
+        last = max(first, words_before * len(words) // total_words - 1)
+        segments.append({
+            "text": clean_sentence(text[start:end]),
+            "start_time": words[first]["start"],
+            "end_time": words[last]["end"]
+        })
+    segments[-1]["end_time"] = duration
+    return segments
 
 def clean_sentence(text):
     """Clean up a sentence for better subtitle display.
@@ -0,0 +1,27 @@
+import json
+import os
+from typing import Dict
+
+CHECKPOINT_VERSION = 1
+
+
+def write_checkpoint(file_path: str, state: Dict) -> None:
+    """Write a checkpoint atomically, so a crash mid-write leaves the previous one intact."""
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": CHECKPOINT_VERSION, **state}, f, ensure_ascii=False)
+    os.replace(temp_path, file_path)
+
+
+def read_checkpoint(file_path: str) -> Dict:
+    """Read a checkpoint written by write_checkpoint.
+
+    Raises:
+        FileNotFoundError: If there is no checkpoint
+        ValueError: If the checkpoint is corrupt or from an incompatible version
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {state.get('version')} in {file_path}")
+    return state
@@ -2,92 +2,40 @@ import os
 import time
 import shutil
 
+from utils.transcript import read_debate, rewrite_debate
+
 # Add a global variable to store the summary
 _ground_statement_summary = None
 
-def parse_debate_file():
+def parse_debate_file(file_path='outputs/debate.txt'):
     """Parse debate.txt file to get dialogue segments and speakers."""
     global _ground_statement_summary
-    dialogue_segments = []
+    # Don't carry a summary over from a previously parsed debate
+    _ground_statement_summary = None
     
     try:
-        with open('outputs/debate.txt', 'r', encoding='utf-8') as f:
-            current_speaker = None
-            current_text = ""
-            
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Extract the summary but don't include it in spoken dialogue
-                if line.startswith("Summary:"):
-                    _ground_statement_summary = line.replace("Summary:", "").strip()
-                    continue
-                
-                new_speaker = None
-                text = line
-                
-                # Determine speaker from line prefix
-                if line.startswith("Narrator:"):
-                    new_speaker = "Narrator"
-                    text = line.replace("Narrator:", "").strip()
-                elif line.startswith("Ground Statement:") or line.startswith("Result:"):
-                    new_speaker = "Narrator"
-                    text = line.strip()
-                elif line.startswith("AI Debater 1:"):
-                    new_speaker = "Jane"  # AI Debater 1 is always Jane
-                    text = line.replace("AI Debater 1:", "").strip()
-                elif line.startswith("AI Debater 2:"):
-                    new_speaker = "Valentino"  # AI Debater 2 is always Valentino
-                    text = line.replace("AI Debater 2:", "").strip()
-                else:
-                    continue
-                
-                # If we found a speaker and text
-                if new_speaker and text:
-                    # Add the completed previous segment if speaker changes
-                    if current_speaker and (current_speaker != new_speaker or current_speaker == "Narrator"):
-                        if current_text:
-                            dialogue_segments.append({"speaker": current_speaker, "text": current_text})
-                        current_text = ""
-                    
-                    # Update current speaker and add text
-                    current_speaker = new_speaker
-                    current_text = text if not current_text else current_text + " " + text
-            
-            # Add the final segment
-            if current_speaker and current_text:
-                dialogue_segments.append({"speaker": current_speaker, "text": current_text})
-    
+        parsed = read_debate(file_path)
     except (FileNotFoundError, IOError) as e:
         print(f"Error reading debate file: {str(e)}")
+        print("Parsed 0 dialogue segments")
+        return []
     
-    # Validate segments to ensure consistent speaker attribution
-    validated_segments = []
-    for i, segment in enumerate(dialogue_segments):
-        if i > 0 and segment["speaker"] == dialogue_segments[i-1]["speaker"]:
-            # If same speaker in consecutive segments, merge them
-            if validated_segments:  # Make sure we have at least one segment
-                validated_segments[-1]["text"] += " " + segment["text"]
-        else:
-            validated_segments.append(segment)
+    # Extract the summary but don't include it in spoken dialogue
+    _ground_statement_summary = parsed.summary
     
-    print(f"Parsed {len(validated_segments)} dialogue segments")
-    return validated_segments
+    # Copies, so callers can't change the cached parse
+    dialogue_segments = parsed.segment_dicts()
+    print(f"Parsed {len(dialogue_segments)} dialogue segments")
+    return dialogue_segments
 
-def get_ground_statement_summary():
+def get_ground_statement_summary(file_path='outputs/debate.txt'):
     """Get the extracted ground statement summary."""
     global _ground_statement_summary
     
     # If we don't have a summary yet, try to extract it directly
     if _ground_statement_summary is None:
         try:
-            with open('outputs/debate.txt', 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.startswith("Summary:"):
-                        _ground_statement_summary = line.replace("Summary:", "").strip()
-                        break
+            _ground_statement_summary = read_debate(file_path).summary
         except Exception as e:
             print(f"Error extracting ground statement summary: {e}")
     
@@ -160,59 +108,10 @@ def reformat_debate_file(file_path='outputs/debate.txt'):
     Returns:
         bool: True if reformatting was successful, False otherwise
     """
-    valid_prefixes = [
-        "Narrator:", 
-        "Ground Statement:", 
-        "Summary:", 
-        "AI Debater 1:", 
-        "AI Debater 2:", 
-        "Result:"
-    ]
-    
     try:
-        # Read the entire file content
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Split into lines and process
-        lines = content.split('\n')
-        reformatted_lines = []
-        current_line = ""
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue  # Skip empty lines
-                
-            # Check if this line starts with a valid prefix
-            is_valid_start = any(line.startswith(prefix) for prefix in valid_prefixes)
-            
-            if is_valid_start:
-                # If we have accumulated content from previous speaker, save it
-                if current_line:
-                    reformatted_lines.append(current_line)
-                # Start a new line with this prefix
-                current_line = line
-            else:
-                # This is a continuation of the previous speaker's text
-                # Add a space and append to the current line
-                if current_line:
-                    current_line += " " + line
-                else:
-                    # Shouldn't normally happen, but handle just in case
-                    current_line = line
-        
-        # Add the last accumulated line if it exists
-        if current_line:
-            reformatted_lines.append(current_line)
-        
-        # Join all reformatted lines with newlines and write back to the file
-        reformatted_content = '\n'.join(reformatted_lines)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(reformatted_content)
-        
+        rewrite_debate(file_path)
         print(f"Successfully reformatted {file_path}")
         return True
     except Exception as e:
         print(f"Error reformatting debate file: {str(e)}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,131 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from openai import AsyncOpenAI, OpenAI
+
+
+class Completion(str):
+    """Completion text that also says why the provider stopped generating it.
+
+    finish_reason is "length" for an answer that was cut off at max_tokens.
+    Plain strings returned by a backend count as finished answers.
+    """
+
+    def __new__(cls, text: str, finish_reason: Optional[str] = None):
+        completion = super().__new__(cls, text)
+        completion.finish_reason = finish_reason
+        return completion
+
+
+class LLMBackend:
+    """Interface for the chat completion provider behind AIDebater.
+
+    A backend receives the same request dict that would be passed to
+    ``client.chat.completions.create`` (model, messages, temperature,
+    max_tokens) and returns the completion text. Only complete() has to be
+    implemented; the async and streaming variants fall back to it.
+
+    A backend that can tell an answer was cut off at max_tokens returns it as
+    a Completion with finish_reason "length", or ends its stream with an
+    empty one.
+    """
+
+    def complete(self, request: Dict) -> str:
+        """Return the completion text for a request."""
+        raise NotImplementedError
+
+    async def complete_async(self, request: Dict) -> str:
+        """Async variant of complete(). Runs complete() in a worker thread by default."""
+        return await asyncio.to_thread(self.complete, request)
+
+    def stream(self, request: Dict) -> Iterator[str]:
+        """Yield the completion text in pieces. Closing the generator should stop generation."""
+        yield self.complete(request)
+
+    async def stream_async(self, request: Dict) -> AsyncIterator[str]:
+        """Async variant of stream()."""
+        yield await self.complete_async(request)
+
+
+class OpenAIBackend(LLMBackend):
+    """Backend for the OpenAI API, or any server that speaks its chat completions protocol.
+
+    Clients are created on first use, so constructing the backend never needs
+    an API key. They don't retry on their own: rate-limit retries belong to
+    the shared RateLimiter, which has to see every 429.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any] = None, async_client_factory: Callable[[], Any] = None):
+        self._client_factory = client_factory or (lambda: OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0))
+        self._async_client_factory = async_client_factory or (lambda: AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0))
+        self._client = None
+        self._async_client = None
+
+    @classmethod
+    def from_base_url(cls, base_url: str, api_key: str = "local") -> "OpenAIBackend":
+        """Create a backend for an OpenAI-compatible server, e.g. the local stand-in server."""
+        return cls(
+            lambda: OpenAI(base_url=base_url, api_key=api_key, max_retries=0),
+            lambda: AsyncOpenAI(base_url=base_url, api_key=api_key, max_retries=0)
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = self._async_client_factory()
+        return self._async_client
+
+    def complete(self, request: Dict) -> str:
+        response = self.client.chat.completions.create(**request)
+        return _completion_text(response.choices[0])
+
+    async def complete_async(self, request: Dict) -> str:
+        response = await self.async_client.chat.completions.create(**request)
+        return _completion_text(response.choices[0])
+
+    def stream(self, request: Dict) -> Iterator[str]:
+        stream = self.client.chat.completions.create(**request, stream=True)
+        try:
+            cut_off = False
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+                cut_off = cut_off or chunk.choices[0].finish_reason == "length"
+            if cut_off:
+                yield Completion("", "length")
+        finally:
+            # Closing the HTTP stream is what stops the generation server-side
+            stream.close()
+
+    async def stream_async(self, request: Dict) -> AsyncIterator[str]:
+        stream = await self.async_client.chat.completions.create(**request, stream=True)
+        try:
+            cut_off = False
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+                cut_off = cut_off or chunk.choices[0].finish_reason == "length"
+            if cut_off:
+                yield Completion("", "length")
+        finally:
+            await stream.close()
+
+
+def _completion_text(choice) -> str:
+    """Text of a response choice, marked as a Completion if max_tokens cut it off."""
+    if choice.finish_reason == "length":
+        return Completion(choice.message.content or "", choice.finish_reason)
+    return choice.message.content
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+# Request fields that determine the completion; anything else (e.g. stream) doesn't change the answer
+CACHE_KEY_FIELDS = ("model", "messages", "temperature", "max_tokens")
+
+
+class CacheMissError(KeyError):
+    """Raised in replay mode when a request has no cached completion."""
+
+
+class CompletionCache:
+    """On-disk cache of chat completions with size-bounded LRU eviction.
+
+    Each completion is stored as a small JSON file named after the hash of
+    the request. Reading an entry refreshes its modification time, and the
+    least recently used entries are deleted once the cache grows past
+    max_bytes.
+
+    In replay mode, a request that isn't cached raises CacheMissError instead
+    of reaching the API, so a recorded debate can be regenerated offline.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join('outputs', 'llm_cache'),
+                 max_bytes: int = 50 * 1024 * 1024, replay: bool = False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(request: Dict) -> str:
+        """Hash the parts of a completion request that determine its output."""
+        key_data = {field: request.get(field) for field in CACHE_KEY_FIELDS}
+        encoded = json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, request: Dict) -> Optional[str]:
+        """Return the cached completion text for a request, or None on a miss."""
+        path = self._entry_path(self.make_key(request))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Mark as recently used for LRU eviction
+            os.utime(path, None)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            if self.replay:
+                raise CacheMissError(f"No cached completion for {request.get('model')} request in replay mode")
+            return None
+        self.hits += 1
+        return entry["content"]
+
+    def put(self, request: Dict, content: str) -> None:
+        """Store a completion and evict old entries if the cache is over its size limit."""
+        key = self.make_key(request)
+        path = self._entry_path(key)
+        entry = {
+            "request": {field: request.get(field) for field in CACHE_KEY_FIELDS},
+            "content": content
+        }
+        # Unique per thread as well, since debates in one process can store the same request at once
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        with self._lock:
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            current_size = self._current_size()
+            os.replace(temp_path, path)
+            self._total_bytes = current_size + os.path.getsize(path) - previous_size
+            over_quota = self._total_bytes > self.max_bytes
+        if over_quota:
+            self._evict()
+
+    def _current_size(self) -> int:
+        # Called with the lock held
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        return self._total_bytes
+
+    def _entries(self):
+        """List (path, size, mtime) for every cache entry."""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError as e:
+                    print(f"Could not evict cache entry {path}: {e}")
+            self._total_bytes = total
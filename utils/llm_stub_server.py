@@ -0,0 +1,238 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Answers /v1/chat/completions requests with deterministic filler text, so
+the debate loop and everything downstream of it can be load-tested and
+benchmarked without a live, rate-limited API. The same request always gets
+the same answer. Latency, generation speed and how often debaters
+surrender are configurable.
+
+Run it standalone and point an OpenAIBackend at it:
+
+    python -m utils.llm_stub_server --port 8765 --latency 0.3 --tokens-per-sec 60
+
+    backend = OpenAIBackend.from_base_url("http://127.0.0.1:8765/v1")
+    debater = AIDebater(backend=backend)
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = (
+    "argument evidence society people technology future research history value progress "
+    "economy freedom risk benefit education policy change balance human creative system "
+    "reason data cost trust choice impact culture growth practice context community"
+).split()
+
+_CONNECTORS = ["clearly", "however", "in fact", "ultimately", "consider that", "more importantly"]
+
+_SURRENDER_SENTENCE = "I concede, your argument is stronger and I surrender."
+
+
+class StubLLMServer:
+    """Threaded HTTP server that speaks the chat completions protocol.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind, 0 picks a free port
+        latency: Seconds before the first token is produced
+        tokens_per_sec: Generation speed, 0 for instant
+        surrender_probability: Chance that a debater turn ends in a surrender
+        surrender_marker: Only requests whose prompt contains this text can surrender,
+            which keeps summaries and titles free of surrender phrases
+        seed: Changes every generated answer while keeping them deterministic
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 tokens_per_sec: float = 0.0, surrender_probability: float = 0.0,
+                 surrender_marker: str = "Counter this argument", seed: int = 0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.surrender_probability = surrender_probability
+        self.surrender_marker = surrender_marker
+        self.seed = seed
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests from the calling thread until interrupted."""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def generate_tokens(self, request: dict) -> tuple:
+        """Build the answer for a request as a list of token strings.
+
+        Returns:
+            The tokens and the finish reason, "length" when max_tokens cut the answer off
+        """
+        encoded = json.dumps([self.seed, request.get("model"), request.get("messages")], sort_keys=True)
+        rng = random.Random(hashlib.sha256(encoded.encode("utf-8")).hexdigest())
+        max_tokens = request.get("max_tokens") or 256
+
+        prompt = " ".join(str(message.get("content", "")) for message in request.get("messages", []))
+        surrender = self.surrender_marker in prompt and rng.random() < self.surrender_probability
+
+        tokens = []
+        budget = max_tokens - (len(_SURRENDER_SENTENCE.split()) if surrender else 0)
+        target = min(budget, rng.randint(40, 90))
+        while len(tokens) < target:
+            sentence = rng.sample(_WORDS, rng.randint(6, 12))
+            if rng.random() < 0.4:
+                sentence.insert(0, rng.choice(_CONNECTORS))
+            sentence[0] = sentence[0].capitalize()
+            sentence[-1] += "."
+            tokens.extend(sentence)
+        finish_reason = "length" if len(tokens) > budget else "stop"
+        tokens = tokens[:max(budget, 1)]
+        if surrender:
+            tokens.extend(_SURRENDER_SENTENCE.split())
+        # Tokens after the first carry their leading space, like real BPE pieces
+        return [tokens[0]] + [" " + token for token in tokens[1:]], finish_reason
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+                    return
+
+                with server._lock:
+                    server.request_count += 1
+                    completion_id = f"chatcmpl-stub-{server.request_count}"
+                tokens, finish_reason = server.generate_tokens(request)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if request.get("stream"):
+                    self._stream(completion_id, request, tokens, finish_reason)
+                else:
+                    if server.tokens_per_sec:
+                        time.sleep(len(tokens) / server.tokens_per_sec)
+                    self._send_json(200, {
+                        "id": completion_id,
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model", "stub"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(tokens)},
+                            "finish_reason": finish_reason
+                        }],
+                        "usage": self._usage(request, tokens)
+                    })
+
+            def _stream(self, completion_id, request, tokens, finish_reason):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    deltas = [{"role": "assistant", "content": ""}] + [{"content": token} for token in tokens]
+                    for i, delta in enumerate(deltas):
+                        if i and server.tokens_per_sec:
+                            time.sleep(1 / server.tokens_per_sec)
+                        self._send_event(completion_id, request, delta, None)
+                    self._send_event(completion_id, request, {}, finish_reason)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream early, e.g. after a surrender
+                    pass
+
+            def _send_event(self, completion_id, request, delta, finish_reason):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def _send_json(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            @staticmethod
+            def _usage(request, tokens):
+                prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+                return {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens)
+                }
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="Generation speed, 0 for instant")
+    parser.add_argument("--surrender-prob", type=float, default=0.0, help="Chance a debater turn surrenders")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+                           surrender_probability=args.surrender_prob, seed=args.seed)
+    print(f"Stub LLM server listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
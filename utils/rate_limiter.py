@@ -0,0 +1,278 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Lower numbers go first: live debate turns, then the summary needed before round 1,
+# then the video title and description, which nothing waits on
+PRIORITIES = {"turn": 0, "summary": 1, "title": 2, "description": 2}
+DEFAULT_PRIORITY = 1
+
+# How often a queued request that isn't first in line checks again
+_POLL_INTERVAL = 0.05
+
+
+class _TokenBucket:
+    """Continuously refilling bucket that holds at most one minute's allowance."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Request scheduler that keeps LLM calls under the provider's rate limits.
+
+    Calls draw from a requests-per-minute and a tokens-per-minute bucket.
+    Waiting calls are served by priority, then in arrival order. A 429 from
+    the provider pauses every caller for a jittered backoff (or the
+    Retry-After the provider asked for) before the call is retried, so a
+    batch of debates levels off at the provider limit instead of failing.
+
+    One limiter can be shared by any number of AIDebater instances, from
+    threads and event loops alike.
+
+    Args:
+        requests_per_minute: Provider request limit
+        tokens_per_minute: Provider token limit (prompt plus max_tokens)
+        max_retries: Rate-limited attempts to retry before giving up
+        base_delay: First backoff in seconds, doubled on every retry
+        max_delay: Upper bound for a single backoff
+        retry_statuses: HTTP statuses that are retried
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200000,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0,
+                 retry_statuses=(429,)):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = tuple(retry_statuses)
+        self._requests = _TokenBucket(requests_per_minute)
+        self._tokens = _TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._queue = []
+        self._counter = itertools.count()
+        self._blocked_until = 0.0
+        self.retries = 0
+        self.wait_time = 0.0
+
+    def _enqueue(self, priority: int):
+        ticket = (priority, next(self._counter))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _dequeue(self, ticket) -> None:
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _try_acquire(self, ticket, tokens: int) -> float:
+        """Take a slot for a queued request, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._queue[0] != ticket:
+                return _POLL_INTERVAL
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            wait = max(self._requests.time_until(1), self._tokens.time_until(tokens))
+            if wait > 0:
+                return wait
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            heapq.heappop(self._queue)
+            return 0.0
+
+    def acquire(self, tokens: int, priority: int = DEFAULT_PRIORITY) -> None:
+        """Block until a request of this size may be sent."""
+        ticket = self._enqueue(priority)
+        started = None
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if not wait:
+                    self._record_wait(started)
+                    return
+                if started is None:
+                    started = time.monotonic()
+                time.sleep(wait)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+
+    async def acquire_async(self, tokens: int, priority: int = DEFAULT_PRIORITY) -> None:
+        """Async variant of acquire()."""
+        ticket = self._enqueue(priority)
+        started = None
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if not wait:
+                    self._record_wait(started)
+                    return
+                if started is None:
+                    started = time.monotonic()
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+
+    def _record_wait(self, started: Optional[float]) -> None:
+        """Add the wall time a granted request spent queued, or nothing if it didn't have to wait.
+
+        Counted once per request rather than per poll, so requests waiting side
+        by side don't inflate the total.
+        """
+        if started is None:
+            return
+        waited = time.monotonic() - started
+        with self._lock:
+            self.wait_time += waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Return the tokens a request reserved but didn't use."""
+        unused = estimated_tokens - actual_tokens
+        if unused > 0:
+            with self._lock:
+                self._tokens.level = min(self._tokens.capacity, self._tokens.level + unused)
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Backoff before retrying a failed call, or None if the error shouldn't be retried.
+
+        The delay also holds back every other caller, since they would hit the
+        same limit.
+        """
+        if getattr(error, "status_code", None) not in self.retry_statuses or attempt >= self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        self.retries += 1
+        print(f"Rate limited by the LLM provider, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        return delay
+
+    def call(self, fn: Callable[[], T], tokens: int, priority: int = DEFAULT_PRIORITY) -> T:
+        """Run fn() once the limits allow it, retrying rate-limit errors."""
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority)
+            try:
+                return fn()
+            except Exception as e:
+                # The rejected attempt used none of its reservation, whether it's retried or not
+                self.settle(tokens, 0)
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], tokens: int,
+                         priority: int = DEFAULT_PRIORITY) -> T:
+        """Async variant of call()."""
+        attempt = 0
+        while True:
+            await self.acquire_async(tokens, priority)
+            try:
+                return await fn()
+            except Exception as e:
+                self.settle(tokens, 0)
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stream(self, open_stream: Callable[[], Iterator[T]], tokens: int,
+               priority: int = DEFAULT_PRIORITY) -> Iterator[T]:
+        """Yield from the iterator open_stream() returns, once the limits allow it.
+
+        A rate-limit error before the first piece arrives is retried with a
+        new stream. Once pieces have been handed out, errors are passed on.
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority)
+            pieces = open_stream()
+            try:
+                first = next(pieces)
+                break
+            except StopIteration:
+                return
+            except Exception as e:
+                pieces.close()
+                self.settle(tokens, 0)
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+        try:
+            yield first
+            yield from pieces
+        finally:
+            pieces.close()
+
+    async def stream_async(self, open_stream: Callable[[], AsyncIterator[T]], tokens: int,
+                           priority: int = DEFAULT_PRIORITY) -> AsyncIterator[T]:
+        """Async variant of stream()."""
+        attempt = 0
+        while True:
+            await self.acquire_async(tokens, priority)
+            pieces = open_stream()
+            try:
+                first = await pieces.__anext__()
+                break
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                await pieces.aclose()
+                self.settle(tokens, 0)
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+        try:
+            yield first
+            async for piece in pieces:
+                yield piece
+        finally:
+            await pieces.aclose()
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, from the Retry-After header of an HTTP error."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
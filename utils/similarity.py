@@ -0,0 +1,141 @@
+import hashlib
+import random
+import re
+from collections import defaultdict
+from typing import List, Optional, Set, Tuple
+
+# Largest Mersenne prime below 2^64, the modulus of the MinHash permutations
+_MERSENNE_PRIME = (1 << 61) - 1
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Split text into overlapping runs of `size` words, ignoring case and punctuation."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHashIndex:
+    """Incremental near-duplicate index over texts, using MinHash and LSH banding.
+
+    Each text is reduced to a fixed-size MinHash signature of its word
+    shingles. Signatures are split into bands, and texts that share a band
+    bucket become candidates whose similarity is estimated from their
+    signatures. Adding or querying a text costs the same however many texts
+    are already in the index, apart from the (few) near-duplicates found.
+
+    With the default 16 bands of 4 rows, texts with a Jaccard similarity
+    around 0.5 or more are very likely to be found.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+        self._signatures = []
+        self._labels = []
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        """MinHash signature of a text, or None if it has no words."""
+        hashed = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+                  for shingle in shingles(text, self.shingle_size)]
+        if not hashed:
+            return None
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashed) for a, b in self._perms)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows] for band in range(self.bands)]
+
+    def query(self, text: str, signature: Tuple[int, ...] = None) -> List[Tuple[object, float]]:
+        """Find indexed texts similar to `text`.
+
+        Returns:
+            (label, estimated Jaccard similarity) for every candidate, most similar first
+        """
+        signature = signature or self.signature(text)
+        if signature is None:
+            return []
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        matches = []
+        for index in candidates:
+            other = self._signatures[index]
+            similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+            matches.append((self._labels[index], similarity))
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def add(self, text: str, label: object = None) -> List[Tuple[object, float]]:
+        """Index a text and return its matches among the texts indexed before it."""
+        signature = self.signature(text)
+        if signature is None:
+            return []
+        matches = self.query(text, signature)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._labels.append(label)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(index)
+        return matches
+
+    def clear(self) -> None:
+        for bucket in self._buckets:
+            bucket.clear()
+        self._signatures.clear()
+        self._labels.clear()
+
+
+class StaleDebateDetector:
+    """Notices when a debate has stopped producing new arguments.
+
+    Every turn is added to a MinHashIndex. A turn that is a near-duplicate of
+    any earlier turn, from either debater, counts as repetition. After
+    `nudge_after` repetitive turns in a row the debaters should be pushed
+    towards surrendering, and after `draw_after` the debate should end as a draw.
+
+    Args:
+        threshold: Estimated Jaccard similarity at which two turns count as repeats
+        nudge_after: Consecutive repetitive turns before nudging towards surrender
+        draw_after: Consecutive repetitive turns before ending the debate
+    """
+
+    def __init__(self, threshold: float = 0.5, nudge_after: int = 2, draw_after: int = 4, **index_options):
+        self.threshold = threshold
+        self.nudge_after = nudge_after
+        self.draw_after = draw_after
+        self.index = MinHashIndex(**index_options)
+        self.streak = 0
+        self.last_similarity = 0.0
+
+    def add_turn(self, speaker: str, text: str) -> float:
+        """Record a turn and return its highest similarity to any earlier turn."""
+        matches = self.index.add(text, label=(speaker, len(self.index)))
+        self.last_similarity = matches[0][1] if matches else 0.0
+        self.streak = self.streak + 1 if self.last_similarity >= self.threshold else 0
+        return self.last_similarity
+
+    @property
+    def should_nudge(self) -> bool:
+        return self.streak >= self.nudge_after
+
+    @property
+    def is_stale(self) -> bool:
+        return self.streak >= self.draw_after
+
+    def reset(self) -> None:
+        self.index.clear()
+        self.streak = 0
+        self.last_similarity = 0.0
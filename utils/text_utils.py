@@ -1,3 +1,14 @@
+import re
+
+# A sentence ends at terminal punctuation (and any closing quote/bracket) followed by whitespace or the end of the text
+_SENTENCE_BOUNDARY_RE = re.compile(r'[.!?]+["\')\]]*(?=\s|$)')
+# Subtitles also break after colons and semicolons
+_CLAUSE_BOUNDARY_RE = re.compile(r'[.!?:;]+["\')\]]*(?=\s|$)')
+_WORD_RE = re.compile(r'\S+')
+
+# Longest subtitle line the timing code produces
+SUBTITLE_MAX_CHARS = 80
+
 def get_font_metrics(font, text):
     """Get the width and height of text using the most appropriate method
     for the version of PIL being used.
@@ -45,6 +56,79 @@ def wrap_text(text, font, max_width):
     
     return lines
 
+def _trimmed_span(text, start, end):
+    """Narrow (start, end) so it doesn't begin or end with whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def sentence_spans(text, clauses=False):
+    """Find the sentences in text in a single pass.
+    
+    A sentence ends at terminal punctuation, plus any closing quote or
+    bracket, that is followed by whitespace or the end of the text.
+    
+    Args:
+        text: Text to segment
+        clauses: Also end segments at colons and semicolons
+        
+    Returns:
+        List of (start, end) character offsets, without surrounding whitespace
+    """
+    boundary = _CLAUSE_BOUNDARY_RE if clauses else _SENTENCE_BOUNDARY_RE
+    spans = []
+    start = 0
+    for match in boundary.finditer(text):
+        span = _trimmed_span(text, start, match.end())
+        if span[0] < span[1]:
+            spans.append(span)
+        start = match.end()
+    span = _trimmed_span(text, start, len(text))
+    if span[0] < span[1]:
+        spans.append(span)
+    return spans
+
+def chunk_spans(text, max_chars=80, clauses=False):
+    """Group the sentences of text into chunks of at most max_chars characters.
+    
+    Whole sentences are packed together while they fit. A sentence that is
+    longer than max_chars on its own is split between words, and only a
+    single word longer than max_chars makes a chunk exceed the limit.
+    
+    Args:
+        text: Text to split
+        max_chars: Maximum characters per chunk
+        clauses: Also allow chunks to end at colons and semicolons
+        
+    Returns:
+        List of (start, end) character offsets into text
+    """
+    chunks = []
+    current = None
+    for start, end in sentence_spans(text, clauses):
+        if current and end - current[0] <= max_chars:
+            current = (current[0], end)
+            continue
+        if current:
+            chunks.append(current)
+        if end - start <= max_chars:
+            current = (start, end)
+            continue
+        # Too long for one chunk, so fill chunks word by word
+        current = None
+        for word in _WORD_RE.finditer(text, start, end):
+            if current and word.end() - current[0] <= max_chars:
+                current = (current[0], word.end())
+            else:
+                if current:
+                    chunks.append(current)
+                current = word.span()
+    if current:
+        chunks.append(current)
+    return chunks
+
 def split_text_into_chunks(text, max_chars=80):
     """Split text into chunks for timing purposes.
     
@@ -58,43 +142,55 @@ def split_text_into_chunks(text, max_chars=80):
     # First, check if the text is short enough to use as-is
     if len(text) <= max_chars:
         return [text]
-        
-    # Try to split on sentence boundaries
-    sentences = text.replace('. ', '.\n').replace('! ', '!\n').replace('? ', '?\n').split('\n')
+    return [text[start:end] for start, end in chunk_spans(text, max_chars)]
+
+def finished_sentence_spans(text):
+    """Find the sentences of a text that more text appended to it can no longer change.
     
-    # Initialize result chunks
-    chunks = []
-    current_chunk = ""
+    These are the sentences of sentence_spans, except for the last one when
+    nothing after its terminal punctuation shows that it has ended.
     
-    for sentence in sentences:
-        # If adding this sentence would exceed the limit, start a new chunk
-        if len(current_chunk) + len(sentence) + 1 > max_chars:
-            if current_chunk:
-                chunks.append(current_chunk)
-            
-            # If the sentence itself is too long, split it by words
-            if len(sentence) > max_chars:
-                words = sentence.split()
-                current_chunk = ""
-                for word in words:
-                    if len(current_chunk) + len(word) + 1 > max_chars:
-                        chunks.append(current_chunk)
-                        current_chunk = word
-                    else:
-                        if current_chunk:
-                            current_chunk += " " + word
-                        else:
-                            current_chunk = word
-            else:
-                current_chunk = sentence
-        else:
-            if current_chunk:
-                current_chunk += " " + sentence
-            else:
-                current_chunk = sentence
+    Returns:
+        Tuple of (list of (start, end) offsets of the finished sentences,
+        offset where the unfinished rest of text begins)
+    """
+    # A stand-in for the text still to come joins the last sentence, unless whitespace after it ended it
+    spans = sentence_spans(text + "x")
+    rest = spans.pop()[0]
+    return spans, rest
+
+def pop_complete_sentences(text):
+    """Split finished sentences off the front of a growing text buffer.
+    
+    Used while a completion is streaming in: only sentences whose end has
+    definitely been seen are returned, the unfinished tail is handed back so
+    the caller can keep appending to it.
     
-    # Add the last chunk if it has content
-    if current_chunk:
-        chunks.append(current_chunk)
+    Args:
+        text: Text received so far
         
-    return chunks
+    Returns:
+        Tuple of (list of finished sentences, remaining unfinished text)
+    """
+    spans, rest = finished_sentence_spans(text)
+    return [text[start:end] for start, end in spans], text[rest:]
+
+def drop_unfinished_sentence(text):
+    """Cut a text that ends mid-sentence back to the end of its last finished sentence.
+    
+    Used for answers the model was cut off in by the token limit. A text
+    without any finished sentence is returned as is, since half a sentence
+    is still better than an empty turn.
+    
+    Args:
+        text: Complete text, nothing more will be appended to it
+        
+    Returns:
+        Text up to its last finished sentence
+    """
+    stripped = text.rstrip()
+    # Nothing follows the text, so a trailing space ends its last sentence if that has terminal punctuation
+    spans, rest = finished_sentence_spans(stripped + " ")
+    if not spans or rest >= len(stripped):
+        return text
+    return stripped[:spans[-1][1]]
@@ -0,0 +1,192 @@
+import math
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from utils.text_utils import finished_sentence_spans
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Rough characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Chat formatting overhead, as documented for the OpenAI chat models
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Load the tokenizer for a model, or None if it can't be loaded (e.g. offline)."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception:
+            return None
+    except Exception:
+        # tiktoken downloads its vocabularies on first use
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the tokens in a piece of text from its length alone.
+
+    Unlike count_tokens, the result doesn't depend on whether tiktoken can
+    load its vocabulary, so anything that ends up in a request (and so in its
+    completion cache key) is sized with this.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini", estimate: bool = False) -> int:
+    """Count the tokens in a piece of text, using estimate_tokens if tiktoken is unavailable or estimate is set."""
+    if not text:
+        return 0
+    encoding = None if estimate else _get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: List[Dict], model: str = "gpt-4o-mini", estimate: bool = False) -> int:
+    """Count the prompt tokens of a chat completion request."""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message.get("content", ""), model, estimate)
+    return total
+
+
+def trim_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini", estimate: bool = False) -> str:
+    """Shorten text to at most max_tokens, cutting at a sentence end where possible.
+
+    The beginning of the text is kept, since that's where debaters state
+    their main point. Trimmed text ends with "..." so the model can tell it
+    was cut. With estimate set, tokens are counted with estimate_tokens.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model, estimate) <= max_tokens:
+        return text
+
+    # Leave room for the ellipsis
+    max_tokens = max(max_tokens - 1, 1)
+    encoding = None if estimate else _get_encoding(model)
+    if encoding is None:
+        trimmed = text[:max_tokens * CHARS_PER_TOKEN]
+    else:
+        trimmed = encoding.decode(encoding.encode(text)[:max_tokens])
+
+    # The cut may fall mid-sentence, so only sentences that have visibly ended are kept whole
+    sentences, _ = finished_sentence_spans(trimmed)
+    if sentences:
+        trimmed = trimmed[:sentences[-1][1]]
+    elif " " in trimmed:
+        trimmed = trimmed.rsplit(" ", 1)[0]
+    return trimmed.rstrip() + "..."
+
+
+class TokenBudget:
+    """Limits on how many tokens a debate spends.
+
+    Turn lengths and prompt sizes are measured with estimate_tokens, so a
+    debate recorded in one environment makes the same requests when it is
+    replayed from the completion cache in another.
+
+    Args:
+        prompt_tokens: Maximum prompt size of a debater turn; the argument being
+            countered is trimmed to fit
+        min_completion_tokens: Lower bound for a turn's max_tokens
+        max_completion_tokens: Upper bound for a turn's max_tokens, and the value
+            used until enough turns have been observed
+        headroom: Factor applied to the longest observed turn when picking max_tokens
+        window: Number of recent turns considered when picking max_tokens
+        min_observations: Turns to observe before max_tokens starts adapting
+        max_debate_tokens: Total tokens a debate may use before it is ended as a
+            draw, or None for no limit
+    """
+
+    def __init__(self, prompt_tokens: int = 1500, min_completion_tokens: int = 150,
+                 max_completion_tokens: int = 500, headroom: float = 1.5, window: int = 6,
+                 min_observations: int = 2, max_debate_tokens: Optional[int] = None):
+        self.prompt_tokens = prompt_tokens
+        self.min_completion_tokens = min_completion_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.headroom = headroom
+        self.min_observations = min_observations
+        self.max_debate_tokens = max_debate_tokens
+        self._turn_lengths = deque(maxlen=window)
+
+    def observe_turn(self, completion_tokens: int) -> None:
+        """Record the length of a finished debater turn."""
+        self._turn_lengths.append(completion_tokens)
+
+    def reset(self) -> None:
+        self._turn_lengths.clear()
+
+    def completion_tokens(self) -> int:
+        """Pick max_tokens for the next turn from the recently observed turn lengths."""
+        if len(self._turn_lengths) < self.min_observations:
+            return self.max_completion_tokens
+        target = math.ceil(max(self._turn_lengths) * self.headroom)
+        return max(self.min_completion_tokens, min(self.max_completion_tokens, target))
+
+    def exhausted(self, usage: "TokenUsage") -> bool:
+        """Whether the debate has used up its total token allowance."""
+        return self.max_debate_tokens is not None and usage.total_tokens >= self.max_debate_tokens
+
+
+class TokenUsage:
+    """Per-call log of the tokens and time spent on LLM requests."""
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, kind: str, prompt_tokens: int, completion_tokens: int,
+               latency: float, cached: bool = False) -> Dict:
+        call = {
+            "kind": kind,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency": latency,
+            "cached": cached
+        }
+        self.calls.append(call)
+        return call
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(call["prompt_tokens"] + call["completion_tokens"] for call in self.calls)
+
+    def totals(self) -> Dict:
+        """Aggregate the calls, overall and per kind of request."""
+        totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency": 0.0, "by_kind": {}}
+        for call in self.calls:
+            kind = totals["by_kind"].setdefault(
+                call["kind"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency": 0.0})
+            for bucket in (totals, kind):
+                bucket["calls"] += 1
+                bucket["prompt_tokens"] += call["prompt_tokens"]
+                bucket["completion_tokens"] += call["completion_tokens"]
+                bucket["latency"] += call["latency"]
+        return totals
+
+    def report(self) -> str:
+        """One line per kind of request, for printing at the end of a debate."""
+        totals = self.totals()
+        lines = [f"LLM usage: {totals['calls']} calls, {totals['prompt_tokens']} prompt + "
+                 f"{totals['completion_tokens']} completion tokens, {totals['latency']:.2f}s"]
+        for kind, stats in totals["by_kind"].items():
+            lines.append(f"  {kind}: {stats['calls']} calls, {stats['prompt_tokens']} prompt + "
+                         f"{stats['completion_tokens']} completion tokens, {stats['latency']:.2f}s")
+        return "\n".join(lines)
+
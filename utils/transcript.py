@@ -0,0 +1,264 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Line prefixes that start a new entry in debate.txt
+LINE_PREFIXES = ["Narrator:", "Ground Statement:", "Summary:", "AI Debater 1:", "AI Debater 2:", "Result:"]
+
+# Speaker names as written in debate.txt; Jane is always AI Debater 1, Valentino always AI Debater 2
+SPEAKER_LABELS = {"Jane": "AI Debater 1", "Valentino": "AI Debater 2"}
+
+# Speaker of each spoken prefix; anything else is read by the narrator
+_SPOKEN_BY = {label: speaker for speaker, label in SPEAKER_LABELS.items()}
+_PREFIX_STARTS = tuple(LINE_PREFIXES)
+
+DEFAULT_INTRO = (
+    "Welcome to our AI debate. In this video, two AI debaters will discuss a ground statement, "
+    "taking turns to present arguments from different perspectives, offering insights and counterpoints. "
+    "If one debater finds their position indefensible, they may surrender. Let's begin with our ground statement."
+)
+
+
+# Parsed debate files kept by read_debate(), keyed on absolute path
+_CACHE_SIZE = 64
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _single_line(text: str) -> str:
+    """Collapse a multi-line answer into one line, the way reformat_debate_file does."""
+    return " ".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+class ParsedDebate(NamedTuple):
+    """Immutable result of parsing debate.txt content once.
+
+    Attributes:
+        lines: One line per entry, with continuation lines joined on; this is
+            what reformat_debate_file writes back
+        entries: (prefix, text) for every entry with a known prefix, e.g.
+            ("AI Debater 1", "First argument.")
+        segments: Spoken (speaker, text) segments, in the shape parse_debate_file
+            returns them
+        summary: The Summary line, which is shown on screen but never spoken
+    """
+    lines: Tuple[str, ...]
+    entries: Tuple[Tuple[str, str], ...]
+    segments: Tuple[Tuple[str, str], ...]
+    summary: Optional[str]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def segment_dicts(self) -> List[Dict[str, str]]:
+        """Fresh {"speaker", "text"} dicts, safe for the caller to modify."""
+        return [{"speaker": speaker, "text": text} for speaker, text in self.segments]
+
+
+def parse_debate_text(content: str) -> ParsedDebate:
+    """Parse debate.txt content in a single pass.
+
+    Lines that don't start with a known prefix continue the previous entry.
+    Narrator and debater entries are spoken without their prefix, the ground
+    statement and result with it, and consecutive entries from the same
+    speaker are merged into one segment.
+    """
+    lines = []
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if lines and not line.startswith(_PREFIX_STARTS):
+            lines[-1] += " " + line
+        else:
+            lines.append(line)
+
+    entries = []
+    segments = []
+    summary = None
+    for line in lines:
+        prefix, _, text = line.partition(":")
+        if prefix + ":" not in LINE_PREFIXES:
+            continue
+        text = text.strip()
+        entries.append((prefix, text))
+        if prefix == "Summary":
+            summary = text
+            continue
+        speaker = _SPOKEN_BY.get(prefix, "Narrator")
+        if prefix in ("Ground Statement", "Result"):
+            text = line
+        if not text:
+            continue
+        if segments and segments[-1][0] == speaker:
+            segments[-1] = (speaker, f"{segments[-1][1]} {text}")
+        else:
+            segments.append((speaker, text))
+
+    return ParsedDebate(tuple(lines), tuple(entries), tuple(segments), summary)
+
+
+def read_debate(file_path: str) -> ParsedDebate:
+    """Parse a debate.txt file, reusing the last result while the file is unchanged.
+
+    Results are cached on the file's path, modification time and size, so
+    the speech and video stages can ask for the same file as often as they
+    like and always get the same segments.
+    """
+    key = os.path.abspath(file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        stat = os.fstat(f.fileno())
+        version = (stat.st_mtime_ns, stat.st_size)
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None and cached[0] == version:
+                _cache.move_to_end(key)
+                return cached[1]
+        parsed = parse_debate_text(f.read())
+    _remember(key, version, parsed)
+    return parsed
+
+
+def rewrite_debate(file_path: str) -> ParsedDebate:
+    """Rewrite a debate.txt file with one line per entry and return its parsed form."""
+    parsed = read_debate(file_path)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(parsed.text)
+    # The rewritten file parses to the same result, so keep it under the new mtime
+    stat = os.stat(file_path)
+    _remember(os.path.abspath(file_path), (stat.st_mtime_ns, stat.st_size), parsed)
+    return parsed
+
+
+def _remember(key: str, version: Tuple[int, int], parsed: ParsedDebate) -> None:
+    with _cache_lock:
+        _cache[key] = (version, parsed)
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+class Transcript:
+    """Structured record of a debate, shared by the debate, speech and video stages.
+
+    AIDebater fills it in turn by turn, and the later stages read the spoken
+    segments from it directly. debate.txt is only written once, when the
+    debate is over, with save().
+    """
+
+    def __init__(self, ground_statement: str = "", summary: Optional[str] = None,
+                 intro: Optional[str] = DEFAULT_INTRO):
+        self.intro = intro
+        self.ground_statement = ground_statement
+        self.summary = summary
+        self.turns = []  # (speaker, text) pairs in speaking order
+        self.result = None
+
+    def add_turn(self, speaker: str, text: str) -> None:
+        """Record a debater's answer. speaker is "Jane" or "Valentino"."""
+        if speaker not in SPEAKER_LABELS:
+            raise ValueError(f"Unknown debater: {speaker}")
+        self.turns.append((speaker, _single_line(text)))
+
+    def set_result(self, text: str) -> None:
+        """Record how the debate ended, e.g. "Jane has surrendered! Valentino wins the debate." """
+        self.result = _single_line(text)
+
+    @property
+    def segments(self) -> List[Dict[str, str]]:
+        """Spoken segments in the same shape parse_debate_file returns.
+
+        The summary is display-only and is left out. Consecutive entries from
+        the same speaker are merged, so the intro and the ground statement
+        form a single narrator segment.
+        """
+        entries = []
+        if self.intro:
+            entries.append(("Narrator", self.intro))
+        if self.ground_statement:
+            entries.append(("Narrator", f"Ground Statement: {self.ground_statement}"))
+        entries.extend((speaker, text) for speaker, text in self.turns if text)
+        if self.result:
+            entries.append(("Narrator", f"Result: {self.result}"))
+
+        segments = []
+        for speaker, text in entries:
+            if segments and segments[-1]["speaker"] == speaker:
+                segments[-1]["text"] += " " + text
+            else:
+                segments.append({"speaker": speaker, "text": text})
+        return segments
+
+    def to_text(self) -> str:
+        """Serialize to the debate.txt format, one entry per line."""
+        lines = []
+        if self.intro:
+            lines.append(f"Narrator: {self.intro}")
+        lines.append(f"Ground Statement: {self.ground_statement}")
+        if self.summary:
+            lines.append(f"Summary: {self.summary}")
+        for speaker, text in self.turns:
+            lines.append(f"{SPEAKER_LABELS[speaker]}: {text}")
+        if self.result:
+            lines.append(f"Result: {self.result}")
+        return "\n".join(lines)
+
+    def save(self, file_path: str) -> None:
+        """Write the transcript to a debate.txt file."""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_text())
+
+    @classmethod
+    def from_text(cls, content: str) -> "Transcript":
+        """Build a transcript from debate.txt content.
+
+        Lines that don't start with a known prefix continue the previous
+        entry, so files that were never reformatted load the same way.
+        """
+        return cls.from_parsed(parse_debate_text(content))
+
+    @classmethod
+    def from_parsed(cls, parsed: ParsedDebate) -> "Transcript":
+        transcript = cls(intro=None)
+        for prefix, text in parsed.entries:
+            if prefix == "Narrator":
+                transcript.intro = f"{transcript.intro} {text}" if transcript.intro else text
+            elif prefix == "Ground Statement":
+                transcript.ground_statement = text
+            elif prefix == "Summary":
+                transcript.summary = text
+            elif prefix in _SPOKEN_BY:
+                transcript.turns.append((_SPOKEN_BY[prefix], text))
+            elif prefix == "Result":
+                transcript.result = text
+        return transcript
+
+    @classmethod
+    def load(cls, file_path: str) -> "Transcript":
+        """Read a transcript from a debate.txt file."""
+        return cls.from_parsed(read_debate(file_path))
+
+    def to_dict(self) -> Dict:
+        """Plain-data form of the transcript, for JSON checkpoints."""
+        return {
+            "intro": self.intro,
+            "ground_statement": self.ground_statement,
+            "summary": self.summary,
+            "turns": [list(turn) for turn in self.turns],
+            "result": self.result
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Transcript":
+        transcript = cls(data["ground_statement"], data.get("summary"), data.get("intro"))
+        transcript.turns = [tuple(turn) for turn in data.get("turns", [])]
+        transcript.result = data.get("result")
+        return transcript
+
+    def __len__(self):
+        return len(self.turns)
+
+    def __repr__(self):
+        return f"Transcript({self.ground_statement!r}, turns={len(self.turns)}, result={self.result!r})"
@@ -0,0 +1,321 @@
+"""SQLite index of archived debate transcripts.
+
+Parses a directory tree of debate.txt files with a process pool and stores
+their segments, speakers, summaries, results and content hashes in one
+database with a full-text index over what was said. Batch jobs can then
+pick debates by topic or wording and load them without touching the raw
+files:
+
+    python -m utils.transcript_index build outputs/archive --db outputs/transcripts.db
+    python -m utils.transcript_index search "universal basic income" --db outputs/transcripts.db
+
+    index = TranscriptIndex('outputs/transcripts.db')
+    for debate in index.find_debates("universal basic income"):
+        transcript = index.load_transcript(debate["path"])
+
+Re-running build only re-parses files whose mtime or size changed, and
+forgets files that were deleted.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from utils.transcript import ParsedDebate, Transcript, parse_debate_text
+
+DEFAULT_INDEX_PATH = os.path.join('outputs', 'transcripts.db')
+
+# Below this many changed files, parsing in-process beats starting a pool
+_MIN_FILES_FOR_POOL = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS debates (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    ground_statement TEXT,
+    summary TEXT,
+    result TEXT,
+    turns INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS debates_sha256 ON debates (sha256);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    debate_id INTEGER NOT NULL REFERENCES debates (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    speaker TEXT NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (debate_id, position)
+);
+CREATE INDEX IF NOT EXISTS segments_speaker ON segments (speaker);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5 (
+    text, content='segments', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS segments_fts_insert AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_fts_delete AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Bump when _SCHEMA changes; older databases are dropped and rebuilt on the next build
+_SCHEMA_VERSION = 2
+
+
+def parse_transcript_file(path: str) -> Dict:
+    """Read and parse one debate file. Runs in a worker process."""
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        raw = f.read()
+    parsed = parse_debate_text(raw.decode('utf-8', errors='replace'))
+    transcript = Transcript.from_parsed(parsed)
+    return {
+        "path": path,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": hashlib.sha256(raw).hexdigest(),
+        "ground_statement": transcript.ground_statement or None,
+        "summary": parsed.summary,
+        "result": transcript.result,
+        "turns": len(transcript),
+        "content": parsed.text,
+        "segments": parsed.segments
+    }
+
+
+def _find_transcripts(root: str, filename: str) -> Iterator[str]:
+    for directory, _, files in os.walk(root):
+        if filename in files:
+            yield os.path.abspath(os.path.join(directory, filename))
+
+
+class TranscriptIndex:
+    """Full-text searchable index of debate transcripts, stored in SQLite.
+
+    Args:
+        db_path: Database file, created if it doesn't exist
+    """
+
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            self._conn.executescript(
+                "DROP TABLE IF EXISTS segments_fts; DROP TABLE IF EXISTS segments; "
+                "DROP TABLE IF EXISTS debates;")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM debates").fetchone()[0]
+
+    def index_directory(self, root: str, filename: str = 'debate.txt',
+                        workers: Optional[int] = None, prune: bool = True) -> Dict[str, int]:
+        """Index every transcript named `filename` under root.
+
+        Files already indexed with the same mtime and size are skipped. The
+        rest are parsed by a pool of `workers` processes, while this process
+        writes the results, since SQLite only allows one writer at a time.
+
+        Args:
+            root: Directory to scan recursively
+            filename: Name of the transcript files to index
+            workers: Parser processes, defaults to the CPU count
+            prune: Drop indexed files under root that no longer exist
+
+        Returns:
+            Counts of indexed, unchanged, removed and failed files
+        """
+        known = {row["path"]: (row["mtime_ns"], row["size"])
+                 for row in self._conn.execute("SELECT path, mtime_ns, size FROM debates")}
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+
+        found = set()
+        changed = []
+        for path in _find_transcripts(root, filename):
+            found.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if known.get(path) == (stat.st_mtime_ns, stat.st_size):
+                stats["unchanged"] += 1
+            else:
+                changed.append(path)
+
+        with self._conn:
+            for record in self._parse_all(changed, workers, stats):
+                self._store(record)
+                stats["indexed"] += 1
+
+            if prune:
+                prefix = os.path.join(os.path.abspath(root), '')
+                for path in known:
+                    if path.startswith(prefix) and path not in found:
+                        self._conn.execute("DELETE FROM debates WHERE path = ?", (path,))
+                        stats["removed"] += 1
+        return stats
+
+    def _parse_all(self, paths: List[str], workers: Optional[int], stats: Dict) -> Iterator[Dict]:
+        if workers == 1 or len(paths) < _MIN_FILES_FOR_POOL:
+            yield from _successful(map(_parse_or_none, paths), stats)
+            return
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from _successful(pool.map(_parse_or_none, paths, chunksize=chunksize), stats)
+
+    def _store(self, record: Dict) -> None:
+        # Replacing the row cascades to its segments, which the triggers remove from the FTS index
+        self._conn.execute("DELETE FROM debates WHERE path = ?", (record["path"],))
+        cursor = self._conn.execute(
+            "INSERT INTO debates (path, mtime_ns, size, sha256, ground_statement, summary, result, "
+            "turns, content, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (record["path"], record["mtime_ns"], record["size"], record["sha256"],
+             record["ground_statement"], record["summary"], record["result"], record["turns"],
+             record["content"], time.time()))
+        self._conn.executemany(
+            "INSERT INTO segments (debate_id, position, speaker, text) VALUES (?, ?, ?, ?)",
+            [(cursor.lastrowid, position, speaker, text)
+             for position, (speaker, text) in enumerate(record["segments"])])
+
+    def search(self, query: str, limit: int = 20, raw: bool = False) -> List[Dict]:
+        """Find segments containing every term of a query, best matches first.
+
+        With raw=True the query is passed to FTS5 as is, so its syntax
+        (phrases, OR, NEAR, prefix*) can be used.
+
+        Returns:
+            path, position, speaker, text and a highlighted snippet for every match
+
+        Raises:
+            ValueError: If a raw query isn't valid FTS5 syntax
+        """
+        return self._select(
+            "SELECT d.path, s.position, s.speaker, s.text, "
+            "snippet(segments_fts, 0, '[', ']', '...', 12) AS snippet "
+            "FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid "
+            "JOIN debates d ON d.id = s.debate_id "
+            "WHERE segments_fts MATCH ? ORDER BY rank LIMIT ?", (_match_query(query, raw), limit), query)
+
+    def find_debates(self, query: Optional[str] = None, speaker: Optional[str] = None,
+                     limit: Optional[int] = None, raw: bool = False) -> List[Dict]:
+        """Select indexed debates, optionally only those where `speaker` said something matching `query`.
+
+        The query is matched like in search(), including raw.
+
+        Returns:
+            path, sha256, ground_statement, summary, result and turns of every match
+        """
+        sql = "SELECT d.path, d.sha256, d.ground_statement, d.summary, d.result, d.turns FROM debates d"
+        conditions, params = [], []
+        if query is not None or speaker is not None:
+            subquery = "SELECT s.debate_id FROM segments s"
+            sub_conditions = []
+            if query is not None:
+                subquery += " JOIN segments_fts ON segments_fts.rowid = s.id"
+                sub_conditions.append("segments_fts MATCH ?")
+                params.append(_match_query(query, raw))
+            if speaker is not None:
+                sub_conditions.append("s.speaker = ?")
+                params.append(speaker)
+            conditions.append(f"d.id IN ({subquery} WHERE {' AND '.join(sub_conditions)})")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY d.path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._select(sql, params, query)
+
+    def _select(self, sql: str, params, query: Optional[str]) -> List[Dict]:
+        try:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query {query!r}: {e}") from e
+
+    def load(self, path: str) -> ParsedDebate:
+        """Parsed form of an indexed debate, rebuilt from the database."""
+        row = self._conn.execute("SELECT content FROM debates WHERE path = ?",
+                                 (os.path.abspath(path),)).fetchone()
+        if row is None:
+            raise KeyError(f"Debate not indexed: {path}")
+        return parse_debate_text(row["content"])
+
+    def load_transcript(self, path: str) -> Transcript:
+        """Transcript of an indexed debate, ready to pass to process_debate or create_debate_video."""
+        return Transcript.from_parsed(self.load(path))
+
+
+def _parse_or_none(path: str) -> Optional[Dict]:
+    try:
+        return parse_transcript_file(path)
+    except (OSError, UnicodeError) as e:
+        print(f"Could not index {path}: {e}")
+        return None
+
+
+def _successful(records: Iterator[Optional[Dict]], stats: Dict) -> Iterator[Dict]:
+    for record in records:
+        if record is None:
+            stats["failed"] += 1
+        else:
+            yield record
+
+
+def _match_query(query: str, raw: bool) -> str:
+    """FTS5 query for user input: every whitespace-separated term quoted, so all are required literally."""
+    if raw:
+        return query
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index archived debate transcripts for search.")
+    parser.add_argument("--db", default=DEFAULT_INDEX_PATH, help="SQLite database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Index every debate.txt under a directory")
+    build.add_argument("root")
+    build.add_argument("--workers", type=int, default=None, help="Parser processes, defaults to the CPU count")
+    build.add_argument("--filename", default="debate.txt")
+    search = commands.add_parser("search", help="Full-text search over indexed segments")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--raw", action="store_true", help="Pass the query to FTS5 unquoted, to use its syntax")
+    args = parser.parse_args()
+
+    with TranscriptIndex(args.db) as index:
+        if args.command == "build":
+            start_time = time.time()
+            stats = index.index_directory(args.root, filename=args.filename, workers=args.workers)
+            print(f"Indexed {stats['indexed']} transcripts ({stats['unchanged']} unchanged, "
+                  f"{stats['removed']} removed, {stats['failed']} failed) in {time.time() - start_time:.1f}s")
+        else:
+            for match in index.search(args.query, limit=args.limit, raw=args.raw):
+                print(f"{match['path']} #{match['position']} {match['speaker']}: {match['snippet']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional
+
+# Bump when the audio or timing that text_to_speech produces changes, so old entries stop matching
+CACHE_VERSION = 1
+
+# ioctl that clones a file's extents on copy-on-write filesystems (Btrfs, XFS)
+_FICLONE = 0x40049409
+
+
+def timing_path(audio_file: str) -> str:
+    """The _timing.json sidecar of a segment's audio file."""
+    return os.path.splitext(audio_file)[0] + '_timing.json'
+
+
+class SpeechCache:
+    """Content-addressed on-disk cache of synthesized segments, with LRU eviction.
+
+    Every entry is a WAV file and its timing sidecar, named after the hash of
+    everything that determines the audio: text, voice configuration, model,
+    sample rate and the backend that synthesizes it. Hits are hardlinked into the output directory, or
+    reflinked or copied where that's not possible, so an identical narrator
+    intro across a batch takes no extra disk space. Reading an entry
+    refreshes its modification time, and the least recently used entries are
+    deleted once the cache grows past max_bytes.
+
+    Identical requests that arrive while the first is still being synthesized
+    wait for it instead of starting their own, across threads and event loops.
+
+    Segment files are only ever replaced, never written in place, so a
+    hardlinked hit can't change the cached copy. Timing sidecars are rewritten
+    in place by AudioClip.save(), so those are always copied.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join('outputs', 'tts_cache'),
+                 max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._total_bytes = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(text: str, voice_config: Dict, sample_rate: int, backend: Optional[Dict] = None) -> str:
+        """Hash the parts of a synthesis request that determine its audio.
+
+        backend describes what synthesizes the audio (see audio_utils.synthesis_backend),
+        so a clip made one way isn't reused once the TTS configuration changes.
+        """
+        key_data = {"version": CACHE_VERSION, "text": text, "voice": voice_config,
+                    "model": voice_config.get("model"), "sample_rate": sample_rate,
+                    "backend": backend}
+        encoded = json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def get(self, key: str, output_file: str) -> bool:
+        """Place a cached segment and its timing at output_file. Returns False on a miss."""
+        path = self._entry_path(key)
+        if os.path.dirname(output_file):
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(path, None)
+            _place(path, output_file, link=True)
+            _place(timing_path(path), timing_path(output_file), link=False)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put(self, key: str, output_file: str) -> None:
+        """Store a finished segment and evict old entries if the cache is over its size limit."""
+        path = self._entry_path(key)
+        with self._lock:
+            previous_size = _entry_size(path)
+            current_size = self._current_size()
+            # The timing goes in first; an entry counts once its audio is there
+            _place(timing_path(output_file), timing_path(path), link=False)
+            _place(output_file, path, link=True)
+            self._total_bytes = current_size + _entry_size(path) - previous_size
+            over_quota = self._total_bytes > self.max_bytes
+        if over_quota:
+            self._evict()
+
+    async def synthesize(self, key: str, output_file: str,
+                         synthesize: Callable[[str], Awaitable[bool]]) -> bool:
+        """Produce output_file from the cache, from an identical request in flight, or with synthesize.
+
+        Args:
+            key: make_key() of the request
+            output_file: Where the segment's audio goes; its timing goes next to it
+            synthesize: Coroutine function that writes output_file and returns whether it succeeded
+
+        Returns:
+            Whether output_file was produced
+        """
+        if self.get(key, output_file):
+            return True
+        with self._lock:
+            pending = self._in_flight.get(key)
+            if pending is None:
+                self._in_flight[key] = Future()
+        if pending is not None:
+            self.shared += 1
+            try:
+                if await asyncio.wrap_future(pending) and self.get(key, output_file):
+                    return True
+            except Exception:
+                pass
+            # The first request failed or its entry is already gone, so try on our own
+            return await synthesize(output_file)
+
+        success = False
+        try:
+            success = await synthesize(output_file)
+            if success:
+                try:
+                    self.put(key, output_file)
+                except OSError as e:
+                    print(f"Could not cache {output_file}: {e}")
+            return success
+        finally:
+            with self._lock:
+                future = self._in_flight.pop(key)
+            future.set_result(success)
+
+    def _current_size(self) -> int:
+        # Called with the lock held
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        return self._total_bytes
+
+    def _entries(self):
+        """List (audio path, size of audio and timing, mtime) for every cache entry."""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.wav'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+                size = stat.st_size + os.path.getsize(timing_path(path))
+            except FileNotFoundError:
+                continue
+            entries.append((path, size, stat.st_mtime_ns))
+        return entries
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                os.remove(timing_path(path))
+                total -= size
+            except OSError as e:
+                print(f"Could not evict cache entry {path}: {e}")
+        with self._lock:
+            self._total_bytes = total
+
+
+def _entry_size(path: str) -> int:
+    """Bytes taken by an entry's audio and timing, 0 for parts that don't exist."""
+    return sum(os.path.getsize(part) for part in (path, timing_path(path)) if os.path.exists(part))
+
+
+def _place(source: str, destination: str, link: bool) -> None:
+    """Atomically replace destination with source, sharing its data when link is set."""
+    temp_path = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if not (link and (_hardlink(source, temp_path) or _reflink(source, temp_path))):
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, destination)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _hardlink(source: str, destination: str) -> bool:
+    try:
+        os.link(source, destination)
+        return True
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Different filesystems, or one without hardlinks
+        return False
+
+
+def _reflink(source: str, destination: str) -> bool:
+    """Clone source copy-on-write, on filesystems that support it."""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return True
+    except FileNotFoundError:
+        raise
+    except OSError:
+        try:
+            os.remove(destination)
+        except OSError:
+            pass
+        return False
@@ -0,0 +1,405 @@
+"""Local stand-in for the TTS-Provider WebSocket server.
+
+Speaks the same protocol as TTS-Provider: "loading" while the model warms
+up, "queued" with a queue_position while every synthesis slot is busy, then
+either a "success" message followed by the audio in binary frames (stream
+mode) or the path of a file it wrote (file mode). Stream audio is sent in the
+first of the request's accept_formats it can produce: raw PCM, WAV, or FLAC
+and Opus when soundfile is installed. Multiplexed requests get their
+request_id echoed and every frame prefixed with MUX_HEADER. Requests with
+"timestamps": "word" or "phoneme" get exact timings in the metadata; every
+syllable counts as a phoneme.
+
+The audio is synthetic but shaped like speech: voiced syllables with a
+speaker-dependent pitch, pauses between words and longer ones at commas and
+sentence ends. The same request always gets the same audio. How long the
+model takes to load, how fast it synthesizes (real-time factor), how many
+requests it runs and queues at once and how often it fails are configurable,
+so WebSocketManager, text_to_speech and process_debate_segments can be
+load-tested and benchmarked without a GPU or a network:
+
+    python -m utils.tts_stub_server --port 9100 --real-time-factor 0.2 --workers 2 --failure-rate 0.05
+    TTS_SERVER_URI=ws://127.0.0.1:9100 python debate_to_speech.py
+
+    with StubTTSServer(real_time_factor=0.1) as server:
+        manager = WebSocketManager(server.uri)
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from collections import deque
+
+import numpy as np
+import websockets
+
+from utils.wav_utils import PCM_FORMAT, WavFormat, read_wav, supported_transfer_formats, wav_header
+from utils.websocket_manager import MUX_HEADER
+
+# Pitch of each speaker ID, roughly matching the male and female voices in VOICES
+_SPEAKER_PITCH = {0: 115.0, 1: 205.0, 2: 220.0, 3: 125.0, 4: 195.0}
+
+_SYLLABLE_RE = re.compile(r"[aeiouy]+", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[\w']+|[.!?;:,]")
+
+_SYLLABLE_SECONDS = 0.16
+_WORD_GAP_SECONDS = 0.05
+_COMMA_PAUSE_SECONDS = 0.18
+_SENTENCE_PAUSE_SECONDS = 0.4
+
+
+class QueueFullError(Exception):
+    """Every synthesis slot is busy and the queue is at max_queue."""
+
+
+class StubTTSServer:
+    """WebSocket server that answers TTS requests with synthetic speech.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind, 0 picks a free port
+        load_time: Seconds after start during which requests get a "loading" status
+        real_time_factor: Synthesis time per second of audio, 0 for instant
+        workers: Requests synthesized at the same time, the rest are queued
+        max_queue: Requests that can wait for a worker before new ones are rejected
+        failure_rate: Chance that a request fails with an error message
+        disconnect_rate: Chance that the connection is dropped halfway through the audio
+        frame_size: Bytes of audio per binary frame
+        file_dir: Where file mode writes its audio, a temp directory by default
+        seed: Changes every generated clip while keeping them deterministic
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, load_time: float = 0.0,
+                 real_time_factor: float = 0.0, workers: int = 1, max_queue: int = 64,
+                 failure_rate: float = 0.0, disconnect_rate: float = 0.0, frame_size: int = 16384,
+                 file_dir: str = None, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.load_time = load_time
+        self.real_time_factor = real_time_factor
+        self.workers = workers
+        self.max_queue = max_queue
+        self.failure_rate = failure_rate
+        self.disconnect_rate = disconnect_rate
+        self.frame_size = frame_size
+        self.file_dir = file_dir or tempfile.mkdtemp(prefix="tts_stub_")
+        self.seed = seed
+        self.stats = {"requests": 0, "completed": 0, "failed": 0, "disconnected": 0,
+                      "rejected": 0, "peak_queue": 0, "audio_seconds": 0.0}
+        self._faults = random.Random(seed)
+        self._transfer_formats = supported_transfer_formats(lossy=True)
+        self._thread = None
+        self._loop = None
+        self._stopped = None
+        self._ready = threading.Event()
+        self._error = None
+
+    @property
+    def uri(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self) -> "StubTTSServer":
+        """Serve requests from a background thread with its own event loop."""
+        self._thread = threading.Thread(target=asyncio.run, args=(self.serve(),), daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests from the calling thread until interrupted."""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self) -> None:
+        if self._loop and self._stopped:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    async def serve(self) -> None:
+        """Serve on the running event loop until stop() is called."""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._slots = asyncio.Condition()
+        self._busy = 0
+        self._queue = deque()
+        self._loaded_at = self._loop.time() + self.load_time
+        try:
+            server = await websockets.serve(self._handle, self.host, self.port, max_size=None)
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    def synthesize(self, text: str, speaker: int = 0, sample_rate: int = 24000,
+                   max_audio_length_ms: int = None) -> bytes:
+        """Deterministic speech-like 16-bit mono WAV audio for text."""
+        return self._render(text, speaker, sample_rate, max_audio_length_ms)[0]
+
+    def _render(self, text: str, speaker: int, sample_rate: int, max_audio_length_ms: int = None):
+        """The WAV audio for text and its phonemes, {"phoneme", "word", "word_index", "start", "end"}."""
+        seed = hashlib.sha256(json.dumps([self.seed, text, speaker, sample_rate]).encode("utf-8")).digest()
+        rng = np.random.default_rng(int.from_bytes(seed[:8], "big"))
+        pitch = _SPEAKER_PITCH.get(speaker, 150.0)
+
+        pieces = []
+        phonemes = []
+        length = 0  # samples so far
+        word_index = 0
+        for token in _TOKEN_RE.findall(text):
+            if token in ".!?":
+                pieces.append(np.zeros(int(_SENTENCE_PAUSE_SECONDS * sample_rate)))
+            elif token in ";:,":
+                pieces.append(np.zeros(int(_COMMA_PAUSE_SECONDS * sample_rate)))
+            else:
+                for syllable in _SYLLABLE_RE.findall(token) or [token]:
+                    pieces.append(_syllable(rng, pitch, sample_rate))
+                    phonemes.append({"phoneme": syllable.lower(), "word": token, "word_index": word_index,
+                                     "start": length / sample_rate,
+                                     "end": (length + len(pieces[-1])) / sample_rate})
+                    length += len(pieces[-1])
+                word_index += 1
+                pieces.append(np.zeros(int(_WORD_GAP_SECONDS * sample_rate)))
+            # The pause after a word or punctuation mark
+            length += len(pieces[-1])
+        samples = np.concatenate(pieces) if pieces else np.zeros(int(_SENTENCE_PAUSE_SECONDS * sample_rate))
+        if max_audio_length_ms:
+            samples = samples[:int(sample_rate * max_audio_length_ms / 1000)]
+            phonemes = [phoneme for phoneme in phonemes if phoneme["end"] * 1000 <= max_audio_length_ms]
+
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767 * 0.6).astype("<i2").tobytes()
+        return wav_header(WavFormat(1, 2, sample_rate), len(pcm)) + pcm, phonemes
+
+    async def _handle(self, websocket) -> None:
+        tasks = set()
+        try:
+            async for message in websocket:
+                try:
+                    request = json.loads(message)
+                except (TypeError, ValueError):
+                    await websocket.send(json.dumps({"status": "error", "message": "Invalid JSON request"}))
+                    continue
+                if request.get("multiplex"):
+                    # Multiplexed requests run side by side; plain ones keep the connection to themselves
+                    task = asyncio.ensure_future(self._respond(websocket, request))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    await self._respond(websocket, request)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _respond(self, websocket, request: dict) -> None:
+        request_id = request.get("request_id")
+
+        async def send_json(message):
+            if request_id is not None:
+                message = dict(message, request_id=request_id)
+            await websocket.send(json.dumps(message))
+
+        self.stats["requests"] += 1
+        if not request.get("text"):
+            await send_json({"status": "error", "message": "No text provided"})
+            return
+
+        wait = self._loaded_at - self._loop.time()
+        if wait > 0:
+            await send_json({"status": "loading"})
+            await asyncio.sleep(wait)
+
+        try:
+            await self._acquire_slot(send_json)
+        except QueueFullError:
+            self.stats["rejected"] += 1
+            await send_json({"status": "error", "message": "Server busy, the request queue is full"})
+            return
+        try:
+            sample_rate = int(request.get("sample_rate") or 24000)
+            audio, phonemes = self._render(request["text"], request.get("speaker", 0), sample_rate,
+                                           request.get("max_audio_length_ms"))
+            duration = (len(audio) - 44) / (2 * sample_rate)
+            if self.real_time_factor:
+                await asyncio.sleep(duration * self.real_time_factor)
+            if self._faults.random() < self.failure_rate:
+                self.stats["failed"] += 1
+                await send_json({"status": "error", "message": "Injected synthesis failure"})
+                return
+        finally:
+            await self._release_slot()
+
+        response_mode = request.get("response_mode", "stream")
+        transfer_format = "wav"
+        if response_mode == "stream":
+            accepted = [f for f in request.get("accept_formats") or [] if f in self._transfer_formats]
+            transfer_format = accepted[0] if accepted else "wav"
+            audio = _encode(audio, transfer_format)
+        metadata = {"status": "success", "response_mode": response_mode, "sample_rate": sample_rate,
+                    "channels": 1, "format": transfer_format, "duration": duration,
+                    "length_bytes": len(audio), "sha256": hashlib.sha256(audio).hexdigest()}
+        if request.get("timestamps") == "phoneme":
+            metadata["phonemes"] = phonemes
+        elif request.get("timestamps") == "word":
+            metadata["words"] = _words(phonemes)
+        if response_mode == "file":
+            path = os.path.join(self.file_dir, f"{metadata['sha256'][:16]}.wav")
+            with open(path, "wb") as f:
+                f.write(audio)
+            await send_json(dict(metadata, filepath=path))
+        else:
+            cut = len(audio) // 2 if self._faults.random() < self.disconnect_rate else None
+            await send_json(metadata)
+            header = MUX_HEADER.pack(request_id) if request_id is not None else b""
+            for start in range(0, len(audio), self.frame_size):
+                if cut is not None and start >= cut:
+                    self.stats["disconnected"] += 1
+                    await websocket.close()
+                    return
+                await websocket.send(header + audio[start:start + self.frame_size])
+        self.stats["completed"] += 1
+        self.stats["audio_seconds"] += duration
+
+    async def _acquire_slot(self, send_json) -> None:
+        """Wait for a free worker, reporting the queue position whenever it changes."""
+        async with self._slots:
+            if self._busy < self.workers and not self._queue:
+                self._busy += 1
+                return
+            if len(self._queue) >= self.max_queue:
+                raise QueueFullError()
+            ticket = object()
+            self._queue.append(ticket)
+            self.stats["peak_queue"] = max(self.stats["peak_queue"], len(self._queue))
+
+        reported = None
+        try:
+            while True:
+                async with self._slots:
+                    while True:
+                        if self._queue[0] is ticket and self._busy < self.workers:
+                            self._queue.popleft()
+                            self._busy += 1
+                            self._slots.notify_all()
+                            return
+                        position = self._queue.index(ticket) + 1
+                        if position != reported:
+                            break
+                        await self._slots.wait()
+                reported = position
+                await send_json({"status": "queued", "queue_position": position})
+        except BaseException:
+            async with self._slots:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                self._slots.notify_all()
+            raise
+
+    async def _release_slot(self) -> None:
+        async with self._slots:
+            self._busy -= 1
+            self._slots.notify_all()
+
+
+def _words(phonemes: list) -> list:
+    """Group phoneme timings into {"word", "start", "end"} word timings."""
+    words = []
+    for phoneme in phonemes:
+        if words and words[-1]["index"] == phoneme["word_index"]:
+            words[-1]["end"] = phoneme["end"]
+        else:
+            words.append({"index": phoneme["word_index"], "word": phoneme["word"],
+                          "start": phoneme["start"], "end": phoneme["end"]})
+    return [{"word": word["word"], "start": word["start"], "end": word["end"]} for word in words]
+
+
+def _encode(wav: bytes, transfer_format: str) -> bytes:
+    """Re-encode a WAV clip in a negotiated transfer format."""
+    if transfer_format == "wav":
+        return wav
+    wav_format, pcm = read_wav(wav)
+    if transfer_format == PCM_FORMAT:
+        return pcm
+    import soundfile
+    samples = np.frombuffer(pcm, dtype="<i2")
+    buffer = io.BytesIO()
+    if transfer_format == "flac":
+        soundfile.write(buffer, samples, wav_format.sample_rate, format="FLAC")
+    else:
+        soundfile.write(buffer, samples, wav_format.sample_rate, format="OGG", subtype="OPUS")
+    return buffer.getvalue()
+
+
+def _syllable(rng, pitch: float, sample_rate: int) -> np.ndarray:
+    """One voiced syllable: a gliding pitch with vowel-like formants under a smooth envelope."""
+    seconds = _SYLLABLE_SECONDS * rng.uniform(0.7, 1.4)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    glide = pitch * rng.uniform(0.9, 1.1) * (1 + rng.uniform(-0.08, 0.08) * t / seconds)
+    phase = 2 * np.pi * np.cumsum(glide) / sample_rate
+    formants = (rng.uniform(300, 900), rng.uniform(900, 2500))
+
+    wave = np.zeros_like(t)
+    for harmonic in range(1, 12):
+        frequency = harmonic * glide[0]
+        if frequency >= sample_rate / 2:
+            break
+        gain = sum(np.exp(-((frequency - formant) / 180.0) ** 2) for formant in formants) + 0.05
+        wave += gain / harmonic * np.sin(harmonic * phase)
+    wave += rng.normal(0, 0.01, len(t))
+    envelope = np.sin(np.pi * np.linspace(0, 1, len(t))) ** 0.5
+    peak = np.abs(wave).max() or 1.0
+    return wave * envelope / peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the TTS-Provider server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--load-time", type=float, default=0.0, help="Seconds the model takes to load")
+    parser.add_argument("--real-time-factor", type=float, default=0.0,
+                        help="Synthesis seconds per second of audio, 0 for instant")
+    parser.add_argument("--workers", type=int, default=1, help="Requests synthesized at the same time")
+    parser.add_argument("--max-queue", type=int, default=64, help="Requests that can wait for a worker")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Chance a request fails")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0,
+                        help="Chance the connection drops halfway through the audio")
+    parser.add_argument("--frame-size", type=int, default=16384, help="Bytes of audio per binary frame")
+    parser.add_argument("--file-dir", default=None, help="Where file mode writes its audio")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubTTSServer(args.host, args.port, load_time=args.load_time,
+                           real_time_factor=args.real_time_factor, workers=args.workers,
+                           max_queue=args.max_queue, failure_rate=args.failure_rate,
+                           disconnect_rate=args.disconnect_rate, frame_size=args.frame_size,
+                           file_dir=args.file_dir, seed=args.seed)
+    print(f"Stub TTS server listening on {server.uri}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -47,6 +47,22 @@ _has_seen_first_debater = False  # Flag to track if we've seen the first debater
 _last_detected_speaker = None
 _speaker_stability_counter = 0
 
+def reset_frame_state(summary=None):
+    """Reset the narrator/speaker tracking so a new debate doesn't inherit the last one's state.
+    
+    Args:
+        summary: Ground statement summary to show during the debate, if already known
+    """
+    global _narrator_state, _ground_statement_text, _ground_statement_summary, _has_seen_first_debater
+    global _last_detected_speaker, _speaker_stability_counter
+    
+    _narrator_state = "preDebate"
+    _ground_statement_text = ""
+    _ground_statement_summary = f"Topic: {summary}" if summary else ""
+    _has_seen_first_debater = False
+    _last_detected_speaker = None
+    _speaker_stability_counter = 0
+
 def create_frame(speaker, text, current_time=0, total_duration=5.0, timing_segments=None, debug_timing=False):
     """Create a video frame with speakers and text."""
     global _narrator_state, _ground_statement_text, _ground_statement_summary, _has_seen_first_debater
@@ -224,13 +240,14 @@ def create_frame_worker(args):
         print(f"Error creating frame: {str(e)}")
         return index, None
 
-def validate_clip_audio(clip, index):
+def validate_clip_audio(clip, index, temp_dir=None):
     """
     Validate and fix audio in clip using the VideoClip class.
     
     Args:
         clip: MoviePy VideoClip object
         index: Clip index for logging
+        temp_dir: Directory for the re-encoded clip (defaults to PROJECT_TEMP_DIR)
         
     Returns:
         MoviePy VideoClip object with validated audio
@@ -249,7 +266,7 @@ def validate_clip_audio(clip, index):
             # Get the raw clip
             raw_clip = result_clip.get_raw_clip()
             # Save to a temporary file and reload to reset audio buffer
-            temp_fix_file = os.path.join(PROJECT_TEMP_DIR, f"fix_seg_{index}.mp4")
+            temp_fix_file = os.path.join(temp_dir or PROJECT_TEMP_DIR, f"fix_seg_{index}.mp4")
             raw_clip.write_videofile(
                 temp_fix_file,
                 codec='libx264',
@@ -338,16 +355,17 @@ def create_segment_video(segment_index, speaker, text, audio_file, mode='slow',
             print(f"Error creating fallback clip for segment {segment_index}: {str(e)}")
             return None
 
-def write_temp_video(clip, index, num_cores, mode='slow', temp_dir=None):
+def write_temp_video(clip, index, num_cores, mode='slow', temp_dir=None, frames_dir=None):
     """Writes a single clip to a temporary file."""
     # Use provided temp_dir or default to PROJECT_TEMP_DIR
     temp_dir = temp_dir or PROJECT_TEMP_DIR
+    frames_dir = frames_dir or TEMP_FRAMES_DIR
     
-    temp_file = os.path.join(TEMP_FRAMES_DIR, f"seg_{index:03d}.mp4")
+    temp_file = os.path.join(frames_dir, f"seg_{index:03d}.mp4")
         
     try:
         # Validate clip audio before writing
-        clip = validate_clip_audio(clip, index)
+        clip = validate_clip_audio(clip, index, temp_dir)
         # Fix video duration to prevent frame reading issues
         clip = fix_video_duration(clip, index)
         
@@ -397,7 +415,8 @@ def write_temp_video(clip, index, num_cores, mode='slow', temp_dir=None):
         except:
             pass
 
-def combine_video_segments(clips, output_file, mode='slow', temp_dir=None, add_bg_music=True, bg_music_file="assets/background_music.mp3", bg_volume=0.15):
+def combine_video_segments(clips, output_file, mode='slow', temp_dir=None, add_bg_music=True, bg_music_file="assets/background_music.mp3", bg_volume=0.15,
+                           frames_dir=None):
     """Combines multiple video clips into a final video."""
     # Use provided temp_dir or default to PROJECT_TEMP_DIR
     temp_dir = temp_dir or PROJECT_TEMP_DIR
@@ -411,7 +430,7 @@ def combine_video_segments(clips, output_file, mode='slow', temp_dir=None, add_b
         # Write each clip to a temporary file and concatenate them
         for i, clip in enumerate(clips):
             print(f"  - Writing segment {i+1}/{len(clips)}")
-            temp_file = write_temp_video(clip, i, num_cores, mode, temp_dir)
+            temp_file = write_temp_video(clip, i, num_cores, mode, temp_dir, frames_dir)
             if temp_file:
                 temp_files.append(temp_file)
 
@@ -424,7 +443,7 @@ def combine_video_segments(clips, output_file, mode='slow', temp_dir=None, add_b
                     # Select resize algorithm based on mode
                     resize_algo = 'fast_bilinear' if mode == 'fast' else 'bicubic'
                     clip = VideoFileClip(temp_file, target_resolution=None, resize_algorithm=resize_algo)
-                    clip = validate_clip_audio(clip, i)
+                    clip = validate_clip_audio(clip, i, temp_dir)
                     video_clips.append(clip)
                 except Exception as e:
                     print(f"Error loading clip {temp_file}: {str(e)}")
@@ -0,0 +1,198 @@
+import importlib.util
+import io
+import struct
+import wave
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Transfer formats a TTS server can send audio in, besides a WAV file. Raw
+# PCM is 16-bit little-endian with the sample rate in the response metadata;
+# FLAC and Opus need the optional soundfile package to decode.
+PCM_FORMAT = "pcm_s16le"
+COMPRESSED_FORMATS = ("flac", "opus")
+
+
+class WavFormat(NamedTuple):
+    """Sample layout of PCM audio."""
+    channels: int
+    sample_width: int  # bytes per sample
+    sample_rate: int
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.channels * self.sample_width * self.sample_rate
+
+    def duration(self, pcm_length: int) -> float:
+        """Seconds of audio in pcm_length bytes."""
+        return pcm_length / self.bytes_per_second
+
+
+def read_wav(data: bytes) -> Tuple[WavFormat, bytes]:
+    """Split a WAV file into its format and its PCM samples.
+
+    Raises:
+        ValueError: If data isn't a PCM WAV file
+    """
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            wav_format = WavFormat(wav.getnchannels(), wav.getsampwidth(), wav.getframerate())
+            pcm = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Not a PCM WAV file: {e}")
+    return wav_format, pcm
+
+
+def wav_header(wav_format: WavFormat, pcm_length: int) -> bytes:
+    """Canonical 44-byte header for pcm_length bytes of PCM audio."""
+    block_align = wav_format.channels * wav_format.sample_width
+    return (
+        b'RIFF' + struct.pack('<I', 36 + pcm_length) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, wav_format.channels, wav_format.sample_rate,
+                                wav_format.bytes_per_second, block_align, wav_format.sample_width * 8)
+        + b'data' + struct.pack('<I', pcm_length)
+    )
+
+
+def stitch_wav(parts: List[bytes], sink) -> Tuple[WavFormat, List[Tuple[float, float]]]:
+    """Join WAV files at the PCM level and write the result, with one header, to sink.
+
+    Concatenating the files themselves would leave every header after the
+    first in the middle of the audio.
+
+    Args:
+        parts: WAV files with the same format, in playback order
+        sink: Anything with a write(bytes) method
+
+    Returns:
+        The format of the audio and the (start, end) time of every part in seconds
+    """
+    if not parts:
+        raise ValueError("No audio to stitch")
+    decoded = [read_wav(part) for part in parts]
+    wav_format = _common_format([part_format for part_format, _ in decoded])
+
+    sink.write(wav_header(wav_format, sum(len(pcm) for _, pcm in decoded)))
+    offsets = []
+    position = 0
+    for _, pcm in decoded:
+        sink.write(pcm)
+        offsets.append((wav_format.duration(position), wav_format.duration(position + len(pcm))))
+        position += len(pcm)
+    return wav_format, offsets
+
+
+def stitch_wav_files(paths: List[str], sink, block_frames: int = 65536) -> Tuple[WavFormat, List[Tuple[float, float]]]:
+    """stitch_wav for WAV files on disk, copied a block at a time instead of read into memory.
+    
+    Args:
+        paths: WAV files with the same format, in playback order
+        sink: Anything with a write(bytes) method
+        block_frames: Frames copied per read
+        
+    Returns:
+        The format of the audio and the (start, end) time of every file in seconds
+    """
+    if not paths:
+        raise ValueError("No audio to stitch")
+    formats, lengths = [], []
+    for path in paths:
+        try:
+            with wave.open(path, 'rb') as wav:
+                formats.append(WavFormat(wav.getnchannels(), wav.getsampwidth(), wav.getframerate()))
+                lengths.append(wav.getnframes() * wav.getnchannels() * wav.getsampwidth())
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"Not a PCM WAV file: {path}: {e}")
+    wav_format = _common_format(formats)
+    
+    sink.write(wav_header(wav_format, sum(lengths)))
+    offsets = []
+    position = 0
+    for path, length in zip(paths, lengths):
+        with wave.open(path, 'rb') as wav:
+            while True:
+                frames = wav.readframes(block_frames)
+                if not frames:
+                    break
+                sink.write(frames)
+        offsets.append((wav_format.duration(position), wav_format.duration(position + length)))
+        position += length
+    return wav_format, offsets
+
+
+def _common_format(formats: List[WavFormat]) -> WavFormat:
+    """The format shared by all parts of a stitch, or ValueError if they differ."""
+    for other_format in formats[1:]:
+        if other_format != formats[0]:
+            raise ValueError(f"Can't stitch {other_format} audio onto {formats[0]} audio")
+    return formats[0]
+
+
+def wav_duration(path: str) -> float:
+    """Seconds of audio in a WAV file, read from its header alone.
+
+    Raises:
+        ValueError: If path isn't a PCM WAV file
+    """
+    try:
+        with wave.open(path, 'rb') as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Not a PCM WAV file: {e}")
+
+
+def encode_wav(wav_format: WavFormat, samples: np.ndarray) -> bytes:
+    """A WAV file holding 16-bit samples."""
+    pcm = samples.astype('<i2', copy=False).tobytes()
+    return wav_header(wav_format, len(pcm)) + pcm
+
+
+def supported_transfer_formats(lossy: bool = False) -> List[str]:
+    """Transfer formats this client can decode, most compact first.
+
+    Opus is lossy, so it's only offered when asked for.
+    """
+    formats = []
+    if importlib.util.find_spec("soundfile"):
+        formats += ["opus", "flac"] if lossy else ["flac"]
+    return formats + [PCM_FORMAT, "wav"]
+
+
+def decode_audio(data: bytes, transfer_format: str = "wav", sample_rate: Optional[int] = None,
+                 channels: int = 1) -> Tuple[WavFormat, np.ndarray]:
+    """Decode audio in any transfer format straight into 16-bit samples, without temp files.
+
+    Args:
+        data: The audio as it came over the wire
+        transfer_format: "wav", PCM_FORMAT or one of COMPRESSED_FORMATS
+        sample_rate: Sample rate of raw PCM audio, which has no header to read it from
+        channels: Interleaved channels of raw PCM audio
+
+    Returns:
+        The format of the samples and the samples themselves, interleaved
+
+    Raises:
+        ValueError: If the audio can't be decoded
+    """
+    if transfer_format == "wav":
+        wav_format, pcm = read_wav(data)
+        if wav_format.sample_width != 2:
+            raise ValueError(f"Expected 16-bit WAV audio, got {wav_format.sample_width * 8}-bit")
+        return wav_format, np.frombuffer(pcm, dtype='<i2')
+    if transfer_format == PCM_FORMAT:
+        if not sample_rate:
+            raise ValueError("Raw PCM audio needs a sample rate")
+        if len(data) % (2 * channels):
+            raise ValueError(f"{len(data)} bytes isn't a whole number of {channels}-channel 16-bit frames")
+        return WavFormat(channels, 2, sample_rate), np.frombuffer(data, dtype='<i2')
+    if transfer_format in COMPRESSED_FORMATS:
+        try:
+            import soundfile
+        except ImportError:
+            raise ValueError(f"Decoding {transfer_format} audio needs the soundfile package")
+        try:
+            samples, rate = soundfile.read(io.BytesIO(data), dtype='int16')
+        except RuntimeError as e:
+            raise ValueError(f"Not {transfer_format} audio: {e}")
+        return WavFormat(1 if samples.ndim == 1 else samples.shape[1], 2, rate), samples.reshape(-1)
+    raise ValueError(f"Unknown audio transfer format: {transfer_format}")
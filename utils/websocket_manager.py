@@ -1,24 +1,295 @@
 import asyncio
+import hashlib
+import itertools
 import json
+import os
+import struct
+import weakref
 import websockets
-from typing import Optional, Any, Dict, List
+from contextlib import asynccontextmanager
+from typing import Optional, Any, Awaitable, Dict, List
 import time
 
-class WebSocketManager:
-    def __init__(self, uri: str = "ws://localhost:9000", max_retries: int = 3, retry_delay: int = 2):
+from websockets.protocol import State
+
+from utils.text_utils import split_text_into_chunks
+from utils.wav_utils import (PCM_FORMAT, WavFormat, decode_audio, encode_wav, stitch_wav,
+                              supported_transfer_formats, wav_duration, wav_header)
+
+# Pools of open connections, one set per event loop since connections can't be shared between loops
+_pools = weakref.WeakKeyDictionary()
+
+# In multiplexed mode every binary frame starts with the ID of the request it belongs to
+MUX_HEADER = struct.Struct("!I")
+
+# Text of the tiny request that makes the server load a model
+WARM_UP_TEXT = "Warming up."
+
+
+class ConnectionLostError(ConnectionError):
+    """The TTS server connection closed while a request was waiting for its response."""
+
+
+class IncompleteAudioError(Exception):
+    """The audio that arrived doesn't match the length or checksum the server announced."""
+
+
+class AudioBuffer:
+    """Collects streamed audio in memory, hashing it as it arrives."""
+
+    def __init__(self):
+        self.length = 0
+        self._data = bytearray()
+        self._hash = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, data: bytes) -> None:
+        self._data += data
+        self._hash.update(data)
+        self.length += len(data)
+
+    def commit(self) -> bytes:
+        return bytes(self._data)
+
+    def discard(self) -> None:
+        self._data = bytearray()
+
+
+class AudioFileWriter:
+    """Streams audio into a temp file next to path and renames it into place once complete.
+    
+    Memory use stays flat however long the clip is, and path never holds a
+    partial file: it keeps its previous content until commit(). A header,
+    e.g. the WAV header in front of raw PCM, isn't counted in length or sha256.
+    """
+
+    def __init__(self, path: str, header: bytes = b""):
+        self.path = path
+        self.temp_path = f"{path}.{os.getpid()}.{id(self)}.part"
+        self.length = 0
+        self._hash = hashlib.sha256()
+        self._file = open(self.temp_path, 'wb')
+        self._file.write(header)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._hash.update(data)
+        self.length += len(data)
+
+    def commit(self) -> str:
+        """Move the finished file into place and return its path."""
+        self._file.close()
+        os.replace(self.temp_path, self.path)
+        return self.path
+
+    def discard(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+def word_timestamps(metadata: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Word timings a server sent with its response, as {"word", "start", "end"} in seconds.
+    
+    Servers that know when every word is spoken send them in "words". Those
+    that work with phonemes send "phonemes" instead, each with the
+    "word_index" of the word it belongs to, and are grouped into words here.
+    
+    Returns:
+        The words in order, or None if the metadata has no usable timestamps
+    """
+    try:
+        if metadata.get("words"):
+            words = [{"word": str(word.get("word", "")), "start": float(word["start"]), "end": float(word["end"])}
+                     for word in metadata["words"]]
+        elif metadata.get("phonemes"):
+            grouped = {}
+            for phoneme in metadata["phonemes"]:
+                start, end = float(phoneme["start"]), float(phoneme["end"])
+                word = grouped.setdefault(int(phoneme["word_index"]), {"word": "", "start": start, "end": end})
+                word["start"], word["end"] = min(word["start"], start), max(word["end"], end)
+                if phoneme.get("word"):
+                    word["word"] = str(phoneme["word"])
+            words = [grouped[index] for index in sorted(grouped)]
+        else:
+            return None
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"Ignoring malformed word timestamps: {e}")
+        return None
+    if any(word["end"] < word["start"] for word in words) or \
+            any(b["start"] < a["start"] for a, b in zip(words, words[1:])):
+        print("Ignoring word timestamps that are out of order")
+        return None
+    return words or None
+
+
+def _verify_checksum(metadata: Dict[str, Any], sha256: str) -> None:
+    """Compare received audio with the checksum in the metadata, if the server sent one."""
+    expected = metadata.get("sha256")
+    if expected and expected.lower() != sha256:
+        raise IncompleteAudioError(f"Audio checksum mismatch: expected {expected}, got {sha256}")
+
+
+class _DirectChannel:
+    """A connection used by a single request at a time; messages arrive in protocol order."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+
+    async def send_request(self, request: Dict[str, Any]) -> None:
+        await self.websocket.send(json.dumps(request))
+
+    async def recv(self):
+        return await self.websocket.recv()
+
+    async def abandon(self) -> None:
+        """Give up on the response; whatever is still on its way would confuse the next request."""
+        await self.websocket.close()
+
+
+class _MultiplexedChannel:
+    """One request on a shared MultiplexedConnection.
+    
+    Behaves like a direct connection: recv() returns the JSON messages and
+    the audio payloads (without their request ID header) of this request only.
+    """
+
+    def __init__(self, connection: "MultiplexedConnection", request_id: int):
+        self.connection = connection
+        self.request_id = request_id
+        self._messages = asyncio.Queue()
+
+    async def send_request(self, request: Dict[str, Any]) -> None:
+        await self.connection.websocket.send(json.dumps(dict(request, request_id=self.request_id, multiplex=True)))
+
+    async def recv(self):
+        message = await self._messages.get()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    async def abandon(self) -> None:
+        # Late frames for an unknown request ID are dropped by the reader
+        self.connection.close_channel(self.request_id)
+
+
+class MultiplexedConnection:
+    """A WebSocket that carries many TTS requests at once.
+    
+    Every request is tagged with a request_id, which the server echoes in its
+    JSON messages and puts in front of every binary frame (MUX_HEADER). A
+    reader task sorts the interleaved messages into per-request queues, so
+    any number of syntheses can be in flight on one connection.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self._channels = {}
+        self._ids = itertools.count(1)
+        self._reader = asyncio.ensure_future(self._read())
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._channels)
+
+    @property
+    def closed(self) -> bool:
+        return self._reader.done()
+
+    def open_channel(self) -> _MultiplexedChannel:
+        channel = _MultiplexedChannel(self, next(self._ids))
+        self._channels[channel.request_id] = channel
+        return channel
+
+    def close_channel(self, request_id: int) -> None:
+        self._channels.pop(request_id, None)
+
+    async def _read(self) -> None:
+        error = ConnectionLostError("TTS server closed the connection")
+        try:
+            async for message in self.websocket:
+                if isinstance(message, bytes):
+                    if len(message) < MUX_HEADER.size:
+                        continue
+                    (request_id,) = MUX_HEADER.unpack_from(message)
+                    message = message[MUX_HEADER.size:]
+                else:
+                    request_id = json.loads(message).get("request_id")
+                    if request_id is None:
+                        error = ConnectionLostError("TTS server doesn't support multiplexed requests")
+                        break
+                channel = self._channels.get(request_id)
+                if channel is not None:
+                    channel._messages.put_nowait(message)
+        except Exception as e:
+            error = ConnectionLostError(f"TTS server connection failed: {e}")
+        for channel in list(self._channels.values()):
+            channel._messages.put_nowait(error)
+        await self.websocket.close()
+
+    async def close(self) -> None:
+        self._reader.cancel()
+        await self.websocket.close()
+
+
+class ConnectionPool:
+    """Long-lived pool of open WebSocket connections to the TTS server.
+    
+    Connections are handed out one request at a time and returned afterwards,
+    so every segment after the first skips the TCP and WebSocket handshakes.
+    A connection that sat idle for longer than health_check_after is pinged
+    before it is reused, and a dead one is replaced by a new connection.
+    
+    In multiplexed mode (channel()) the pool instead keeps up to max_size
+    shared MultiplexedConnections and spreads requests over them, opening a
+    new one once every connection has max_in_flight requests.
+    
+    Args:
+        uri: TTS server address
+        max_size: Maximum number of open connections of each kind
+        max_retries: Connection attempts before giving up
+        retry_delay: Seconds between connection attempts
+        health_check_after: Idle seconds after which a connection is pinged before reuse
+        ping_timeout: Seconds to wait for the pong of a health check
+        max_in_flight: Requests per multiplexed connection before another one is opened
+    """
+
+    def __init__(self, uri: str = "ws://localhost:9000", max_size: int = 4, max_retries: int = 3,
+                 retry_delay: float = 2, health_check_after: float = 10.0, ping_timeout: float = 5.0,
+                 max_in_flight: int = 16):
         self.uri = uri
+        self.max_size = max_size
         self.max_retries = max_retries
         self.retry_delay = retry_delay
-        self.max_message_size = 500000  # ~500KB for safe margin below WebSocket limit
+        self.health_check_after = health_check_after
+        self.ping_timeout = ping_timeout
+        self.max_in_flight = max_in_flight
+        self._multiplexed = []
+        self._multiplexed_lock = asyncio.Lock()
+        self._idle = []  # (websocket, time it was returned)
+        self._open = 0
+        self._available = asyncio.Condition()
+        self.connects = 0
 
-    async def _try_connect(self) -> Optional[websockets.WebSocketClientProtocol]:
+    async def _connect(self):
         """Attempt to establish a WebSocket connection with retries."""
         for attempt in range(self.max_retries):
             try:
                 print(f"Attempting to connect to TTS server at {self.uri}...")
                 # Connect with no timeout - wait indefinitely
-                return await websockets.connect(self.uri, ping_timeout=None, ping_interval=None, close_timeout=None, max_size=10 * 1024 * 1024)
-            except (websockets.exceptions.WebSocketException, ConnectionRefusedError) as e:
+                websocket = await websockets.connect(self.uri, ping_timeout=None, ping_interval=None, close_timeout=None, max_size=10 * 1024 * 1024)
+                self.connects += 1
+                return websocket
+            except (websockets.exceptions.WebSocketException, OSError) as e:
                 if attempt == self.max_retries - 1:
                     print(f"ERROR: Could not connect to TTS server at {self.uri}. Please make sure the server is running.")
                     print(f"To start the TTS server, run the following commands:")
@@ -30,53 +301,187 @@ class WebSocketManager:
                 await asyncio.sleep(self.retry_delay)
         return None
 
+    async def _healthy(self, websocket, idle_since: float) -> bool:
+        if websocket.state is not State.OPEN:
+            return False
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            pong = await websocket.ping()
+            await asyncio.wait_for(pong, timeout=self.ping_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def acquire(self):
+        """Take an open connection, reusing an idle one if it's still healthy."""
+        while True:
+            async with self._available:
+                while not self._idle and self._open >= self.max_size:
+                    await self._available.wait()
+                if self._idle:
+                    websocket, idle_since = self._idle.pop()
+                else:
+                    websocket = None
+                    self._open += 1
+            if websocket is None:
+                try:
+                    websocket = await self._connect()
+                    if websocket is None:
+                        raise ConnectionError("Failed to establish connection to TTS service")
+                except BaseException:
+                    await self._forget()
+                    raise
+                return websocket
+            if await self._healthy(websocket, idle_since):
+                return websocket
+            print("Dropping a dead TTS server connection")
+            await self._discard(websocket)
+
+    async def release(self, websocket) -> None:
+        """Return a connection after a complete request/response exchange."""
+        if websocket.state is not State.OPEN:
+            await self._discard(websocket)
+            return
+        async with self._available:
+            self._idle.append((websocket, time.monotonic()))
+            self._available.notify()
+
+    async def _discard(self, websocket) -> None:
+        """Close a connection that can't be reused, e.g. after an interrupted exchange."""
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+        await self._forget()
+
+    async def _forget(self) -> None:
+        async with self._available:
+            self._open -= 1
+            self._available.notify()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection for one exchange. It's closed instead of returned if the exchange fails."""
+        websocket = await self.acquire()
+        try:
+            yield websocket
+        except BaseException:
+            await self._discard(websocket)
+            raise
+        await self.release(websocket)
+
+    async def _multiplexed_connection(self) -> MultiplexedConnection:
+        async with self._multiplexed_lock:
+            self._multiplexed = [connection for connection in self._multiplexed if not connection.closed]
+            least_busy = min(self._multiplexed, key=lambda connection: connection.in_flight, default=None)
+            if least_busy is None or (least_busy.in_flight >= self.max_in_flight
+                                      and len(self._multiplexed) < self.max_size):
+                websocket = await self._connect()
+                if websocket is None:
+                    raise ConnectionError("Failed to establish connection to TTS service")
+                least_busy = MultiplexedConnection(websocket)
+                self._multiplexed.append(least_busy)
+            return least_busy
+
+    @asynccontextmanager
+    async def channel(self):
+        """Open a request channel on a shared multiplexed connection."""
+        connection = await self._multiplexed_connection()
+        channel = connection.open_channel()
+        try:
+            yield channel
+        finally:
+            connection.close_channel(channel.request_id)
+
+    async def close(self) -> None:
+        """Close every idle and multiplexed connection."""
+        async with self._available:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        multiplexed, self._multiplexed = self._multiplexed, []
+        for websocket, _ in idle:
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+        for connection in multiplexed:
+            await connection.close()
+
+
+def get_connection_pool(uri: str = "ws://localhost:9000", **pool_options) -> ConnectionPool:
+    """The shared connection pool for uri on the running event loop.
+    
+    Every WebSocketManager on the same loop uses the same pool, so all
+    segments of a run, and all runs that share a loop, reuse its connections.
+    """
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    if uri not in pools:
+        pools[uri] = ConnectionPool(uri, **pool_options)
+    return pools[uri]
+
+
+async def close_connection_pools() -> None:
+    """Close the shared connection pools of the running event loop."""
+    for pool in _pools.pop(asyncio.get_running_loop(), {}).values():
+        await pool.close()
+
+
+async def close_pools_after(awaitable: Awaitable) -> Any:
+    """Await awaitable, then close the running loop's connection pools.
+
+    For the coroutine passed to asyncio.run(), whose loop ends right after:
+    pools left open would leak their sockets and reader tasks.
+    """
+    try:
+        return await awaitable
+    finally:
+        await close_connection_pools()
+
+
+class WebSocketManager:
+    """Client for the TTS server.
+    
+    With multiplex=True, requests share a few connections and carry request
+    IDs, so many segments can be in flight at once. The server has to support
+    this protocol extension; otherwise every request gets a pooled connection
+    of its own for the duration of its exchange.
+    
+    Stream requests list the transfer formats the client accepts, most
+    preferred first (accept_formats). The server answers in one of them and
+    names it in the "format" field of its metadata; servers that don't
+    negotiate send WAV. Raw PCM and compressed audio are decoded in memory and
+    written out as WAV, so callers always get a WAV file.
+    """
+
+    def __init__(self, uri: str = "ws://localhost:9000", max_retries: int = 3, retry_delay: int = 2,
+                 pool: ConnectionPool = None, multiplex: bool = False, frame_timeout: float = 30.0,
+                 accept_formats: Optional[List[str]] = None):
+        self.uri = uri
+        self.multiplex = multiplex
+        self.accept_formats = accept_formats or supported_transfer_formats()
+        self.frame_timeout = frame_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_message_size = 500000  # ~500KB for safe margin below WebSocket limit
+        self._pool = pool
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """Connection pool this manager sends through, the loop's shared pool unless one was given."""
+        if self._pool is None:
+            self._pool = get_connection_pool(self.uri, max_retries=self.max_retries, retry_delay=self.retry_delay)
+        return self._pool
+
     def _split_text(self, text: str, max_length: int = 500) -> List[str]:
         """Split text into smaller chunks that won't exceed the WebSocket frame size limit."""
-        # If text is short enough, return it as a single chunk
-        if len(text) <= max_length:
-            return [text]
-            
-        chunks = []
-        # Try to split on sentence boundaries
-        sentences = text.replace('. ', '.\n').replace('! ', '!\n').replace('? ', '?\n').split('\n')
-        current_chunk = ""
-        
-        for sentence in sentences:
-            # If adding this sentence would exceed the limit, start a new chunk
-            if len(current_chunk) + len(sentence) + 1 > max_length:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                # If the sentence itself is too long, split it by words
-                if len(sentence) > max_length:
-                    words = sentence.split()
-                    current_chunk = ""
-                    for word in words:
-                        if len(current_chunk) + len(word) + 1 > max_length:
-                            chunks.append(current_chunk)
-                            current_chunk = word
-                        else:
-                            if current_chunk:
-                                current_chunk += " " + word
-                            else:
-                                current_chunk = word
-                else:
-                    current_chunk = sentence
-            else:
-                if current_chunk:
-                    current_chunk += " " + sentence
-                else:
-                    current_chunk = sentence
-        
-        # Add the last chunk if it has content
-        if current_chunk:
-            chunks.append(current_chunk)
-            
-        return chunks
+        return split_text_into_chunks(text, max_length)
 
     async def send_tts_request(self, text: str, speaker: int, sample_rate: int = 24000, 
                            response_mode: str = "stream", max_audio_length_ms: int = 300000,
                            model: str = None, rate: str = None, volume: str = None, 
-                           pitch: str = None) -> Dict[str, Any]:
+                           pitch: str = None, output_file: str = None,
+                           timestamps: Optional[str] = None) -> Dict[str, Any]:
         """Send a TTS request and return the response metadata and audio data.
         
         Args:
@@ -89,230 +494,301 @@ class WebSocketManager:
             rate: Voice rate adjustment (Edge TTS only, e.g., "+10%")
             volume: Voice volume adjustment (Edge TTS only, e.g., "+20%")
             pitch: Voice pitch adjustment (Edge TTS only, e.g., "-5%")
+            output_file: In stream mode, write the audio straight to this file
+                instead of returning it as audio_data
+            timestamps: Ask for "word" or "phoneme" timestamps; servers that
+                can't provide them ignore the request
             
         Returns:
-            Dict containing metadata and audio data
+            Dict containing metadata, length_bytes, sha256 and either audio_data or output_file.
+            Stream responses also have the negotiated transfer_format, the wav_format
+            and duration of the audio, and its decoded samples unless it was
+            streamed straight to output_file. If the server sent timestamps, they
+            are in words, as {"word", "start", "end"} in seconds
         """
-        websocket = await self._try_connect()
-        if not websocket:
-            raise ConnectionError("Failed to establish connection to TTS service")
+        # Check if the text is too long and needs to be split
+        text_length = len(text.encode('utf-8'))
+        if text_length > self.max_message_size:
+            print(f"Text is too long ({text_length} bytes), splitting into chunks...")
+            return await self._process_long_text(text, speaker, sample_rate, max_audio_length_ms,
+                                                 model, rate, volume, pitch, output_file, timestamps)
+        return await self._send(text, speaker, sample_rate, response_mode, max_audio_length_ms,
+                                model, rate, volume, pitch, output_file, timestamps)
 
-        try:
-            # Check if the text is too long and needs to be split
-            text_length = len(text.encode('utf-8'))
-            if text_length > self.max_message_size:
-                print(f"Text is too long ({text_length} bytes), splitting into chunks...")
-                return await self._process_long_text(websocket, text, speaker, sample_rate, response_mode, 
-                                                    max_audio_length_ms, model, rate, volume, pitch)
-            
-            # Prepare request data using the correct parameter names for TTS-Provider
-            request = {
-                "text": text,
-                "speaker": speaker,
-                "sample_rate": sample_rate,
-                "response_mode": response_mode,
-                "max_audio_length_ms": max_audio_length_ms
-            }
+    async def warm_up(self, models: List[str], speaker: int = 0) -> Dict[str, bool]:
+        """Make the server load models before the first real request needs them.
+        
+        Sends one tiny request per model, all at once, and waits until each is
+        answered, which is when its model is loaded. Failures are reported
+        rather than raised, since real requests retry on their own.
+        
+        Returns:
+            Whether each model answered
+        """
+        async def warm(model):
+            started = time.monotonic()
+            try:
+                await self._send(WARM_UP_TEXT, speaker, 16000, "stream", 2000, model)
+            except Exception as e:
+                print(f"Could not warm up TTS model {model}: {e}")
+                return False
+            print(f"TTS model {model} is ready ({time.monotonic() - started:.1f}s)")
+            return True
+        
+        models = list(dict.fromkeys(models))
+        return dict(zip(models, await asyncio.gather(*(warm(model) for model in models))))
+
+    async def _send(self, text: str, speaker: int, sample_rate: int, response_mode: str,
+                    max_audio_length_ms: int, model: str = None, rate: str = None, volume: str = None,
+                    pitch: str = None, output_file: str = None,
+                    timestamps: Optional[str] = None) -> Dict[str, Any]:
+        """Send one request on a pooled connection or multiplexed channel."""
+        for attempt in range(2):
+            try:
+                if self.multiplex:
+                    async with self.pool.channel() as channel:
+                        return await self._exchange(channel, text, speaker, sample_rate, response_mode,
+                                                    max_audio_length_ms, model, rate, volume, pitch, output_file,
+                                                    timestamps)
+                async with self.pool.connection() as websocket:
+                    return await self._exchange(_DirectChannel(websocket), text, speaker, sample_rate,
+                                                response_mode, max_audio_length_ms, model, rate, volume, pitch,
+                                                output_file, timestamps)
+            except (websockets.exceptions.ConnectionClosed, ConnectionLostError) as e:
+                # The server may have dropped a pooled connection between health checks
+                if attempt:
+                    raise ConnectionError(f"TTS server closed the connection: {e}")
+                print("TTS server connection was closed, retrying on a new connection...")
+
+    async def _exchange(self, channel, text: str, speaker: int, sample_rate: int, response_mode: str,
+                        max_audio_length_ms: int, model: str = None, rate: str = None,
+                        volume: str = None, pitch: str = None, output_file: str = None,
+                        timestamps: Optional[str] = None) -> Dict[str, Any]:
+        """Run one request/response exchange on a channel."""
+        # Prepare request data using the correct parameter names for TTS-Provider
+        request = {
+            "text": text,
+            "speaker": speaker,
+            "sample_rate": sample_rate,
+            "response_mode": response_mode,
+            "max_audio_length_ms": max_audio_length_ms
+        }
+        if response_mode == "stream":
+            request["accept_formats"] = self.accept_formats
+        if timestamps:
+            request["timestamps"] = timestamps
+        
+        # Add model selection if specified
+        if model:
+            request["model_type"] = model
             
-            # Add model selection if specified
-            if model:
-                request["model_type"] = model
-                
-            # Add Edge TTS specific parameters if provided
-            extra_params = {}
-            if rate:
-                extra_params["rate"] = rate
-            if volume:
-                extra_params["volume"] = volume
-            if pitch:
-                extra_params["pitch"] = pitch
-                
-            if extra_params:
-                request["extra_params"] = extra_params
+        # Add Edge TTS specific parameters if provided
+        extra_params = {}
+        if rate:
+            extra_params["rate"] = rate
+        if volume:
+            extra_params["volume"] = volume
+        if pitch:
+            extra_params["pitch"] = pitch
             
-            # Send request
-            print(f"Sending TTS request: {json.dumps(request)}")
-            await websocket.send(json.dumps(request))
+        if extra_params:
+            request["extra_params"] = extra_params
+        
+        # Send request
+        print(f"Sending TTS request: {json.dumps(request)}")
+        await channel.send_request(request)
+        
+        # Get initial response (metadata)
+        metadata_str = await channel.recv()
+        response = json.loads(metadata_str)
+        
+        # Handle loading state or queue state. The server sends an update whenever the state
+        # changes, so the next message is awaited straight away instead of polling
+        status = response.get("status")
+        while status in ["loading", "queued"]:
+            if status == "loading":
+                print("TTS model is still loading, waiting...")
+            elif status == "queued":
+                queue_position = response.get("queue_position", "unknown")
+                print(f"Request queued (position: {queue_position}), waiting...")
             
-            # Get initial response (metadata)
-            metadata_str = await websocket.recv()
+            metadata_str = await channel.recv()
             response = json.loads(metadata_str)
-            
-            # Handle loading state or queue state
             status = response.get("status")
-            while status in ["loading", "queued"]:
-                if status == "loading":
-                    print("TTS model is still loading, waiting...")
-                elif status == "queued":
-                    queue_position = response.get("queue_position", "unknown")
-                    print(f"Request queued (position: {queue_position}), waiting...")
-                
-                await asyncio.sleep(1)
-                metadata_str = await websocket.recv()
-                response = json.loads(metadata_str)
-                status = response.get("status")
+        
+        if response.get("status") == "success":
+            result = {
+                "metadata": response
+            }
+            words = word_timestamps(response)
+            if words:
+                result["words"] = words
             
-            if response.get("status") == "success":
-                result = {
-                    "metadata": response
-                }
-                
-                if response_mode == "file":
-                    # In file mode, the server sends only metadata with filepath
-                    # We need to copy that file to our local destination
-                    result["filepath"] = response.get("filepath")
-                else:
-                    # In stream mode, the server sends audio data after the metadata
-                    # Check expected length vs received length
-                    expected_length = response.get("length_bytes", 0)
-                    print(f"Expecting to receive {expected_length} bytes of audio data")
-                    
-                    # First chunk
-                    chunk = await websocket.recv()
-                    chunks = [chunk]
-                    total_received = len(chunk)
-                    
-                    # If we received less than expected, try to receive more chunks
-                    if total_received < expected_length:
-                        print(f"Received first chunk: {total_received} bytes. Expecting more chunks...")
-                        try:
-                            # Set a timeout for receiving remaining chunks
-                            # Use a while loop with timeout to receive all chunks
-                            timeout = 30  # 30 seconds timeout for receiving all chunks
-                            start_time = time.time()
-                            
-                            while total_received < expected_length and (time.time() - start_time) < timeout:
-                                try:
-                                    # Try to receive the next chunk with a 5-second timeout
-                                    next_chunk = await asyncio.wait_for(websocket.recv(), timeout=5)
-                                    chunks.append(next_chunk)
-                                    chunk_size = len(next_chunk)
-                                    total_received += chunk_size
-                                    print(f"Received additional chunk: {chunk_size} bytes. Total so far: {total_received}/{expected_length} bytes")
-                                    
-                                    # If this chunk was small, we might be at the end
-                                    if chunk_size < 100000:  # Less than 100KB
-                                        print(f"Received small chunk ({chunk_size} bytes), likely finished transmission")
-                                        break
-                                except asyncio.TimeoutError:
-                                    print(f"Timeout waiting for next chunk. Received {total_received}/{expected_length} bytes so far.")
-                                    break
-                            
-                            # Check if we've received everything
-                            if total_received >= expected_length:
-                                print(f"Successfully received all {total_received} bytes of audio data")
-                            else:
-                                print(f"WARNING: Only received {total_received}/{expected_length} bytes ({(total_received/expected_length)*100:.1f}%)")
-                        except Exception as e:
-                            print(f"Error receiving additional chunks: {e}")
-                    
-                    # Combine all chunks
-                    audio_data = b''.join(chunks)
-                    actual_length = len(audio_data)
-                    
-                    print(f"Actually received {actual_length} bytes of audio data")
-                    if actual_length < expected_length:
-                        print(f"WARNING: Received fewer bytes than expected ({actual_length} < {expected_length})!")
-                        print(f"Missing {expected_length - actual_length} bytes ({((expected_length - actual_length) / expected_length) * 100:.1f}% of data)")
-                    
-                    result["audio_data"] = audio_data
-                
-                return result
+            if response_mode == "file":
+                # In file mode, the server sends only metadata with filepath
+                # We need to copy that file to our local destination
+                result["filepath"] = response.get("filepath")
             else:
-                error_msg = response.get("message", "Unknown error")
-                print(f"TTS service error: {error_msg}")
-                raise Exception(f"TTS service error: {error_msg}")
+                result.update(await self._receive_stream(channel, response, output_file))
+            
+            return result
+        else:
+            error_msg = response.get("message", "Unknown error")
+            print(f"TTS service error: {error_msg}")
+            raise Exception(f"TTS service error: {error_msg}")
+
+    async def _receive_stream(self, channel, response: Dict[str, Any], output_file: str = None) -> Dict[str, Any]:
+        """Receive the audio of a stream response in its negotiated format.
         
-        finally:
-            # Close the connection when done
-            await websocket.close()
+        WAV, and raw PCM of known length, go straight to output_file when
+        there is one. Anything else is received into memory, decoded with
+        decode_audio and written to output_file as WAV.
+        """
+        # In stream mode, the server sends exactly length_bytes of audio after the metadata
+        expected_length = response.get("length_bytes")
+        transfer_format = response.get("format") or "wav"
+        print(f"Expecting to receive {expected_length} bytes of {transfer_format} audio data")
+        
+        pcm_format = None
+        if transfer_format == PCM_FORMAT:
+            pcm_format = WavFormat(response.get("channels", 1), 2, response.get("sample_rate"))
+        if output_file and transfer_format == "wav":
+            sink = AudioFileWriter(output_file)
+        elif output_file and pcm_format and pcm_format.sample_rate and expected_length is not None:
+            sink = AudioFileWriter(output_file, header=wav_header(pcm_format, expected_length))
+        else:
+            sink = AudioBuffer()
+        try:
+            await self._receive_audio(channel, expected_length, sink)
+            _verify_checksum(response, sink.sha256)
+        except BaseException:
+            sink.discard()
+            raise
+        
+        result = {"transfer_format": transfer_format, "length_bytes": sink.length, "sha256": sink.sha256}
+        if isinstance(sink, AudioFileWriter):
+            result["output_file"] = sink.commit()
+            if pcm_format:
+                result["wav_format"] = pcm_format
+                result["duration"] = pcm_format.duration(sink.length)
+            else:
+                try:
+                    result["duration"] = wav_duration(output_file)
+                except ValueError as e:
+                    print(f"Warning: Could not read the received WAV header: {e}")
+            print(f"Received all {sink.length} bytes of audio data")
+            return result
+        
+        data = sink.commit()
+        try:
+            wav_format, samples = decode_audio(data, transfer_format, response.get("sample_rate"),
+                                               response.get("channels", 1))
+        except ValueError as e:
+            if transfer_format != "wav":
+                raise IncompleteAudioError(f"Could not decode {transfer_format} audio: {e}")
+            # WAV is passed on as it came, like it was before formats were negotiated
+            print(f"Warning: Could not read the received WAV audio: {e}")
+            wav = data
+        else:
+            wav = data if transfer_format == "wav" else encode_wav(wav_format, samples)
+            result["wav_format"] = wav_format
+            result["samples"] = samples
+            result["duration"] = wav_format.duration(len(samples) * wav_format.sample_width)
+        if output_file:
+            writer = AudioFileWriter(output_file)
+            writer.write(wav)
+            result["output_file"] = writer.commit()
+        else:
+            result["audio_data"] = wav
+        print(f"Received all {sink.length} bytes of audio data")
+        return result
+
+    async def _receive_audio(self, channel, expected_length: Optional[int], sink) -> None:
+        """Receive exactly expected_length bytes of audio frames into sink.
+        
+        Raises:
+            IncompleteAudioError: If the audio stops early, overruns its length or
+                stalls for longer than frame_timeout
+        """
+        if expected_length is None:
+            # Servers that don't announce a length send the audio as one frame
+            sink.write(await channel.recv())
+            return
+        while sink.length < expected_length:
+            try:
+                frame = await asyncio.wait_for(channel.recv(), timeout=self.frame_timeout)
+            except asyncio.TimeoutError:
+                await channel.abandon()
+                raise IncompleteAudioError(
+                    f"Timed out after receiving {sink.length}/{expected_length} bytes of audio")
+            if isinstance(frame, str):
+                await channel.abandon()
+                raise IncompleteAudioError(
+                    f"Audio stopped after {sink.length}/{expected_length} bytes: {frame[:200]}")
+            sink.write(frame)
+        if sink.length > expected_length:
+            await channel.abandon()
+            raise IncompleteAudioError(f"Received {sink.length} bytes of audio, expected {expected_length}")
 
-    async def _process_long_text(self, websocket, text: str, speaker: int, sample_rate: int, 
-                             response_mode: str, max_audio_length_ms: int, 
-                             model: str = None, rate: str = None, volume: str = None, 
-                             pitch: str = None) -> Dict[str, Any]:
-        """Process long text by splitting it into chunks, sending separate requests, and combining results."""
+    async def _process_long_text(self, text: str, speaker: int, sample_rate: int, max_audio_length_ms: int,
+                                 model: str = None, rate: str = None, volume: str = None,
+                                 pitch: str = None, output_file: str = None,
+                                 timestamps: Optional[str] = None) -> Dict[str, Any]:
+        """Synthesize long text as concurrent chunk requests and stitch the audio into one WAV file.
+        
+        Every chunk is a separate request, so they run in parallel on pooled or
+        multiplexed connections and the whole takes about as long as the
+        slowest chunk. Their audio is joined at the PCM level under a single
+        header, and where each chunk starts and ends is returned in
+        chunk_offsets, for use as timing anchors. If every chunk came with
+        word timestamps, they are shifted to the chunk's offset and returned
+        as the words of the whole text.
+        """
         chunks = self._split_text(text)
         print(f"Split text into {len(chunks)} chunks")
         
-        all_audio_data = bytearray()
-        success_count = 0
-        
-        for i, chunk in enumerate(chunks):
-            try:
-                # Prepare request for this chunk
-                request = {
-                    "text": chunk,
-                    "speaker": speaker,
-                    "sample_rate": sample_rate,
-                    "response_mode": "stream",  # Always use stream mode for chunks
-                    "max_audio_length_ms": max_audio_length_ms
-                }
-                
-                # Add model selection if specified
-                if model:
-                    request["model_type"] = model
-                    
-                # Add Edge TTS specific parameters if provided
-                extra_params = {}
-                if rate:
-                    extra_params["rate"] = rate
-                if volume:
-                    extra_params["volume"] = volume
-                if pitch:
-                    extra_params["pitch"] = pitch
-                    
-                if extra_params:
-                    request["extra_params"] = extra_params
-                
-                # Send request
-                print(f"Sending chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
-                await websocket.send(json.dumps(request))
-                
-                # Get metadata response
-                metadata_str = await websocket.recv()
-                response = json.loads(metadata_str)
-                
-                # Handle loading state or queue state
-                status = response.get("status")
-                while status in ["loading", "queued"]:
-                    if status == "loading":
-                        print("TTS model is still loading, waiting...")
-                    elif status == "queued":
-                        queue_position = response.get("queue_position", "unknown")
-                        print(f"Request queued (position: {queue_position}), waiting...")
-                    
-                    await asyncio.sleep(1)
-                    metadata_str = await websocket.recv()
-                    response = json.loads(metadata_str)
-                    status = response.get("status")
-                
-                if response.get("status") == "success":
-                    # Get the audio data for this chunk
-                    chunk_audio = await websocket.recv()
-                    all_audio_data.extend(chunk_audio)
-                    success_count += 1
-                else:
-                    error_msg = response.get("message", "Unknown error")
-                    print(f"Error processing chunk {i+1}: {error_msg}")
-            except Exception as e:
-                print(f"Error processing chunk {i+1}: {e}")
+        tasks = [asyncio.ensure_future(self._send(chunk, speaker, sample_rate, "stream",
+                                                  max_audio_length_ms, model, rate, volume, pitch,
+                                                  timestamps=timestamps))
+                 for chunk in chunks]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
         
-        if success_count == 0:
-            raise Exception("Failed to process any text chunks")
+        sink = AudioFileWriter(output_file) if output_file else AudioBuffer()
+        try:
+            wav_format, offsets = stitch_wav([result["audio_data"] for result in results], sink)
+        except BaseException:
+            sink.discard()
+            raise
+        chunk_offsets = [{"text": chunk, "start_time": start, "end_time": end}
+                         for chunk, (start, end) in zip(chunks, offsets)]
         
-        # Create result with combined audio data
         result = {
             "metadata": {
                 "status": "success",
                 "response_mode": "stream",
-                "length_bytes": len(all_audio_data),
-                "sample_rate": sample_rate,
+                "length_bytes": sink.length,
+                "sample_rate": wav_format.sample_rate,
                 "format": "wav",
-                "combined_chunks": len(chunks)
+                "combined_chunks": len(chunks),
+                "duration": offsets[-1][1]
             },
-            "audio_data": bytes(all_audio_data)
+            "length_bytes": sink.length,
+            "sha256": sink.sha256,
+            "transfer_format": "wav",
+            "wav_format": wav_format,
+            "duration": offsets[-1][1],
+            "chunk_offsets": chunk_offsets
         }
+        if all(chunk_result.get("words") for chunk_result in results):
+            result["words"] = [dict(word, start=word["start"] + start, end=word["end"] + start)
+                               for chunk_result, (start, _) in zip(results, offsets)
+                               for word in chunk_result["words"]]
+        result["output_file" if output_file else "audio_data"] = sink.commit()
         
-        print(f"Successfully combined audio from {success_count}/{len(chunks)} chunks")
-        return result
\ No newline at end of file
+        print(f"Successfully stitched audio from {len(chunks)} chunks ({offsets[-1][1]:.2f}s)")
+        return result
@@ -0,0 +1,30 @@
+import os
+
+
+class Workspace:
+    """Directory layout for the files produced by a single debate run.
+
+    The default root reproduces the historical ``outputs/`` layout, so code
+    that doesn't care about workspaces keeps reading and writing the same
+    paths as before. Batch runs give every debate its own root so several
+    debates can be generated side by side.
+    """
+
+    def __init__(self, root='outputs'):
+        self.root = root
+        self.debate_file = os.path.join(root, 'debate.txt')
+        self.video_file = os.path.join(root, 'video.txt')
+        self.audio_dir = os.path.join(root, 'audio_output')
+        self.frames_dir = os.path.join(root, 'temp_frames')
+        self.temp_dir = os.path.join(root, 'moviepy_temp')
+        self.video_path = os.path.join(root, 'debate.mp4')
+        self.checkpoint_file = os.path.join(root, 'checkpoint.json')
+
+    def create(self):
+        """Create the workspace directories if they don't exist yet."""
+        for directory in (self.root, self.audio_dir, self.frames_dir, self.temp_dir):
+            os.makedirs(directory, exist_ok=True)
+        return self
+
+    def __repr__(self):
+        return f"Workspace({self.root!r})"